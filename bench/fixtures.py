@@ -0,0 +1,79 @@
+"""Recorded-shape responses of PubMed efetch, ACS search and Sci-Hub pages for offline benchmarks"""
+
+ABSTRACT = (
+    "Deoxyribonucleic acid is a polymer composed of two polynucleotide chains that coil around "
+    "each other to form a double helix. The polymer carries genetic instructions for the "
+    "development, functioning, growth and reproduction of all known organisms and many viruses. "
+) * 4
+
+
+def pubmedArticle(pmid: str) -> str:
+    authors = "".join(
+        f"<Author><LastName>Author{i}</LastName><ForeName>Fore</ForeName></Author>"
+        for i in range(8)
+    )
+    return (
+        "<PubmedArticle><MedlineCitation Status='MEDLINE'>"
+        f"<PMID Version='1'>{pmid}</PMID><Article PubModel='Print'>"
+        "<Journal><JournalIssue><Volume>577</Volume><PubDate><Year>2020</Year><Month>Jan</Month>"
+        "</PubDate></JournalIssue><Title>Nature</Title><ISOAbbreviation>Nature</ISOAbbreviation>"
+        f"</Journal><ArticleTitle>Recorded title of <i>paper</i> {pmid}.</ArticleTitle>"
+        f"<ELocationID EIdType='doi'>10.1038/{pmid}</ELocationID><Abstract>"
+        f"<AbstractText Label='BACKGROUND'>{ABSTRACT}</AbstractText>"
+        f"<AbstractText Label='RESULTS'>{ABSTRACT}</AbstractText></Abstract>"
+        f"<AuthorList CompleteYN='Y'>{authors}</AuthorList></Article></MedlineCitation>"
+        "<PubmedData><ArticleIdList>"
+        f"<ArticleId IdType='pubmed'>{pmid}</ArticleId><ArticleId IdType='doi'>10.1038/{pmid}</ArticleId>"
+        "</ArticleIdList></PubmedData></PubmedArticle>"
+    )
+
+
+def efetchPage(pmids: list[str]) -> bytes:
+    """An efetch response of the given PMIDs"""
+    return (
+        '<?xml version="1.0" ?>\n<PubmedArticleSet>'
+        + "".join(pubmedArticle(pmid) for pmid in pmids)
+        + "</PubmedArticleSet>"
+    ).encode()
+
+
+def acsItem(index: int) -> str:
+    return (
+        '<li class="search__item"><div class="issue-item clearfix">'
+        f'<span class="infoType">{"Chapter" if index % 10 == 0 else "Research Article"}</span>'
+        '<div class="issue-item_metadata">'
+        f'<h2 class="issue-item_title"><a href="/doi/10.1021/jacs.{index}">Recorded ACS title {index}</a></h2>'
+        '<ul class="rlist--inline loa">'
+        + "".join(f"<li><span>Author {i}</span></li>" for i in range(6))
+        + "</ul>"
+        '<span class="issue-item_jour-name"><i>J. Am. Chem. Soc.</i></span>'
+        '<div class="issue-item_chapter">ACS Symposium   Series\n Chapter 3</div>'
+        '<span class="pub-date-value">January 1, 2020</span>'
+        f'<span class="hlFld-Abstract">{ABSTRACT}</span>'
+        "</div></div></li>"
+    )
+
+
+def acsPage(num: int, start: int = 0, total: int | None = None) -> bytes:
+    """An ACS search page with num items from start, total defaults to num"""
+    return (
+        '<html><head><title>Search</title></head><body><span class="result__count">'
+        f'{num if total is None else total}</span><ul class="search-result__body">'
+        + "".join(acsItem(i) for i in range(start, start + num))
+        + "</ul></body></html>"
+    ).encode()
+
+
+def scihubPage(pdf_url: str) -> bytes:
+    """A Sci-Hub article page embedding the pdf"""
+    return (
+        "<html><head><title>Sci-Hub</title></head><body><div id='article'>"
+        f"<embed type='application/pdf' src='{pdf_url}#navpanes=0&view=FitH' id='pdf'>"
+        "</div></body></html>"
+    ).encode()
+
+
+def pdfBody(size: int) -> bytes:
+    """A pdf-looking body of size bytes"""
+    header = b"%PDF-1.4\n"
+    return header + b"0" * max(0, size - len(header))
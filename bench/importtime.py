@@ -0,0 +1,67 @@
+"""
+Measure import time of the entry modules by `python -X importtime` and guard against regressions.
+Fails when a heavy dependency is imported at startup again or a time budget is exceeded.
+
+Usage: python -m bench.importtime [--runs 5] [--budget getpaper.cli=200]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Modules that must not be imported when the entry module is imported
+FORBIDDEN = {
+    "getpaper.cli": ["tkinter", "ttkbootstrap", "curl_cffi", "bs4", "lxml"],
+    "getpaper.GUI": ["curl_cffi", "bs4", "lxml"],
+}
+
+
+def importTime(module: str) -> dict[str, tuple[int, int]]:
+    """Returns {imported module: (self us, cumulative us)} of a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = (int(self_us), int(cumulative))
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="runs of each module, median is used")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to show")
+    parser.add_argument(
+        "--budget", action="append", default=[], help="module=milliseconds, fail if slower"
+    )
+    args = parser.parse_args()
+    budgets = {name: float(ms) for name, ms in (b.split("=") for b in args.budget)}
+
+    failed = False
+    for module, forbidden in FORBIDDEN.items():
+        runs = [importTime(module) for _ in range(args.runs)]
+        total = statistics.median(run[module][1] for run in runs) / 1000
+        print(f"{module}: {total:.1f} ms (median of {args.runs})")
+        slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, _) in slowest[: args.top]:
+            print(f"    {self_us / 1000:>8.1f} ms  {name}")
+
+        if loaded := [name for name in forbidden if name in runs[-1]]:
+            print(f"    FAIL: imports {', '.join(loaded)} at startup")
+            failed = True
+        if module in budgets and total > budgets[module]:
+            print(f"    FAIL: exceeds budget {budgets[module]:.1f} ms")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Compare BeautifulSoup tree parsing with the streaming parsers in getpaper.spiders._parser
+
+Usage: python -m bench.parse [records ...]
+"""
+
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+from bench.fixtures import acsPage, efetchPage
+from getpaper.spiders._parser import iterACSItems, iterPubMedArticles, parsePubMedArticle
+
+BASE_URL = "https://pubmed.ncbi.nlm.nih.gov/"
+
+
+def soupPubMed(content: bytes) -> int:
+    """Build the whole BeautifulSoup tree and search it, as the spiders used to"""
+    bs = BeautifulSoup(content, "lxml-xml")
+    count = 0
+    for article in bs.find_all("PubmedArticle"):
+        (
+            article.find("ArticleTitle").text,
+            "; ".join(a.LastName.text for a in article.find_all("Author", limit=5)),
+            article.find("PubDate").text,
+            article.find("ISOAbbreviation").text,
+            "\n".join(a.text for a in article.find_all("AbstractText")),
+            article.find("ArticleId", IdType="doi").text,
+        )
+        count += 1
+    return count
+
+
+def treePubMed(content: bytes) -> int:
+    """Build the whole lxml tree, then convert every article"""
+    return sum(
+        1 for article in etree.fromstring(content).iter("PubmedArticle")
+        if parsePubMedArticle(article, BASE_URL)
+    )  # fmt: skip
+
+
+def streamPubMed(content: bytes) -> int:
+    return sum(1 for _ in iterPubMedArticles(content, BASE_URL))
+
+
+def soupACS(content: bytes) -> int:
+    """The parsing of ACS.Spider.getPagesInfo before streaming parser"""
+    bs = BeautifulSoup(content, "lxml")
+    count = 0
+    for content in bs.find_all(class_="issue-item_metadata"):
+        title_tag = content.find("h2", class_="issue-item_title")
+        (
+            title_tag.text,
+            title_tag.a["href"],
+            content.ul.text,
+            content.find(class_="pub-date-value").text,
+            content.find("span", class_="hlFld-Abstract").text,
+        )
+        if content.parent.find(class_="infoType").string == "Chapter":
+            re.sub(r"\s+", " ", content.find(class_="issue-item_chapter").text)
+        else:
+            content.find(class_="issue-item_jour-name").text
+        count += 1
+    return count
+
+
+def streamACS(content: bytes) -> int:
+    return sum(1 for _ in iterACSItems(content))
+
+
+def peakRSS() -> float:
+    """Peak resident memory of this process in MiB, 0 when unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(func: Callable[[bytes], int], content: bytes) -> tuple[int, float, float]:
+    """Run in a fresh process, returns (records, seconds, peak MiB grown by parsing)"""
+    baseline = peakRSS()
+    start = time.perf_counter()
+    count = func(content)
+    seconds = time.perf_counter() - start
+    return count, seconds, peakRSS() - baseline
+
+
+def main(sizes: list[int]) -> None:
+    print(
+        f"{'parser':<16}{'records':>10}{'body MiB':>10}{'seconds':>10}{'rec/s':>10}{'peak MiB':>10}"
+    )
+    for size in sizes:
+        cases = [
+            ("pubmed-bs4", soupPubMed, efetchPage),
+            ("pubmed-tree", treePubMed, efetchPage),
+            ("pubmed-stream", streamPubMed, efetchPage),
+            ("acs-bs4", soupACS, acsPage),
+            ("acs-stream", streamACS, acsPage),
+        ]
+        for name, func, page in cases:
+            if page is efetchPage:
+                content = efetchPage([str(30000000 + i) for i in range(size)])
+            else:
+                content = acsPage(size)
+            with ProcessPoolExecutor(1) as executor:
+                count, seconds, peak = executor.submit(measure, func, content).result()
+            print(
+                f"{name:<16}{count:>10}{len(content) / 1024**2:>10.1f}"
+                f"{seconds:>10.3f}{count / seconds:>10.0f}{peak:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [200, 2000])
@@ -0,0 +1,191 @@
+"""
+Local stand-in of PubMed E-utilities, ACS search and Sci-Hub serving recorded-shape responses
+from bench.fixtures with configurable latency and error rate.
+Errors are injected into detail pages and downloads only, search counts always succeed.
+
+    /entrez/eutils/esearch.fcgi, /entrez/eutils/efetch.fcgi    PubMed.Spider.eutils_url
+    /action/doSearch                                            ACS.Spider.base_url
+    /scihub/<doi>, /pdf/<doi>.pdf                               SciHubDownloader(url + "/scihub")
+
+Pdfs honour Range requests, /pdf/<doi>.pdf?truncate=1 cuts the body of a request without range.
+
+Usage: python -m bench.server [--port 8000] [--latency 0.05] [--error-rate 0.01]
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process, Queue
+from urllib.parse import parse_qs, urlsplit
+
+from bench.fixtures import acsPage, efetchPage, pdfBody, scihubPage
+
+FIRST_PMID = 30000000
+# Papers are sorted by date descending, PAPERS_PER_DAY of them published on each day before
+LATEST_DATE = date(2020, 12, 31)
+PAPERS_PER_DAY = 5
+MAX_RETSTART = 9998  # esearch rejects larger retstart
+DATE_RANGE = re.compile(r"(\d{4}/\d{2}/\d{2}):(\d{4}/\d{2}/\d{2})\[dp\]")
+
+
+def searchResult(term: str, total: int) -> range:
+    """Indexes of the papers found by term, limited by its publication date range if any"""
+    if not (match := DATE_RANGE.search(term)):
+        return range(total)
+    first, last = (date.fromisoformat(day.replace("/", "-")) for day in match.groups())
+    # From the first paper published on last to the last paper published on first
+    start = max(0, (LATEST_DATE - last).days * PAPERS_PER_DAY)
+    stop = min(total, ((LATEST_DATE - first).days + 1) * PAPERS_PER_DAY)
+    return range(start, max(start, stop))
+
+
+@dataclass
+class MockOptions:
+    total: int = 100000  # Number of papers found by any search
+    latency: float = 0.05  # Seconds before responding
+    jitter: float = 0.5  # Latency varies by up to this fraction
+    error_rate: float = 0.0  # Chance of responding 500 to a detail page or download
+    pdf_size: int = 512 * 1024
+    seed: int = 0
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, so connection reuse of the client is measured
+    protocol_version = "HTTP/1.1"
+    options = MockOptions()
+    random = random.Random(0)
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        self.route(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+
+    def do_HEAD(self) -> None:
+        # Probed by the mirror pool
+        time.sleep(self.options.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query) | parse_qs(body)
+        self.route(url.path, {k: v[0] for k, v in params.items()})
+
+    def route(self, path: str, params: dict[str, str]) -> None:
+        options = self.options
+        time.sleep(options.latency * (1 + options.jitter * (2 * self.random.random() - 1)))
+        failed = self.random.random() < options.error_rate
+
+        if path.endswith("/esearch.fcgi"):
+            start, count = int(params.get("retstart", 0)), int(params.get("retmax", 20))
+            found = searchResult(params.get("term", ""), options.total)
+            if start > MAX_RETSTART:
+                error = f"'retstart' cannot be larger than {MAX_RETSTART}"
+                self.reply(error.encode(), "text/plain", status=400)
+                return
+            ids = [str(FIRST_PMID + i) for i in found[start : start + count]]
+            result = {"count": str(len(found)), "idlist": ids, "webenv": "MOCK", "querykey": "1"}
+            self.reply(json.dumps({"esearchresult": result}).encode(), "application/json")
+        elif path.endswith("/efetch.fcgi"):
+            self.reply(efetchPage(params["id"].split(",")), "text/xml", failed)
+        elif path == "/action/doSearch":
+            size, page = int(params.get("pageSize", 20)), int(params.get("startPage", 0))
+            num = max(0, min(size, options.total - page * size))
+            content = acsPage(num, page * size, options.total)
+            # The first page of 20 is requested for the total number
+            self.reply(content, "text/html; charset=UTF-8", failed and size != 20)
+        elif path.startswith("/scihub/"):
+            doi = path.removeprefix("/scihub/")
+            self.reply(scihubPage(f"/pdf/{doi}.pdf"), "text/html; charset=UTF-8", failed)
+        elif path.startswith("/pdf/"):
+            self.replyPDF(pdfBody(options.pdf_size), "truncate" in params, failed)
+        else:
+            self.reply(b"Not Found", "text/plain", status=404)
+
+    def replyPDF(self, body: bytes, truncate: bool, failed: bool) -> None:
+        """
+        Serve the pdf or the range of it requested by a Range header, with truncate the body of
+        a request without range is cut short, as if the connection dropped
+        """
+        if failed or not (match := re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))):
+            if not truncate or failed:
+                self.reply(body, "application/pdf", failed)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        start = int(match.group(1))
+        if start >= len(body):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(body)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def reply(
+        self, body: bytes, content_type: str, failed: bool = False, status: int = 200
+    ) -> None:
+        if failed:
+            body, content_type, status = b"Internal Server Error", "text/plain", 500
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(options: MockOptions, port: int = 0, ready: "Queue | None" = None) -> None:
+    MockHandler.options = options
+    MockHandler.random = random.Random(options.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_port)
+    server.serve_forever()
+
+
+def startServer(options: MockOptions) -> tuple[Process, str]:
+    """Run the server in another process, so it does not share the GIL with the client"""
+    # Forking a process running threads, like the parse pool, is unsafe
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    process = context.Process(target=serve, args=(options, 0, ready), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ready.get(timeout=10)}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--total", type=int, default=MockOptions.total)
+    parser.add_argument("--latency", type=float, default=MockOptions.latency)
+    parser.add_argument("--error-rate", type=float, default=MockOptions.error_rate)
+    parser.add_argument("--pdf-size", type=int, default=MockOptions.pdf_size)
+    args = parser.parse_args()
+    options = MockOptions(args.total, args.latency, 0.5, args.error_rate, args.pdf_size)
+    print(f"Serving on http://127.0.0.1:{args.port}")
+    serve(options, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Throughput of the spiders and downloader against the local mock server of bench.server,
+and of translating all results by the offline translator with the same latency.
+Each case runs in a fresh process with an empty cache and store in a temporary DATA_DIR,
+reporting items/s, requests/s, p50/p99 latency until response headers and peak RSS.
+
+Usage: python -m bench.throughput [--papers 2000] [--downloads 200] [--latency 0.05]
+                                  [--error-rate 0.01] [--parse-pool process] [--json results.jsonl]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from queue import Queue
+from typing import Any
+
+from bench.parse import peakRSS
+from bench.server import MockOptions, startServer
+
+HOST = "127.0.0.1"
+
+
+def record(client: Any, latencies: list[float], statuses: list[int]) -> None:
+    """Record latency and status of every request sent by the session of client"""
+    request = client.session.request
+
+    async def timed(*args, **kwargs):
+        start = time.perf_counter()
+        response = await request(*args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        statuses.append(response.status_code)
+        return response
+
+    client.session.request = timed
+
+
+async def fetchPapers(engine: str, url: str, num: int) -> int:
+    from getpaper.spiders._spider import ResultStream, isPlaceholder
+    from getpaper.utils import getSpider
+
+    spider = getSpider(engine, keyword="dna")
+    if engine == "PubMed":
+        spider.eutils_url = f"{url}/entrez/eutils/"  # type: ignore
+    else:
+        spider.base_url = f"{url}/action/doSearch"  # type: ignore
+    num = min(num, await spider.getTotalPaperNum())
+    details = [detail async for _, detail in ResultStream(spider, num)]
+    return sum(1 for detail in details if not isPlaceholder(detail))
+
+
+async def downloadPapers(url: str, num: int, target_dir: Path) -> int:
+    from getpaper.download import SciHubDownloader
+    from getpaper.spiders._spider import PaperDetail
+
+    details = [
+        PaperDetail(f"Paper {i}", "", "", "", "", f"10.1038/{30000000 + i}", "") for i in range(num)
+    ]
+    monitor = Queue()
+    await SciHubDownloader(f"{url}/scihub", mirrors=()).multiDownload(details, monitor, target_dir)
+    return sum(1 for _, status in monitor.queue if status == "下载完成")
+
+
+async def translatePapers(
+    num: int, latency: float, latencies: list[float], statuses: list[int]
+) -> int:
+    from getpaper.spiders._spider import PaperDetail
+    from getpaper.translator._translator import translateDetails
+    from getpaper.utils import getTranslator
+
+    details = [
+        PaperDetail(f"Paper {i}", "", "", "", f"Abstract of paper {i}.\nMethods.", "", "")
+        for i in range(num)
+    ]
+    translator = getTranslator("_offline", latency)
+    translateBatch = translator.translateBatch
+
+    async def timed(lines: list[str]) -> list[str]:
+        start = time.perf_counter()
+        result = await translateBatch(lines)
+        latencies.append(time.perf_counter() - start)
+        statuses.append(200)
+        return result
+
+    translator.translateBatch = timed  # type: ignore
+    translations = await translateDetails(translator, details)
+    return sum(1 for title, _ in translations if title.startswith("[zh]"))
+
+
+def runCase(
+    case: str,
+    url: str,
+    num: int,
+    rate: float,
+    connections: int,
+    parse_pool: str,
+    latency: float,
+) -> dict[str, Any]:
+    """Run in a fresh process, returns the measurement of case"""
+    from getpaper import utils
+    from getpaper.metrics import metrics
+    from getpaper.translator._offline import HOST as TRANSLATOR_HOST
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        utils.DATA_DIR = Path(data_dir)
+        utils.PARSE_POOL = parse_pool
+        for host in (HOST, TRANSLATOR_HOST):
+            utils.getLimiter().configure(host, rate, max(1, int(rate)))
+        latencies: list[float] = []
+        statuses: list[int] = []
+
+        async def main() -> int:
+            client = utils.getClient()
+            client.connections[HOST] = connections
+            record(client, latencies, statuses)
+            try:
+                if case == "download":
+                    return await downloadPapers(url, num, Path(data_dir) / "papers")
+                if case == "translate":
+                    return await translatePapers(num, latency, latencies, statuses)
+                return await fetchPapers(case, url, num)
+            finally:
+                await utils.closeClients()
+                if pool := utils.getParsePool():
+                    # Worker processes of this process would not exit by themselves
+                    pool.shutdown()
+
+        baseline = peakRSS()
+        start = time.perf_counter()
+        items = asyncio.run(main())
+        seconds = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "case": case,
+        "items": items,
+        "requests": len(latencies),
+        "errors": sum(status >= 400 for status in statuses),
+        "seconds": seconds,
+        "items/s": items / seconds,
+        "req/s": len(latencies) / seconds,
+        "p50 ms": percentiles[49] * 1000,
+        "p99 ms": percentiles[98] * 1000,
+        "peak MiB": peakRSS(),
+        "grown MiB": peakRSS() - baseline,
+        "metrics": metrics.snapshot(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        default=["PubMed", "ACS", "download"],
+        help="PubMed ACS download translate",
+    )
+    parser.add_argument("--papers", type=int, default=2000, help="papers fetched by spiders")
+    parser.add_argument("--downloads", type=int, default=200, help="pdfs downloaded")
+    parser.add_argument("--latency", type=float, default=MockOptions.latency)
+    parser.add_argument("--error-rate", type=float, default=MockOptions.error_rate)
+    parser.add_argument("--pdf-size", type=int, default=MockOptions.pdf_size)
+    parser.add_argument("--rate", type=float, default=1000, help="requests/s allowed by limiter")
+    parser.add_argument("--connections", type=int, default=8, help="connections to the server")
+    parser.add_argument(
+        "--parse-pool", choices=["", "thread", "process"], default="thread", help="PARSE_POOL"
+    )
+    parser.add_argument("--json", type=Path, help="append results as json lines")
+    args = parser.parse_args()
+
+    options = MockOptions(latency=args.latency, error_rate=args.error_rate, pdf_size=args.pdf_size)
+    server, url = startServer(options)
+    columns = ["items", "requests", "errors", "seconds", "items/s", "req/s"]
+    columns += ["p50 ms", "p99 ms", "peak MiB"]
+    print(f"{'case':<10}" + "".join(f"{column:>10}" for column in columns))
+    try:
+        for case in args.cases:
+            num = args.downloads if case == "download" else args.papers
+            with ProcessPoolExecutor(1) as executor:
+                result = executor.submit(
+                    runCase,
+                    case,
+                    url,
+                    num,
+                    args.rate,
+                    args.connections,
+                    args.parse_pool,
+                    args.latency,
+                ).result()
+            print(
+                f"{case:<10}"
+                + "".join(
+                    f"{value:>10.1f}" if isinstance(value, float) else f"{value:>10}"
+                    for value in (result[column] for column in columns)
+                )
+            )
+            if args.json:
+                result["options"] = vars(options) | {"parse_pool": args.parse_pool}
+                with args.json.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(result) + "\n")
+    finally:
+        server.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
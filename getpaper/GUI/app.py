@@ -1,12 +1,15 @@
 import logging
+from asyncio import run_coroutine_threadsafe
 from threading import Thread
 
 import ttkbootstrap as ttk
 
-from getpaper.config import APP_NAME, FONT, FRAME_STYLE, LOOP
+from getpaper.config import APP_NAME, CLIENT_TIMEOUT, FONT, FRAME_STYLE, LOOP
+from getpaper.GUI.dispatcher import dispatcher
 from getpaper.GUI.main_frame import MainFrame
 from getpaper.GUI.menu import MenuBar
 from getpaper.GUI.result_frame import ResultFrame
+from getpaper.utils import closeClients
 
 log = logging.getLogger("GetPaper")
 
@@ -31,8 +34,15 @@ class Application:
 
         menu = MenuBar(self)
         self.master["menu"] = menu
+        # UI updates of tasks in the loop thread are run by the Tk thread
+        dispatcher.start(self.master)
 
     def run(self) -> None:
         """Run the App"""
         Thread(target=LOOP.run_forever, daemon=True, name="TasksThread").start()
         self.master.mainloop()
+        # Close connections of the shared client after the window is closed
+        try:
+            run_coroutine_threadsafe(closeClients(), LOOP).result(CLIENT_TIMEOUT)
+        except Exception:
+            log.exception("Close client error")
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import tkinter as tk
 from pathlib import Path
@@ -10,9 +9,10 @@ from ttkbootstrap import Button, Combobox, Frame, Scrollbar
 
 from getpaper.config import FONT, FRAME_STYLE, RESULT_LIST_CN, RESULT_LIST_EN, translator_list
 from getpaper.download import Downloader
+from getpaper.GUI.dispatcher import dispatcher, onTk
 from getpaper.GUI.tip_frame import TipFrame
 from getpaper.spiders._spider import PaperDetail
-from getpaper.utils import getTranslator, startTask
+from getpaper.utils import TipException, getTranslator, startTask
 
 log = logging.getLogger("GetPaper")
 
@@ -31,6 +31,7 @@ class TextFrame(Frame):
         vbar.grid(row=0, column=1, sticky=tk.NS)
         self.headers = RESULT_LIST_EN if language == "en" else RESULT_LIST_CN
 
+    @onTk()
     def show(self, contents: PaperDetail | str) -> None:
         """
         Print the detail and corresponding header on the text frame
@@ -111,8 +112,11 @@ class DetailWindow(tk.Toplevel):
         self.choose.selection_clear()
         log.info(f"choose translator: {self.choose.get()}")
 
-    @startTask("Download_Paper")
-    async def download(self) -> None:
+    def showTip(self, text: str) -> None:
+        self.tip.grid(row=0, column=5, columnspan=3, sticky=tk.EW)
+        self.tip.setTip(text)
+
+    def download(self) -> None:
         """Download this paper"""
 
         filename = asksaveasfilename(
@@ -123,37 +127,47 @@ class DetailWindow(tk.Toplevel):
             return
 
         self.download_button.state(["disabled"])
-        self.tip.grid(row=0, column=5, columnspan=3, sticky=tk.EW)
-        self.tip.setTip("下载中...")
-        monitor = Queue()
-        task = asyncio.create_task(
-            self.downloader.download(self.detail[5], monitor, Path(filename), 0)
-        )
-        _filenam, status = monitor.get()
-        self.tip.setTip(status if status else "下载完成")
-        await task
-        self.tip.bar.stop()
-        self.download_button.state(["!disabled"])
+        self.showTip("下载中...")
+        self.tip.setBusy(True)
+        self.fetchPDF(Path(filename))
 
-    @startTask("Translate")
-    async def translate(self) -> None:
+    @startTask("Download_Paper")
+    async def fetchPDF(self, file: Path) -> None:
+        monitor = Queue()
+        try:
+            await self.downloader.download(self.detail.doi, monitor, file)
+            _file, status = monitor.get_nowait()
+        except Exception:
+            log.exception(f"Download {file} failed")
+            status = "未知错误"
+        self.tip.setTip(status)
+        self.tip.setBusy(False)
+        dispatcher.call(self.download_button.state, ["!disabled"])
+
+    def translate(self) -> None:
         """Translate this paper's title and abstract by selected translator"""
 
         log.info(f"translate by : {self.translator.__module__}")
         self.trans_button.state(["disabled"])
         # Show TipBar
-        self.tip.grid(row=0, column=5, columnspan=3, sticky=tk.EW)
-        self.tip.setTip("翻译中...")
-        self.tip.bar.start()
+        self.showTip("翻译中...")
+        self.tip.setBusy(True)
+        self.translateDetail()
+
+    @startTask("Translate")
+    async def translateDetail(self) -> None:
         try:
             zh_detail = list(self.detail)  # change tuple to list
-            zh_detail[0] = await self.translator.translate(self.detail[0])
-            zh_detail[4] = await self.translator.translate(self.detail[4])
+            zh_detail[0], zh_detail[4] = await self.translator.translateMany(
+                [self.detail[0], self.detail[4]]
+            )
             self.ch_text.show(PaperDetail(*zh_detail))
+        except TipException as e:
+            self.ch_text.show(e.tip)
         except Exception as e:
             self.ch_text.show(str(e))
         finally:
-            self.tip.bar.stop()
+            self.tip.setBusy(False)
             # Close TipBar
-            self.tip.grid_remove()
-            self.trans_button.state(["!disabled"])
+            dispatcher.call(self.tip.grid_remove)
+            dispatcher.call(self.trans_button.state, ["!disabled"])
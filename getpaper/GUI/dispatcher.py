@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import tkinter as tk
+from concurrent.futures import Future
+from functools import partial, wraps
+from threading import Lock, current_thread, main_thread
+from typing import Any, Callable, Hashable
+
+from getpaper.config import UI_REFRESH
+
+log = logging.getLogger("GetPaper")
+
+
+class Dispatcher:
+    master: tk.Misc | None
+
+    def __init__(self) -> None:
+        """
+        Run calls from the loop thread on the Tk thread. Calls are collected and run in one batch
+        every UI_REFRESH milliseconds, calls with the same key are coalesced so only the latest
+        one runs, e.g. progress updated hundreds of times between two batches is drawn once.
+        """
+        self.master = None
+        self.lock = Lock()
+        self.pending: dict[Hashable, Callable[[], Any]] = {}
+
+    def start(self, master: tk.Misc) -> None:
+        """Start running batches by master.after, must be called on the Tk thread"""
+        self.master = master
+        self.master.after(UI_REFRESH, self.flush)
+
+    def call(self, func: Callable[..., Any], *args, key: Hashable = None, **kwargs) -> None:
+        """
+        Run func on the Tk thread, immediately if already there
+
+        Args:
+            key: calls with the same key replace the pending one, None to never coalesce
+        """
+        if self.master is None or current_thread() is main_thread():
+            func(*args, **kwargs)
+            return
+        with self.lock:
+            self.pending[object() if key is None else key] = partial(func, *args, **kwargs)
+
+    async def run[T](self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run func on the Tk thread and wait for its result, for reading widgets in a task"""
+        future: Future[T] = Future()
+
+        def call() -> None:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.call(call)
+        return await asyncio.wrap_future(future)
+
+    def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for call in pending.values():
+            try:
+                call()
+            except Exception:
+                log.exception("UI update error")
+        self.master.after(UI_REFRESH, self.flush)  # type: ignore
+
+
+dispatcher = Dispatcher()
+
+
+def onTk(coalesce: bool = False):
+    """
+    A decorator for widget methods called by tasks, the method is run by dispatcher on the Tk
+    thread. With coalesce only the latest call of each widget runs in a batch, use it for
+    methods setting a state like a tip or progress.
+    """
+
+    def middle[**P](func: Callable[P, Any]) -> Callable[P, None]:
+        @wraps(func)
+        def wrapped(*args: P.args, **kwargs: P.kwargs) -> None:
+            key = (func, args[0]) if coalesce else None
+            dispatcher.call(func, *args, key=key, **kwargs)
+
+        return wrapped
+
+    return middle
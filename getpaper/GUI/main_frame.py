@@ -1,18 +1,20 @@
 import asyncio
 import logging
-from contextlib import suppress
-from queue import PriorityQueue, Queue
+from queue import Queue
+from time import time
 from tkinter import Event
-from typing import ClassVar
+from typing import AsyncIterable, ClassVar
 
 import ttkbootstrap as ttk
 from ttkbootstrap import Button, Combobox, Entry, Frame, Label, Spinbox, constants
 
 from getpaper.config import DEFAULT_SCI_HUB_URL, SORTED_BY, TIP_REFRESH, spider_list
+from getpaper.GUI.dispatcher import dispatcher, onTk
 from getpaper.GUI.result_frame import ResultFrame
 from getpaper.GUI.tip_frame import TipFrame
-from getpaper.spiders._spider import PaperDetail, _Spider
-from getpaper.utils import getSpider, startTask
+from getpaper.searches import SearchRun
+from getpaper.spiders._spider import PaperDetail, ResultStream, _Spider
+from getpaper.utils import TipException, getSpider, startTask
 
 log = logging.getLogger("GetPaper")
 
@@ -117,95 +119,145 @@ class MainFrame(Frame):
         if not self.engine.get():
             self.tip.setTip("未选择搜索引擎")
             return
-        self.spider = getSpider(
-            name=self.engine.get(),
-            keyword=self.keyword.get(),
-            start_year=self.start_year.get(),
-            end_year=self.end_year.get(),
-            author=self.author.get(),
-            journal=self.journal.get(),
-            sorting=self.sorting.get(),
-        )
+        self.spider = getSpider(name=self.engine.get(), **self.searchArgs())
         log.info(f"Init this spider: {self.engine.get()}")
         self.engine.selection_clear()
 
-    @startTask("Search")
-    async def search(self) -> None:
-        """Get the total number of search result"""
+    def searchArgs(self) -> dict[str, str]:
+        return {
+            "keyword": self.keyword.get(),
+            "start_year": self.start_year.get(),
+            "end_year": self.end_year.get(),
+            "author": self.author.get(),
+            "journal": self.journal.get(),
+            "sorting": self.sorting.get(),
+        }
+
+    def search(self) -> None:
+        """Get the total number of search result, widgets are read here on the Tk thread"""
         if not hasattr(self, "spider"):
             self.tip.setTip("未选择搜索引擎")
             return
 
         self.search_button.state(["disabled"])
         self.tip.setTip("搜索中")
-        self.tip.bar.start()
+        self.tip.setBusy(True)
+        self.fetchTotal(self.searchArgs())
+
+    @startTask("Search")
+    async def fetchTotal(self, args: dict[str, str]) -> None:
         try:
-            self.spider.parseData(
-                keyword=self.keyword.get(),
-                start_year=self.start_year.get(),
-                end_year=self.end_year.get(),
-                author=self.author.get(),
-                journal=self.journal.get(),
-                sorting=self.sorting.get(),
-            )
+            self.spider.data = self.spider.parseData(**args)
             result = await self.spider.getTotalPaperNum()
             self.tip.setTip(f"共找到{result}篇文献")
             self.total_num = result
-            self.num.delete(0, "end")
-            self.num.insert(0, str(result))
+            self.setNum(result)
         except Exception:
             log.exception("Setting spider error")
             self.tip.setTip("搜索出错")
         finally:
-            self.tip.bar.stop()
-            self.search_button.state(["!disabled"])
+            self.tip.setBusy(False)
+            dispatcher.call(self.search_button.state, ["!disabled"])
 
-    @startTask("FetchDetail")
-    async def getDetail(self) -> None:
+    @onTk()
+    def setNum(self, num: int) -> None:
+        self.num.delete(0, "end")
+        self.num.insert(0, str(num))
+
+    def getDetail(self) -> None:
         """
         Download paper details, include:
         Title, Authors, Date, Publication, Abstract, doi, Url
         """
+        if not hasattr(self, "total_num"):
+            self.tip.setTip("请先搜索")
+            return
+        try:
+            num = min(max(0, int(self.num.get())), self.total_num)
+        except ValueError:
+            self.tip.setTip("文献数量无效")
+            return
 
         self.download_button.state(["disabled"])
         self.tip.setTip("准备中...")
-        num = min(max(0, int(self.num.get())), self.total_num)
+        self.result_frame.clear()
+        self.fetchDetail(num)
+
+    @startTask("FetchDetail")
+    async def fetchDetail(self, num: int) -> None:
         log.info(f"Fetch num: {num}")
-        result = PriorityQueue(num)
+        tip = await self.showResults(ResultStream(self.spider, num), num)
+        self.tip.setTip(tip or f"抓取完成， 共{len(self.result)}篇")
+        dispatcher.call(self.download_button.state, ["!disabled"])
 
-        monitor_task = asyncio.create_task(
-            self.monitor(result, num), name=f"{self.engine.get()} Fetch"
-        )
+    def fetchNew(self, name: str) -> None:
+        """Show the papers found by a saved search since its last run"""
+        self.download_button.state(["disabled"])
+        self.tip.setTip("搜索中")
+        self.tip.setBusy(True)
+        self.fetchSavedSearch(name)
+
+    @startTask("FetchNew")
+    async def fetchSavedSearch(self, name: str) -> None:
         try:
-            await self.spider.getAllPapers(result, num)
+            run = SearchRun(name)
+            num = await run.search()
+        except TipException as e:
+            tip = e.tip
         except Exception:
-            log.exception("Get Detail Error")
-            self.tip.setTip("获取详情出错")
+            log.exception(f"Saved search {name} error")
+            tip = "搜索出错"
+        else:
+            self.result_frame.clear()
+            tip = await self.showResults(run, num) or f"共{num}篇新文献"
         finally:
-            monitor_task.cancel()
-            self.tip.setTip("获取结束")
-            self.result.clear()
-            while not result.empty():
-                self.result.append(result.get()[1])
-            self.tip.setTip(f"抓取完成， 共{len(self.result)}篇")
-
-        with suppress(asyncio.CancelledError):
-            await monitor_task
-        self.tip.bar.stop()
-        self.result_frame.createForm(self.result)
-        self.download_button.state(["!disabled"])
-
-    async def monitor(self, monitor_queue: Queue, total: int) -> None:
+            self.tip.setBusy(False)
+        self.tip.setTip(tip)
+        dispatcher.call(self.download_button.state, ["!disabled"])
+
+    async def showResults(self, results: AsyncIterable[tuple[int, PaperDetail]], num: int) -> str:
+        """Replace the results by results as they arrive, returns the tip of an error if any"""
+        self.result.clear()
+
+        # Rows are sent to the table in batches, the spider never waits for drawing
+        rows: list[PaperDetail] = []
+        last = 0.0
+        try:
+            async for _, detail in results:
+                rows.append(detail)
+                if time() - last > TIP_REFRESH:
+                    last = time()
+                    self.showRows(rows, num)
+                    rows = []
+        except TipException as e:
+            tip = e.tip
+        except Exception:
+            log.exception("Get Detail Error")
+            tip = "获取详情出错"
+        else:
+            tip = ""
+        self.showRows(rows, num)
+        return tip
+
+    def showRows(self, rows: list[PaperDetail], total: int) -> None:
+        """Append rows to the result table and show progress"""
+        self.result.extend(rows)
+        self.result_frame.appendRows(rows)
+        self.tip.setTip(f"下载中：{len(self.result)}/{total}")
+        self.tip.setProgress(100 * len(self.result) / total if total else 100)
+
+    async def monitor(self, monitor_queue: Queue, total: int, label: str = "下载中") -> None:
         """
         Monitor progress by the size of Queue, progress = queue.qsize / total
         Args:
             monitor_queue: Queue to monitor.
             total: the max size of the Queue
+            label: shown before the progress
         """
 
         # start progress bar
         while not monitor_queue.full():
             size = monitor_queue.qsize()
-            self.tip.setTip(f"下载中：{size}/{total}")
-            self.tip.bar["value"] = 100 * size / total
+            self.tip.setTip(f"{label}：{size}/{total}")
+            self.tip.setProgress(100 * size / total)
             await asyncio.sleep(TIP_REFRESH)
@@ -1,22 +1,38 @@
-import csv
+import asyncio
 import logging
 import webbrowser
+from concurrent.futures import Future
 from pathlib import Path
 from queue import Queue
 from tkinter.filedialog import askdirectory, askopenfile, asksaveasfilename
-from typing import TYPE_CHECKING
+from tkinter.simpledialog import askstring
+from typing import TYPE_CHECKING, Sequence
 
 import ttkbootstrap as ttk
 
-from getpaper.config import PROJECT_URL, RESULT_LIST_EN
-from getpaper.download import SciHubDownloader
-from getpaper.utils import MyThread, startTask
+from getpaper.config import DEFAULT_TRANSLATOR, PROJECT_URL, exporter_list
+from getpaper.download import SciHubDownloader, detailsFromDOIs
+from getpaper.jobs import FAILED, UNFINISHED
+from getpaper.searches import saveSearch
+from getpaper.spiders._spider import PaperDetail
+from getpaper.translator._translator import translateDetails
+from getpaper.utils import (
+    TipException,
+    getExporter,
+    getJournal,
+    getSearchStore,
+    getTranslator,
+    startTask,
+)
 
 if TYPE_CHECKING:
     from getpaper.GUI.main_frame import MainFrame
 
 log = logging.getLogger("GetPaper")
 
+# csv first as the default of file dialogs
+FILE_TYPES = [(name, f".{name}") for name in sorted(exporter_list, key=lambda name: name != "csv")]
+
 
 class MenuBar(ttk.Menu):
     def __init__(self, app):
@@ -30,39 +46,106 @@ class MenuBar(ttk.Menu):
         # for calling main_frame's function
         self.main_frame: MainFrame = app.main_frame
         self.tip = self.main_frame.tip
+        self.download_task: Future | None = None
+        self.translate_task: Future | None = None
         self.add_command(label="数据导出", command=self.saveToFile)
+        self.add_command(label="全部翻译", command=self.translateAll)
         self.add_command(label="全部下载", command=self.downloadAll)
         self.add_command(label="通过DOI下载", command=self.downloadByDoiFile)
+        jobs_menu = ttk.Menu(self)
+        jobs_menu.add_command(label="暂停下载", command=self.pauseDownload)
+        jobs_menu.add_command(label="继续下载", command=self.resumeDownload)
+        jobs_menu.add_command(label="重试失败", command=lambda: self.resumeDownload(True))
+        self.add_cascade(label="下载任务", menu=jobs_menu)
+        searches_menu = ttk.Menu(self)
+        searches_menu.add_command(label="保存当前搜索", command=self.saveSearch)
+        searches_menu.add_command(label="检索新文献", command=self.updateSearch)
+        self.add_cascade(label="保存的搜索", menu=searches_menu)
         self.add_command(label="使用说明", command=self.help)
 
+    def saveToFile(self) -> None:
+        """Save search result to a file, the format is chosen by suffix"""
+
+        if not self.main_frame.result:
+            # ensure searching has been done
+            self.tip.setTip("无搜索结果")
+            return
+
+        if filename := asksaveasfilename(defaultextension=".csv", filetypes=FILE_TYPES):
+            self.writeFile(Path(filename), list(self.main_frame.result))
+
     @startTask("Save_File")
-    async def saveToFile(self) -> None:
+    async def writeFile(
+        self,
+        filename: Path,
+        details: list[PaperDetail],
+        extra: dict[str, Sequence[str]] | None = None,
+    ) -> None:
         """
-        Save search result to csv file
         Args:
-            filename: Name of csv file to save
+            filename: Name of file to save, its exporter is chosen by suffix
+            details: Search result
+            extra: Columns written after details, {header: values of each detail}
         """
+        log.info(f"Save file to file: {filename}")
+        extra = extra or {}
 
-        if not hasattr(self.main_frame, "result"):
-            # ensure searching has been done
+        def write() -> None:
+            with getExporter(filename, list(extra)) as exporter:
+                for detail, *values in zip(details, *extra.values()):
+                    exporter.write(detail, *values)
+
+        try:
+            await asyncio.to_thread(write)
+            self.tip.setTip("保存成功")
+        except TipException as e:
+            self.tip.setTip(e.tip)
+        except Exception:
+            log.exception(f"Save {filename} failed")
+            self.tip.setTip("保存失败")
+
+    def translateAll(self) -> None:
+        """Translate titles and abstracts of all results, saved after the originals to a file"""
+        if not self.main_frame.result:
             self.tip.setTip("无搜索结果")
             return
+        if self.translate_task is not None and not self.translate_task.done():
+            self.tip.setTip("正在翻译中")
+            return
 
-        if filename := asksaveasfilename(defaultextension=".csv", filetypes=[("csv", ".csv")]):
-            filename = Path(filename)
-            log.info(f"Save file to file: {filename}")
-            try:
-                with filename.open("w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([s.strip(":\n\t") for s in RESULT_LIST_EN])
-                    writer.writerows(self.main_frame.result)
-                self.tip.setTip("保存成功")
-            except Exception:
-                log.exception(f"Save {filename} failed")
-                self.tip.setTip("保存失败")
+        if filename := asksaveasfilename(defaultextension=".csv", filetypes=FILE_TYPES):
+            self.tip.setTip("翻译中...")
+            self.translate_task = self.translateResults(
+                Path(filename), list(self.main_frame.result)
+            )
 
-    @startTask("DownloadPapers")
-    async def downloadAll(self, details=None) -> None:
+    @startTask("TranslateAll")
+    async def translateResults(self, filename: Path, details: list[PaperDetail]) -> None:
+        log.info(f"Translate {len(details)} papers by {DEFAULT_TRANSLATOR}")
+        total = len(details)
+        monitor_queue = Queue(maxsize=total)
+        monitor = asyncio.create_task(self.main_frame.monitor(monitor_queue, total, "翻译中"))
+        try:
+            translator = getTranslator(DEFAULT_TRANSLATOR)
+            translations = await translateDetails(translator, details, monitor_queue)
+        except TipException as e:
+            self.tip.setTip(e.tip)
+            return
+        except Exception:
+            log.exception("Translate error")
+            self.tip.setTip("翻译失败")
+            return
+        finally:
+            monitor.cancel()
+            self.tip.setProgress(100 * monitor_queue.qsize() / total)
+        titles, abstracts = zip(*translations)
+        extra = {
+            f"Title ({translator.target})": titles,
+            f"Abstract ({translator.target})": abstracts,
+        }
+        self.writeFile(filename, details, extra)
+
+    def downloadAll(self, details: list[PaperDetail] | None = None) -> None:
         """
         Using SciHubDownloader to get PDFs of all results to specified directory
         Args:
@@ -72,56 +155,112 @@ class MenuBar(ttk.Menu):
             if not self.main_frame.result:
                 self.tip.setTip("无搜索结果")
                 return
-            details = self.main_frame.result
+            details = list(self.main_frame.result)
 
-        if not (target_dir := askdirectory()):
+        if self.downloading() or not (target_dir := askdirectory()):
             return
 
-        log.info(f"Downloading all paper to directory: {Path(target_dir).absolute()}")
+        self.tip.setTip("准备下载中...")
+        url = self.main_frame.scihub_url.get()
+        self.download_task = self.multiDownload(details, Path(target_dir), url)
+
+    def downloading(self) -> bool:
+        """Only one download job runs at a time"""
+        if self.download_task is not None and not self.download_task.done():
+            self.tip.setTip("正在下载中")
+            return True
+        return False
 
+    def pauseDownload(self) -> None:
+        """Cancel the running job, the papers left are kept in journal for resumeDownload"""
+        if self.download_task is None or self.download_task.done():
+            self.tip.setTip("没有进行中的下载")
+            return
+        self.download_task.cancel()
+        self.tip.setTip("下载已暂停")
+
+    def resumeDownload(self, retry_failed: bool = False) -> None:
+        """Continue the latest unfinished download job, and its failed papers if retry_failed"""
+        if self.downloading():
+            return
+        states = [*UNFINISHED, FAILED] if retry_failed else UNFINISHED
+        if (job := getJournal().latest(states)) is None:
+            self.tip.setTip("没有失败的文献" if retry_failed else "没有未完成的下载")
+            return
         self.tip.setTip("准备下载中...")
-        monitor_queue = Queue(maxsize=len(details))
+        url = self.main_frame.scihub_url.get()
+        self.download_task = self.resumeJob(job.id, url, retry_failed)
 
-        try:
-            # create a queue for monitor progress of download
-            downloader = SciHubDownloader(self.main_frame.scihub_url.get())
-            MyThread(
-                tip_set=self.tip.setTip,
-                target=downloader.multiDownload,
-                args=(details, monitor_queue, target_dir),
-                name="Multi-Download",
-            ).start()
+    @startTask("DownloadPapers")
+    async def multiDownload(self, details: list[PaperDetail], target_dir: Path, url: str) -> None:
+        log.info(f"Downloading all paper to directory: {target_dir.absolute()}")
+        job = await asyncio.to_thread(getJournal().create, details, target_dir)
+        await self.downloadJob(job, url)
 
-            await self.main_frame.monitor(monitor_queue, len(details))
+    @startTask("ResumeDownload")
+    async def resumeJob(self, job: int, url: str, retry_failed: bool) -> None:
+        log.info(f"Resume download job {job}")
+        await self.downloadJob(job, url, retry_failed)
 
+    async def downloadJob(self, job: int, url: str, retry_failed: bool = False) -> None:
+        states = [*UNFINISHED, FAILED] if retry_failed else UNFINISHED
+        total = len(await asyncio.to_thread(getJournal().items, job, states))
+        if not total:
+            self.tip.setTip("没有需要下载的文献")
+            return
+        # create a queue for monitor progress of download
+        monitor_queue = Queue(maxsize=total)
+        monitor = asyncio.create_task(self.main_frame.monitor(monitor_queue, total))
+        try:
+            await SciHubDownloader(url).downloadJob(job, monitor_queue, retry_failed)
+            info = await asyncio.to_thread(getJournal().get, job)
+            failed = info.states[FAILED]  # type: ignore
+            self.tip.setTip(f"{failed}篇下载失败" if failed else "下载结束")
+        except TipException as e:
+            self.tip.setTip(e.tip)
+        except Exception:
+            log.exception("Download error")
+            self.tip.setTip("未知错误")
         finally:
-            self.tip.setTip("下载结束")
-            self.tip.bar.stop()
+            monitor.cancel()
+            self.tip.setProgress(100 * monitor_queue.qsize() / total)
 
     def downloadByDoiFile(self) -> None:
         """
         Using SciHubDownloader to get PDFs from a txt file, each line represent a doi in this file.
-        A detail list is used to call SciHubDownloader.multiDownload():
-            detail[0] is paper's title (as save filename), default to doi
-            detail[-2] is doi for download
+        Papers found in local store are saved by title, others by doi.
         """
 
         if file := askopenfile(filetypes=[("文本文件", ".txt")]):
             dois = file.readlines()
-            details = []
             log.info(f"Open file: {file.name}\nNumber of lines:{len(dois)}")
-
-            for doi in dois:
-                if not doi:
-                    continue
-                if not doi.startswith("10."):
-                    # all valid doi start with "10."
-                    continue
-                # create a detail list, detail[0] = title(as filename), detail[-2] = doi
-                details.append([doi.strip(), None, doi.strip(), None])
-
+            # all valid doi start with "10."
+            details = detailsFromDOIs(dois)
             log.info(f"Number of loaded doi: {len(details)}")
             self.downloadAll(details)
 
+    def saveSearch(self) -> None:
+        """Save the search conditions, later runs of it only fetch new papers"""
+        if not (engine := self.main_frame.engine.get()):
+            self.tip.setTip("未选择搜索引擎")
+            return
+        params = self.main_frame.searchArgs()
+        if not (name := askstring("保存当前搜索", "搜索名称：", initialvalue=params["keyword"])):
+            return
+        try:
+            saveSearch(name, engine, params)
+            self.tip.setTip(f"已保存搜索：{name}")
+        except TipException as e:
+            self.tip.setTip(e.tip)
+
+    def updateSearch(self) -> None:
+        """Fetch papers found by a saved search since its last run"""
+        if not (names := [search.name for search in getSearchStore().searches()]):
+            self.tip.setTip("没有保存的搜索")
+            return
+        prompt = "搜索名称：\n" + "\n".join(names)
+        if name := askstring("检索新文献", prompt, initialvalue=names[0]):
+            self.main_frame.fetchNew(name)
+
     def help(self) -> None:
         webbrowser.open_new_tab(PROJECT_URL)
@@ -1,4 +1,5 @@
-from typing import cast
+import tkinter as tk
+from typing import Iterable
 
 import ttkbootstrap as ttk
 from ttkbootstrap import Frame, Scrollbar, Treeview, constants
@@ -6,10 +7,15 @@ from ttkbootstrap import Frame, Scrollbar, Treeview, constants
 from getpaper.config import DEFAULT_SCI_HUB_URL
 from getpaper.download import SciHubDownloader
 from getpaper.GUI.detail_window import DetailWindow
+from getpaper.GUI.dispatcher import onTk
 from getpaper.spiders._spider import PaperDetail
 
 
 class ResultFrame(Frame):
+    rows: list[PaperDetail]  # all results, only the visible part is inserted into the tree
+    offset: int  # index of the row shown at the top of the tree
+    selected: int | None  # index of the selected row
+
     def __init__(self, master: ttk.Window, **kwargs) -> None:
         super().__init__(master, **kwargs)
         self.grid(row=1, sticky=constants.NSEW)
@@ -26,35 +32,121 @@ class ResultFrame(Frame):
             self.tree.heading(head, text=head)
         self.tree.grid(row=0, sticky=constants.NSEW)
 
-        # Add vertical scroll bar
-        vbar = Scrollbar(self, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vbar.set)
-        vbar.grid(row=0, column=1, sticky=constants.NS)
+        # Add vertical scroll bar, which scrolls rows instead of the tree
+        self.vbar = Scrollbar(self, orient="vertical", command=self.scroll)
+        self.vbar.grid(row=0, column=1, sticky=constants.NS)
+
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<<TreeviewSelect>>", self.select)
+        self.tree.bind(
+            "<MouseWheel>", lambda e: self.scroll("scroll", -3 if e.delta > 0 else 3, "units")
+        )
+        self.tree.bind("<Button-4>", lambda e: self.scroll("scroll", -3, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll("scroll", 3, "units"))
+        self.tree.bind("<Up>", lambda e: self.moveSelection(-1))
+        self.tree.bind("<Down>", lambda e: self.moveSelection(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll("scroll", -1, "pages"))
+        self.tree.bind("<Next>", lambda e: self.scroll("scroll", 1, "pages"))
 
         # Display detail window by double click
         self.tree.bind("<Double-Button-1>", lambda e: self.showItem())
         # default downloader
         self.downloader = SciHubDownloader(DEFAULT_SCI_HUB_URL)
 
+    @property
+    def visible(self) -> int:
+        """Number of rows the tree can show at its current height"""
+        style = str(self.tree.cget("style")) or "Treeview"
+        row_height = int(float(ttk.Style().lookup(style, "rowheight") or 20))
+        # The heading takes about one row
+        return max(1, self.tree.winfo_height() // row_height - 1)
+
+    def refresh(self) -> None:
+        """Fill the tree with the rows from offset, reusing the existing items"""
+        visible = self.visible
+        self.offset = max(0, min(self.offset, len(self.rows) - visible))
+        count = min(visible, len(self.rows) - self.offset)
+
+        items = self.tree.get_children()
+        if len(items) > count:
+            self.tree.delete(*items[count:])
+        for i in range(len(items), count):
+            self.tree.insert("", i)
+        items = self.tree.get_children()
+
+        for i, item in enumerate(items):
+            self.tree.item(item, values=self.rows[self.offset + i][:4])
+
+        if self.selected is not None and 0 <= self.selected - self.offset < count:
+            self.tree.selection_set(items[self.selected - self.offset])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if self.rows:
+            self.vbar.set(self.offset / len(self.rows), (self.offset + count) / len(self.rows))
+        else:
+            self.vbar.set(0, 1)
+
+    def scroll(self, action: str, value: str | float, unit: str = "units") -> str:
+        """Command of the scroll bar, also used by mouse wheel and keys"""
+        if action == "moveto":
+            self.offset = int(float(value) * len(self.rows))
+        elif unit == "pages":
+            self.offset += int(value) * self.visible
+        else:
+            self.offset += int(value)
+        self.refresh()
+        return "break"
+
+    def select(self, event: tk.Event) -> None:
+        if selection := self.tree.selection():
+            self.selected = self.offset + self.tree.index(selection[0])
+
+    def moveSelection(self, step: int) -> str:
+        """Move selection by keyboard, scrolling when it leaves the visible rows"""
+        if self.selected is None or not self.rows:
+            return "break"
+        self.selected = max(0, min(self.selected + step, len(self.rows) - 1))
+        if self.selected < self.offset:
+            self.offset = self.selected
+        elif self.selected >= self.offset + self.visible:
+            self.offset = self.selected - self.visible + 1
+        self.refresh()
+        return "break"
+
+    @onTk()
+    def appendRows(self, rows: Iterable[PaperDetail]) -> None:
+        """Add results to the end, only the visible part of the tree is updated"""
+        self.rows.extend(rows)
+        self.refresh()
+
+    @onTk()
+    def clear(self) -> None:
+        self.rows = []
+        self.offset = 0
+        self.selected = None
+        self.refresh()
+
     def createForm(self, data: list[PaperDetail]) -> None:
         """
         Display search result on the result form.
         Args:
             data: Result sequence, each item's format is
-                  (index, (title, authors, date, publication, abstract, doi, web))
+                  (title, authors, date, publication, abstract, doi, web)
         """
 
-        # remove previous result
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        # insert results
-        for i, item in enumerate(data):
-            self.tree.insert("", i, values=item)
+        self.clear()
+        self.appendRows(data)
 
     def showItem(self) -> None:
         """The binding function of double click, display detail window."""
 
-        detail = cast(PaperDetail, self.tree.item(self.tree.selection()[0], "values"))
+        if self.selected is None:
+            return
+        detail = PaperDetail(*self.rows[self.selected])
         sci_url = self.master.children["!mainframe"].scihub_url.get()  # type: ignore
         self.downloader.set_url(sci_url)
         DetailWindow(detail, self.downloader)
@@ -1,6 +1,8 @@
 import ttkbootstrap as ttk
 from ttkbootstrap import Frame, Label, Progressbar, constants
 
+from getpaper.GUI.dispatcher import onTk
+
 
 class TipFrame(Frame):
     def __init__(self, master: ttk.Frame) -> None:
@@ -11,5 +13,18 @@ class TipFrame(Frame):
         self.bar = Progressbar(self, style="info.Striped.Horizontal.TProgressbar")
         self.bar.grid(row=0, column=1, sticky=constants.EW)
 
+    @onTk(coalesce=True)
     def setTip(self, text: str) -> None:
         self.label["text"] = text
+
+    @onTk(coalesce=True)
+    def setProgress(self, percent: float) -> None:
+        self.bar["value"] = percent
+
+    @onTk(coalesce=True)
+    def setBusy(self, busy: bool) -> None:
+        """Animate the bar while the progress is unknown"""
+        if busy:
+            self.bar.start()
+        else:
+            self.bar.stop()
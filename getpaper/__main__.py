@@ -0,0 +1,5 @@
+import sys
+
+from getpaper.cli import main
+
+sys.exit(main())
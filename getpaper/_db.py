@@ -0,0 +1,26 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+
+def chunks[T](items: Sequence[T], size: int = 500) -> Iterator[Sequence[T]]:
+    """Split items to stay under the variable limit of SQLite"""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+@contextmanager
+def transaction(db: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    Run the statements of the block in one transaction, rolled back if anything raises,
+    so the connection is never left in an open transaction. db must be in autocommit mode,
+    use it holding the lock of db.
+    """
+    db.execute("BEGIN")
+    try:
+        yield db
+        db.execute("COMMIT")
+    except BaseException:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
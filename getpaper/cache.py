@@ -0,0 +1,167 @@
+import json
+import logging
+import re
+import sqlite3
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any, Mapping
+from urllib.parse import urlencode, urlsplit
+
+log = logging.getLogger("GetPaper")
+
+# Only pages are cached, PDFs and other files are left to the downloader
+CACHEABLE_TYPES = ("text/", "application/json", "application/xml", "application/xhtml")
+
+
+def cacheKey(method: str, url: str, params: Any = None) -> str:
+    """Key of a request, params are sorted so the order of a dict does not matter"""
+    if isinstance(params, Mapping):
+        params = sorted((str(k), str(v)) for k, v in params.items())
+    query = urlencode(params or [])
+    return sha256(f"{method.upper()} {url}?{query}".encode()).hexdigest()
+
+
+class CachedResponse:
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, headers: dict[str, str], content: bytes):
+        """A response restored from cache, provides the attributes of curl_cffi Response we use"""
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def encoding(self) -> str:
+        match = re.search(r"charset=([\w-]+)", self.headers.get("content-type", ""))
+        return match.group(1) if match else "utf-8"
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    def __init__(self, path: Path, ttl: dict[str, float], default_ttl: float, max_size: int):
+        """
+        Responses cached in a SQLite database, evicting the least recently used ones
+
+        Args:
+            path: database file
+            ttl: seconds a response stays fresh, {host or host/path prefix: seconds}, 0 disables
+                cache of the urls
+            default_ttl: seconds for urls not in ttl
+            max_size: max bytes of all cached bodies
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+            """
+        )
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def getTTL(self, url: str) -> float:
+        """Seconds a response of url stays fresh, set by the longest key of ttl matching url"""
+        parts = urlsplit(url)
+        matched, ttl = -1, self.default_ttl
+        for key, seconds in self.ttl.items():
+            host, _, path = key.partition("/")
+            if host == parts.hostname and parts.path.startswith(f"/{path}") and len(key) > matched:
+                matched, ttl = len(key), seconds
+        return ttl
+
+    def get(self, key: str, url: str) -> tuple[CachedResponse, bool] | None:
+        """
+        Args:
+            key: cacheKey of the request
+            url: url of the request, setting the ttl
+        Returns:
+            (response, fresh) or None if not cached, a stale response needs revalidation
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT url, status, headers, body, stored FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time(), key))
+        url, status, headers, body, stored = row
+        response = CachedResponse(url, status, json.loads(headers), body)
+        return response, time() - stored < self.getTTL(url)
+
+    def refresh(self, key: str) -> None:
+        """Mark a revalidated response as fresh"""
+        with self.lock:
+            now = time()
+            self.db.execute(
+                "UPDATE responses SET stored = ?, accessed = ? WHERE key = ?", (now, now, key)
+            )
+
+    def put(self, key: str, response: Any) -> None:
+        """Store a response if it is a successful page"""
+        content_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or not content_type.startswith(CACHEABLE_TYPES):
+            return
+        body = response.content
+        headers = {k.lower(): v for k, v in response.headers.items()}
+        with self.lock:
+            now = time()
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, str(response.url), 200, json.dumps(headers), body, len(body), now, now),
+            )
+            self.size += len(body) - (old[0] if old else 0)
+            if self.size > self.max_size:
+                self.evict()
+
+    def delete(self, key: str) -> None:
+        """Forget a response, like a page the caller found useless"""
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= row[0]
+
+    def evict(self) -> None:
+        """Delete the least recently used responses until the cache fits max_size"""
+        target = self.max_size * 0.9
+        removed = []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if self.size <= target:
+                break
+            removed.append((key,))
+            self.size -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", removed)
+        log.debug(f"Evict {len(removed)} cached responses")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.size = 0
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,378 @@
+"""
+Command line interface of GetPaper, drives the spiders and downloader without GUI.
+
+    getpaper search PubMed "dna" --start 2010 --end 2020
+    getpaper fetch PubMed "dna" -n 500 -o result.csv
+    getpaper download --dois dois.txt -d papers
+    getpaper download --results result.csv -d papers
+    getpaper download --resume              # continue the latest unfinished download job
+    getpaper download --retry-failed 3      # download the failed papers of job 3 again
+    getpaper jobs
+    getpaper export result.jsonl -o result.parquet   # also .csv/.jsonl/.ris/.bib
+    getpaper fetch PubMed "dna" -n 500 -o all.ris --append
+    getpaper translate result.csv -o translated.csv
+    getpaper watch dna PubMed "dna" --start 2010 --end 2020   # save a search named dna
+    getpaper update dna -o new.csv          # fetch papers found by dna since the last update
+    getpaper searches
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+from queue import Queue
+from time import time
+from typing import Iterable, Iterator, Sequence
+
+from getpaper.config import (
+    DEFAULT_SCI_HUB_URL,
+    DEFAULT_TRANSLATOR,
+    SCI_HUB_MIRRORS,
+    SORTED_BY,
+    TIP_REFRESH,
+    TRANSLATE_CHUNK,
+    exporter_list,
+    spider_list,
+    translator_list,
+)
+from getpaper.download import SciHubDownloader, detailsFromDOIs
+from getpaper.jobs import DONE, FAILED, NOT_INCLUDED, PENDING, RUNNING, UNFINISHED
+from getpaper.metrics import metrics
+from getpaper.searches import SearchRun, saveSearch
+from getpaper.spiders._spider import PaperDetail, ResultStream, _Spider
+from getpaper.translator._translator import translateDetails
+from getpaper.utils import (
+    TipException,
+    closeClients,
+    getExporter,
+    getJournal,
+    getSearchStore,
+    getSpider,
+    getTranslator,
+)
+
+log = logging.getLogger("GetPaper")
+
+JOB_STATES = {
+    DONE: "完成",
+    FAILED: "失败",
+    NOT_INCLUDED: "未收录",
+    PENDING: "等待",
+    RUNNING: "中断",
+}
+
+
+def saveResults(details: Iterable[PaperDetail], file: Path | None, append: bool = False) -> None:
+    """Save details by the exporter of suffix of file, write jsonl to stdout if file is None"""
+    with getExporter(file, append=append) as exporter:
+        for detail in details:
+            exporter.write(detail)
+
+
+def iterResults(file: Path) -> Iterator[PaperDetail]:
+    """
+    Read details saved as csv or jsonl by saveResults or the GUI one by one,
+    extra columns like translations are ignored
+    """
+    size = len(PaperDetail._fields)
+    with file.open(encoding="utf-8", newline="") as f:
+        if file.suffix == ".csv":
+            reader = csv.reader(f)
+            next(reader, None)  # headers
+            yield from (PaperDetail(*row[:size]) for row in reader if len(row) >= size)
+        elif file.suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield PaperDetail(*map(json.loads(line).get, PaperDetail._fields))
+        else:
+            raise TipException(f"无法读取{file.suffix}文件，请使用csv或jsonl")
+
+
+def loadResults(file: Path) -> list[PaperDetail]:
+    return list(iterResults(file))
+
+
+async def showProgress(queue: Queue, total: int, label: str) -> None:
+    """Print progress to stderr by the size of queue"""
+    while True:
+        print(f"\r{label}：{queue.qsize()}/{total}", end="", file=sys.stderr, flush=True)
+        await asyncio.sleep(TIP_REFRESH)
+
+
+def searchParams(args: argparse.Namespace) -> dict[str, str]:
+    return {
+        "keyword": args.keyword,
+        "start_year": args.start,
+        "end_year": args.end,
+        "author": args.author,
+        "journal": args.journal,
+        "sorting": args.sort,
+    }
+
+
+def createSpider(args: argparse.Namespace) -> _Spider:
+    return getSpider(name=args.engine, **searchParams(args))
+
+
+async def search(args: argparse.Namespace) -> None:
+    spider = createSpider(args)
+    print(await spider.getTotalPaperNum())
+
+
+async def fetch(args: argparse.Namespace) -> None:
+    spider = createSpider(args)
+    total = await spider.getTotalPaperNum()
+    num = min(args.num, total) if args.num else total
+    print(f"共找到{total}篇文献，获取{num}篇", file=sys.stderr)
+    if not num:
+        return
+
+    # Results are written as soon as they arrive in order
+    count = 0
+    last = 0.0
+    with getExporter(args.output, append=args.append) as writer:
+        async for _, detail in ResultStream(spider, num):
+            writer.write(detail)
+            count += 1
+            if time() - last > TIP_REFRESH:
+                last = time()
+                print(f"\r获取中：{count}/{num}", end="", file=sys.stderr, flush=True)
+    print(f"\r获取完成：{count}/{num}", file=sys.stderr)
+
+
+async def download(args: argparse.Namespace) -> None:
+    journal = getJournal()
+    retry_failed = args.retry_failed is not None
+    if args.dois or args.results:
+        if args.dois:
+            details = detailsFromDOIs(args.dois.read_text(encoding="utf-8").splitlines())
+        else:
+            details = loadResults(args.results)
+        job = journal.create(details, args.dir)
+        total = len(details)
+    else:
+        # 0 for the latest job having papers to download
+        job = args.retry_failed if retry_failed else args.resume
+        states = [*UNFINISHED, FAILED] if retry_failed else UNFINISHED
+        if not job and (latest := journal.latest(states)):
+            job = latest.id
+        total = len(journal.items(job, states))
+        if not total:
+            raise TipException("没有需要下载的文献")
+    target_dir = journal.get(job).target_dir  # type: ignore
+    print(f"下载任务{job}：共{total}篇文献，保存至{target_dir}", file=sys.stderr)
+
+    monitor = Queue()
+    progress = asyncio.create_task(showProgress(monitor, total, "下载中"))
+    try:
+        downloader = SciHubDownloader(args.url, args.mirrors)
+        await downloader.downloadJob(job, monitor, retry_failed)
+    finally:
+        progress.cancel()
+        print(f"\r下载结束：{monitor.qsize()}/{total}", file=sys.stderr)
+    for file, status in list(monitor.queue):
+        if status not in ("下载完成", "已存在"):
+            print(f"{status}：{file}", file=sys.stderr)
+    if failed := journal.get(job).states[FAILED]:  # type: ignore
+        print(f"{failed}篇下载失败，可使用--retry-failed {job}重试", file=sys.stderr)
+
+
+async def jobs(args: argparse.Namespace) -> None:
+    for job in getJournal().jobs(args.num):
+        created = datetime.fromtimestamp(job.created).strftime("%Y-%m-%d %H:%M")
+        states = "，".join(f"{JOB_STATES[state]}{count}" for state, count in job.states.items())
+        print(f"{job.id}\t{created}\t{job.target_dir}\t{states}")
+
+
+async def export(args: argparse.Namespace) -> None:
+    saveResults(iterResults(args.input), args.output, args.append)
+
+
+async def translate(args: argparse.Namespace) -> None:
+    details = loadResults(args.input)
+    translator = getTranslator(args.translator)
+    print(f"共{len(details)}篇文献，使用{args.translator}翻译", file=sys.stderr)
+
+    monitor = Queue()
+    progress = asyncio.create_task(showProgress(monitor, len(details), "翻译中"))
+    try:
+        translations = await translateDetails(translator, details, monitor, args.chunk)
+    finally:
+        progress.cancel()
+        print(f"\r翻译结束：{monitor.qsize()}/{len(details)}", file=sys.stderr)
+    target = translator.target
+    extra = [f"title_{target}", f"abstract_{target}"]
+    with getExporter(args.output, extra, args.append) as writer:
+        for detail, (title, abstract) in zip(details, translations):
+            writer.write(detail, title, abstract)
+
+
+async def watch(args: argparse.Namespace) -> None:
+    saveSearch(args.name, args.engine, searchParams(args))
+    print(f"已保存搜索{args.name}，使用update {args.name}获取新文献", file=sys.stderr)
+
+
+async def update(args: argparse.Namespace) -> None:
+    run = SearchRun(args.name)
+    num = await run.search()
+    since = run.saved.last_date or "首次检索"
+    print(f"{since}以来收录{run.total}篇文献，其中{num}篇未获取过", file=sys.stderr)
+
+    count = 0
+    with getExporter(args.output, append=args.append) as writer:
+        async for _, detail in run:
+            writer.write(detail)
+            count += 1
+            print(f"\r获取中：{count}/{num}", end="", file=sys.stderr, flush=True)
+    if num:
+        print(f"\r获取完成：{count}/{num}", file=sys.stderr)
+
+
+async def searches(args: argparse.Namespace) -> None:
+    store = getSearchStore()
+    if args.remove:
+        if not store.remove(args.remove):
+            raise TipException(f"未找到保存的搜索：{args.remove}")
+        return
+    for search in store.searches():
+        last = datetime.fromtimestamp(search.last_run).strftime("%Y-%m-%d %H:%M")
+        last = last if search.last_run else "未检索"
+        params = " ".join(f"{key}={value}" for key, value in search.params.items() if value)
+        print(f"{search.name}\t{search.engine}\t{params}\t{last}\t已获取{search.seen}篇")
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await args.func(args)
+    finally:
+        await closeClients()
+        if args.metrics:
+            metrics.export(args.metrics)
+
+
+def parseArgs(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="getpaper", description="文献下载器（命令行）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出运行日志")
+    parser.add_argument(
+        "--metrics", type=Path, help="保存请求统计，.jsonl为json lines，其他为Prometheus文本"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def addSearchArgs(command: argparse.ArgumentParser) -> None:
+        command.add_argument("engine", choices=spider_list, help="查询数据库")
+        command.add_argument("keyword", help="查询关键词")
+        command.add_argument("--start", default="", help="开始时间")
+        command.add_argument("--end", default="", help="截至时间")
+        command.add_argument("--author", default="", help="作者")
+        command.add_argument("--journal", default="", help="期刊")
+        command.add_argument("--sort", default=SORTED_BY[0], choices=SORTED_BY, help="排序方式")
+
+    def addOutputArgs(command: argparse.ArgumentParser, tip: str = "") -> None:
+        formats = "/".join(f".{name}" for name in exporter_list)
+        command.add_argument(
+            "-o", "--output", type=Path, help=f"保存文件({formats}){tip}，默认输出jsonl"
+        )
+        command.add_argument("--append", action="store_true", help="追加到已有文件末尾")
+
+    command = commands.add_parser("search", help="获取搜索结果数量")
+    addSearchArgs(command)
+    command.set_defaults(func=search)
+
+    command = commands.add_parser("fetch", help="获取文献详情")
+    addSearchArgs(command)
+    command.add_argument("-n", "--num", type=int, default=0, help="获取数量，默认全部")
+    addOutputArgs(command)
+    command.set_defaults(func=fetch)
+
+    command = commands.add_parser("download", help="从Sci-Hub下载pdf")
+    source = command.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dois", type=Path, help="每行一个doi的txt文件")
+    source.add_argument("--results", type=Path, help="fetch保存的结果文件")
+    source.add_argument(
+        "--resume", type=int, nargs="?", const=0, metavar="JOB", help="继续下载任务，默认最近的任务"
+    )
+    source.add_argument(
+        "--retry-failed",
+        type=int,
+        nargs="?",
+        const=0,
+        metavar="JOB",
+        help="重新下载任务中失败的文献",
+    )
+    command.add_argument(
+        "-d", "--dir", type=Path, default=Path("."), help="保存目录，继续任务时忽略"
+    )
+    command.add_argument("--url", default=DEFAULT_SCI_HUB_URL, help="Sci-Hub网址")
+    command.add_argument(
+        "--mirrors", nargs="*", default=SCI_HUB_MIRRORS, help="备用Sci-Hub镜像，按速度自动选择"
+    )
+    command.set_defaults(func=download)
+
+    command = commands.add_parser("jobs", help="列出下载任务")
+    command.add_argument("-n", "--num", type=int, default=20, help="显示数量")
+    command.set_defaults(func=jobs)
+
+    command = commands.add_parser("export", help="转换结果文件格式")
+    command.add_argument("input", type=Path, help="fetch保存的结果文件(.csv/.jsonl)")
+    addOutputArgs(command)
+    command.set_defaults(func=export)
+
+    command = commands.add_parser("translate", help="翻译结果文件中全部文献的标题与摘要")
+    command.add_argument("input", type=Path, help="fetch保存的结果文件(.csv/.jsonl)")
+    addOutputArgs(command, "，原文后添加译文列")
+    command.add_argument(
+        "--translator",
+        default=DEFAULT_TRANSLATOR,
+        choices=[*translator_list, "_offline"],
+        help="翻译源，_offline为离线模拟翻译",
+    )
+    command.add_argument("--chunk", type=int, default=TRANSLATE_CHUNK, help="一起翻译的文献数量")
+    command.set_defaults(func=translate)
+
+    command = commands.add_parser("watch", help="保存搜索，用于定期获取新文献")
+    command.add_argument("name", help="搜索名称，已存在时替换并重新开始")
+    addSearchArgs(command)
+    command.set_defaults(func=watch)
+
+    command = commands.add_parser("update", help="获取保存的搜索上次检索以来的新文献")
+    command.add_argument("name", help="搜索名称")
+    addOutputArgs(command)
+    command.set_defaults(func=update)
+
+    command = commands.add_parser("searches", help="列出保存的搜索")
+    command.add_argument("--remove", metavar="NAME", help="删除保存的搜索")
+    command.set_defaults(func=searches)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parseArgs(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s",
+        datefmt="%H:%M:%S",
+    )
+    # run below code to avoid RunTimeError raised on windows
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())  # type: ignore
+
+    try:
+        asyncio.run(run(args))
+    except TipException as e:
+        print(e.tip, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # Output piped to a closed reader like head
+        sys.stderr.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
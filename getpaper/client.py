@@ -0,0 +1,276 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from time import perf_counter
+from typing import Any, AsyncIterator
+from urllib.parse import urlsplit
+
+from curl_cffi import CurlInfo
+from curl_cffi.requests import AsyncSession, Response
+from curl_cffi.requests.exceptions import ConnectionError, HTTPError, Timeout
+
+from getpaper.cache import CachedResponse, ResponseCache, cacheKey
+from getpaper.config import RETRY_AFTER, TOO_MANY_REQUESTS_RETRY
+from getpaper.limiter import RateLimiter
+from getpaper.metrics import metrics
+from getpaper.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+# Timings read from curl after each request, pass to AsyncSession(curl_infos=...)
+CURL_INFOS = [
+    CurlInfo.NAMELOOKUP_TIME,
+    CurlInfo.CONNECT_TIME,
+    CurlInfo.APPCONNECT_TIME,
+    CurlInfo.STARTTRANSFER_TIME,
+    CurlInfo.TOTAL_TIME,
+    CurlInfo.NUM_CONNECTS,
+]
+
+# Failures worth sending the request again
+RETRY_EXCEPTIONS = (ConnectionError, HTTPError, Timeout)
+RETRY_STATUS = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+log = logging.getLogger("GetPaper")
+
+
+def retryAfter(value: str | None, default: float = RETRY_AFTER) -> float:
+    """
+    Parse the Retry-After header
+
+    Args:
+        value: delay seconds or a http date
+        default: returned when value is missing or invalid
+    Returns:
+        seconds to wait
+    """
+    if not value:
+        return default
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class Client:
+    def __init__(
+        self,
+        session: AsyncSession,
+        limiter: RateLimiter,
+        cache: ResponseCache | None = None,
+        connections: dict[str, int] | None = None,
+        default_connections: int = 8,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """
+        Shared http client, every request waits for the token of its host before sending
+
+        Args:
+            session: curl_cffi session sending the requests
+            limiter: rate limiter of all hosts
+            cache: cache of GET responses, None to disable
+            connections: max concurrent requests of each host, {host: number}
+            default_connections: max concurrent requests of hosts not in connections
+            retry: policy of retrying idempotent requests, None to disable
+            breaker: circuit breaker of hosts, None to disable
+        """
+        self.session = session
+        self.limiter = limiter
+        self.cache = cache
+        self.connections = connections or {}
+        self.default_connections = default_connections
+        self.semaphores: dict[str, asyncio.Semaphore] = {}
+        self.retry = retry
+        self.breaker = breaker
+
+    def connection(self, host: str) -> asyncio.Semaphore:
+        """Semaphore limiting the concurrent requests of host, so its connections are reused"""
+        if (semaphore := self.semaphores.get(host)) is None:
+            semaphore = asyncio.Semaphore(self.connections.get(host, self.default_connections))
+            self.semaphores[host] = semaphore
+        return semaphore
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> Response | CachedResponse:
+        """Send a request, GET responses are served from cache while fresh"""
+        host = urlsplit(url).hostname or ""
+        if self.cache is None or method != "GET" or not self.cache.getTTL(url):
+            return await self.send(method, url, host, **kwargs)
+
+        # The cache waits for its lock and disk, off the loop thread like the stores
+        key = cacheKey(method, url, kwargs.get("params"))
+        if cached := await asyncio.to_thread(self.cache.get, key, url):
+            response, fresh = cached
+            if fresh:
+                log.debug(f"Cache hit: {url}")
+                metrics.count("cache_hits", host)
+                return response
+            # Revalidate the stale response
+            headers = dict(kwargs.get("headers") or {})
+            if etag := response.headers.get("etag"):
+                headers["If-None-Match"] = etag
+            if modified := response.headers.get("last-modified"):
+                headers["If-Modified-Since"] = modified
+            kwargs["headers"] = headers
+
+        result = await self.send(method, url, host, **kwargs)
+        if cached and result.status_code == 304:
+            metrics.count("revalidated", host)
+            await asyncio.to_thread(self.cache.refresh, key)
+            return cached[0]
+        await asyncio.to_thread(self.cache.put, key, result)
+        return result
+
+    async def forget(self, url: str, params: Any = None) -> None:
+        """Remove the cached GET response of url, so it is requested again next time"""
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.delete, cacheKey("GET", url, params))
+
+    async def send(self, method: str, url: str, host: str, **kwargs: Any) -> Response:
+        """
+        Send a request under the rate limit of its host.
+        Resend it when the server returns 429, and retry idempotent requests failed by network
+        errors or 5xx with backoff.
+
+        Raises:
+            CircuitOpenError: the host failed too many times recently
+        """
+        limited = attempt = 0
+        while True:
+            self.check(host)
+            try:
+                response = await self.perform(method, url, host, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                self.failed(host)
+                if not self.canRetry(method, host, attempt):
+                    raise
+                log.info(f"Retry {url}: {e}")
+            else:
+                if response.status_code == 429 or (
+                    response.status_code == 503 and "Retry-After" in response.headers
+                ):
+                    if limited == TOO_MANY_REQUESTS_RETRY:
+                        return response
+                    self.limiter.pause(host, retryAfter(response.headers.get("Retry-After")))
+                    metrics.count("retries", host)
+                    limited += 1
+                    continue
+                if response.status_code not in RETRY_STATUS:
+                    self.succeeded(host)
+                    return response
+                self.failed(host)
+                if not self.canRetry(method, host, attempt):
+                    return response
+                log.info(f"Retry {url}: HTTP status {response.status_code}")
+
+            metrics.count("retries", host)
+            await asyncio.sleep(self.retry.delay(attempt))  # type: ignore
+            attempt += 1
+
+    def check(self, host: str) -> None:
+        """Raise CircuitOpenError if requests to host are not allowed"""
+        if self.breaker is not None and not self.breaker.allow(host):
+            metrics.count("rejected", host)
+            raise CircuitOpenError(host)
+
+    def succeeded(self, host: str) -> None:
+        if self.breaker is not None:
+            self.breaker.success(host)
+        if self.retry is not None:
+            self.retry.deposit(host)
+
+    def failed(self, host: str) -> None:
+        if self.breaker is not None:
+            self.breaker.failure(host)
+        if self.retry is not None:
+            self.retry.deposit(host)
+
+    def canRetry(self, method: str, host: str, attempt: int) -> bool:
+        return (
+            self.retry is not None
+            and method.upper() in IDEMPOTENT_METHODS
+            and self.retry.withdraw(host, attempt)
+        )
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """Wait for a free connection and a token of host, hold the connection in the context"""
+        start = perf_counter()
+        async with self.connection(host):
+            await self.limiter.acquire(host)
+            metrics.observe("wait", perf_counter() - start, host)
+            yield
+
+    async def perform(self, method: str, url: str, host: str, **kwargs: Any) -> Response:
+        async with self.slot(host):
+            try:
+                response = await self.session.request(method, url, **kwargs)  # type: ignore
+            except Exception:
+                metrics.count("failures", host)
+                raise
+        self.record(response, host)
+        return response
+
+    @staticmethod
+    def record(response: Response, host: str, streamed: bool = False) -> None:
+        """Count a response and observe the spans of curl timings"""
+        metrics.count("requests", host)
+        if response.status_code >= 400:
+            metrics.count("failures", host)
+        infos = response.infos
+        if CurlInfo.TOTAL_TIME not in infos:
+            return
+        dns = infos[CurlInfo.NAMELOOKUP_TIME]
+        # Times are counted from the start, connecting takes 0 if a connection is reused
+        connected = max(infos[CurlInfo.CONNECT_TIME], infos[CurlInfo.APPCONNECT_TIME])
+        first_byte = infos[CurlInfo.STARTTRANSFER_TIME]
+        metrics.count("connections", host, infos[CurlInfo.NUM_CONNECTS])
+        if connected:
+            metrics.observe("dns", dns, host)
+            metrics.observe("connect", connected - dns, host)
+        metrics.observe("ttfb", first_byte - connected, host)
+        if not streamed:
+            metrics.observe("download", infos[CurlInfo.TOTAL_TIME] - first_byte, host)
+            metrics.count("bytes", host, len(response.content))
+
+    async def get(self, url: str, **kwargs: Any) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> Response:
+        return await self.request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[Response]:
+        """
+        Send a request under the rate limit of its host without reading the body,
+        read the body by response.aiter_content() inside the context.
+        The request is not retried, resume the download with a Range request instead.
+        """
+        host = urlsplit(url).hostname or ""
+        self.check(host)
+        async with self.slot(host):
+            try:
+                response = await self.session.request(method, url, stream=True, **kwargs)  # type: ignore
+            except Exception:
+                metrics.count("failures", host)
+                self.failed(host)
+                raise
+            self.record(response, host, streamed=True)
+            if response.status_code >= 500:
+                self.failed(host)
+            else:
+                self.succeeded(host)
+            if response.status_code == 429:
+                self.limiter.pause(host, retryAfter(response.headers.get("Retry-After")))
+            try:
+                with metrics.span("download", host):
+                    yield response
+            finally:
+                await response.aclose()
+
+    async def close(self) -> None:
+        await self.session.close()
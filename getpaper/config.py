@@ -1,32 +1,100 @@
 import asyncio
 import sys
+from functools import cache
 from pathlib import Path
+from typing import Any
 
-if hasattr(sys, "frozen"):
-    # add new module name without .py when using pyinstaller
-    spider_list = ["ACS", "PubMed"]
-    translator_list = ["百度翻译"]
-else:
-    spider_list = [
-        spider.name.rstrip(".py")
-        for spider in Path(__file__).parent.joinpath("spiders").iterdir()
-        if not spider.name.startswith("_")
-    ]
-    translator_list = [
-        translator.name.rstrip(".py")
-        for translator in Path(__file__).parent.joinpath("translator").iterdir()
-        if not translator.name.startswith("_")
+# Created on first access by __getattr__, so importing config neither scans plugins nor creates loop
+spider_list: list[str]
+translator_list: list[str]
+exporter_list: list[str]  # File suffixes without "."
+LOOP: asyncio.AbstractEventLoop
+
+
+def _listPlugins(folder: str) -> list[str]:
+    """Module names in getpaper/<folder>, modules starting with "_" are not plugins"""
+    return [
+        module.stem
+        for module in Path(__file__).parent.joinpath(folder).iterdir()
+        if module.suffix == ".py" and not module.name.startswith("_")
     ]
 
-spider_list.remove("ACS")
+
+@cache
+def __getattr__(name: str) -> Any:
+    if name == "spider_list":
+        # add new module name without .py when using pyinstaller
+        spiders = ["ACS", "PubMed"] if hasattr(sys, "frozen") else _listPlugins("spiders")
+        spiders.remove("ACS")
+        return spiders
+    if name == "translator_list":
+        return ["百度翻译"] if hasattr(sys, "frozen") else _listPlugins("translator")
+    if name == "exporter_list":
+        exporters = ["bib", "csv", "jsonl", "parquet", "ris"]
+        return exporters if hasattr(sys, "frozen") else sorted(_listPlugins("exporter"))
+    if name == "LOOP":
+        return asyncio.new_event_loop()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 CLIENT_TIMEOUT = 10  # Global AsyncClient timeout
 TIP_REFRESH = 0.2  # MainFrame's tip bar refresh frequency
-SCI_DELAY = 0.1  # add delay avoid putting too much pressure on the Sci_Hub server
+UI_REFRESH = 50  # Milliseconds between two batches of UI updates sent by tasks
+CONCURRENCY = 8  # Number of workers sending requests in each job
+# Pool parsing responses off the loop thread: "process" scales with cores, "thread" only keeps
+# the loop responsive as parsing mostly holds the GIL, "" parses on the loop thread
+PARSE_POOL = "thread"
+PARSE_WORKERS = 0  # Workers of the parse pool, 0 for the number of cores
+# Requests per second and burst of each host, avoid putting too much pressure on the servers
+RATE_LIMITS = {
+    "eutils.ncbi.nlm.nih.gov": (3, 3),  # NCBI allows 3 requests per second without an api key
+    "pubs.acs.org": (20, 5),
+    "fanyi-api.baidu.com": (1, 1),
+}
+DEFAULT_RATE_LIMIT = (10, 10)  # For other hosts like Sci-Hub
+MAX_CONNECTIONS = 32  # Curl handles of the shared session, idle connections are kept alive
+# Connections opened to each host at the same time, requests to a host beyond it wait
+HOST_CONNECTIONS = {"eutils.ncbi.nlm.nih.gov": 3, "fanyi-api.baidu.com": 1}
+DEFAULT_HOST_CONNECTIONS = 8
+DNS_CACHE_TIMEOUT = 600  # Seconds a resolved host is reused
+RETRY_AFTER = 5  # Seconds to pause a host responding 429 without Retry-After
+TOO_MANY_REQUESTS_RETRY = 3  # Times to resend a request responded with 429
+# Retries of GET requests failed by network errors or 5xx, waiting base * 2 ** n seconds at most
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = (0.5, 8)  # (base, cap) seconds
+RETRY_BUDGET = (0.2, 10)  # (tokens deposited by each request, max tokens) of each host
+# Stop sending to a host after consecutive failures, try again after seconds
+CIRCUIT_BREAKER = (5, 30)  # (failures, seconds)
+
+DATA_DIR = Path.home() / ".getpaper"  # Local cache and databases
+# Seconds a cached page stays fresh by host or host/path prefix, 0 to disable. Search results
+# change as papers are added, esearch also keeps each query on its history server for hours
+CACHE_TTL = {
+    "eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi": 0,
+    "pubs.acs.org/action/doSearch": 3600,
+}
+DEFAULT_CACHE_TTL = 7 * 24 * 3600  # For other pages like details, 0 to disable
+CACHE_SIZE = 512 * 1024**2  # Max bytes of cached pages, 0 to disable cache
+# Keep downloaded pdfs once in DATA_DIR/pdfs by sha256, and link them into the folders of downloads
+PDF_STORE = True
+# Ways of linking a stored pdf into a folder, tried in order. reflink needs a copy-on-write
+# file system on Linux (btrfs, xfs). Where only "copy" works, a pdf is indexed in the folder it
+# was downloaded to instead of kept twice, and copied from there into other folders.
+# "hardlink" before "copy" keeps a single file on any file system, but hard linked pdfs are
+# made read-only, as editing one would change the stored pdf and every folder
+PDF_LINKS = ("reflink", "copy")
+# Keep translated lines in DATA_DIR by (translator, target language, text), never sent again
+TRANSLATION_CACHE = True
+TRANSLATE_CHUNK = 20  # Papers translated together when translating all results
+DEFAULT_TRANSLATOR = "百度翻译"  # Used by 全部翻译 in the menu
 
 APP_NAME = "GetPaper"
 DEFAULT_SCI_HUB_URL = "wellesu.com"
+# Mirrors used besides the Sci-Hub url given, ranked by rolling latency and success rate
+SCI_HUB_MIRRORS = ["sci-hub.se", "sci-hub.st", "sci-hub.ru"]
+MIRROR_SMOOTHING = 0.2  # Weight of the latest request in the rolling latency and success rate
+MIRROR_MIN_SUCCESS = 0.5  # Mirrors below this success rate are used after the healthy ones
+HEDGE_DELAY = (1, 10)  # (min, max) seconds to wait for a mirror before requesting another one
 FRAME_STYLE = {"relief": "ridge", "padding": 10}
 FONT = ("微软雅黑", 12)
 SORTED_BY = ("相关性", "日期", "日期逆序")
@@ -37,6 +105,4 @@ RESULT_LIST_EN = ["Title:\n", "Authors:\n", "Date:\t", "Publication:\t", "Abstra
 RESULT_LIST_CN = ["标题:\n", "作者:\n", "日期:\t", "期刊:\t", "摘要:\n", "doi:\t", "网址:\t"]
 # fmt: on
 
-LOOP = asyncio.get_event_loop()
-
 PROJECT_URL = "https://github.com/Dragon-GCS/GetPaper"
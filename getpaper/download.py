@@ -1,19 +1,33 @@
 import asyncio
+import hashlib
 import logging
+import os
 import re
 from pathlib import Path
 from queue import Queue
-from typing import Protocol
+from typing import Iterable, Protocol
+from urllib.parse import urljoin, urlsplit
 
-from bs4 import BeautifulSoup
-from curl_cffi.requests.exceptions import Timeout
-
-from getpaper.config import SCI_DELAY
+from getpaper.config import SCI_HUB_MIRRORS
+from getpaper.jobs import DONE, FAILED, NOT_INCLUDED, RUNNING, JobItem
+from getpaper.metrics import metrics
+from getpaper.mirrors import MirrorPool, failed, normalizeURL
+from getpaper.retry import CircuitOpenError
 from getpaper.spiders._spider import PaperDetail
-from getpaper.utils import getClient
+from getpaper.utils import (
+    TipException,
+    getClient,
+    getJournal,
+    getPDFStore,
+    getStore,
+    runWorkers,
+)
 
 log = logging.getLogger("GetPaper")
 
+# Statuses of papers Sci-Hub does not have, not retried
+NOT_INCLUDED_STATUS = ("未找到doi", "未找到PDF链接")
+
 
 def checkFilename(filename: str, suffix: str = ".pdf"):
     """
@@ -31,89 +45,337 @@ def checkFilename(filename: str, suffix: str = ".pdf"):
     return valid_name
 
 
+def pdfDigest(file: Path) -> str | None:
+    """Sha256 of file, None if it does not exist or is not a pdf"""
+    try:
+        with file.open("rb") as f:
+            if f.read(5) != b"%PDF-":
+                return None
+            f.seek(0)
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class NotPDFError(Exception):
+    """The pdf link responded something else, like a captcha page"""
+
+
+class IncompleteDownloadError(Exception):
+    """Connection dropped before the whole pdf was received, the .part file is kept for resuming"""
+
+
+async def fetchPDF(url: str, file: Path) -> None:
+    """
+    Stream a pdf into file.part chunk by chunk and rename it to file when finished.
+    An existing .part file is resumed by a Range request, so is a download interrupted by
+    network errors, following the retry policy of the client.
+
+    Args:
+        url: url of the pdf
+        file: path to save the pdf
+    Raises:
+        NotPDFError: content type or the magic number is not pdf
+        IncompleteDownloadError: received size differs from the size announced by server
+    """
+    from getpaper.client import RETRY_EXCEPTIONS
+
+    client = getClient()
+    host = urlsplit(url).hostname or ""
+    attempt = 0
+    while True:
+        try:
+            return await streamPDF(url, file)
+        except (IncompleteDownloadError, *RETRY_EXCEPTIONS) as e:
+            if client.retry is None or not client.retry.withdraw(host, attempt):
+                raise
+            log.info(f"Resume {url}: {e}")
+            metrics.count("retries", host)
+            await asyncio.sleep(client.retry.delay(attempt))
+            attempt += 1
+
+
+async def streamPDF(url: str, file: Path) -> None:
+    """Download the pdf once, see fetchPDF"""
+    from getpaper.client import RETRY_STATUS
+
+    part = file.with_name(file.name + ".part")
+    offset = part.stat().st_size if part.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    async with getClient().stream("GET", url, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # The part file is already complete
+            total = offset
+        else:
+            if response.status_code == 206:
+                mode = "ab"
+            elif response.status_code == 200:
+                # Server ignored the Range header, start over
+                mode, offset = "wb", 0
+            elif response.status_code in RETRY_STATUS:
+                # HTTPError, retried by fetchPDF
+                response.raise_for_status()
+            else:
+                raise NotPDFError(f"HTTP status {response.status_code}")
+            content_type = response.headers.get("content-type", "")
+            if content_type.startswith(("text/", "application/json")):
+                raise NotPDFError(f"Content type {content_type}")
+
+            # bytes start-end/total or the length of this response
+            if match := re.search(r"/(\d+)$", response.headers.get("content-range", "")):
+                total = int(match.group(1))
+            elif length := response.headers.get("content-length"):
+                total = offset + int(length)
+            else:
+                total = 0
+
+            received = 0
+            with part.open(mode) as f:
+                async for chunk in response.aiter_content():
+                    f.write(chunk)
+                    received += len(chunk)
+            metrics.count("bytes", urlsplit(url).hostname or "", received)
+
+    size = part.stat().st_size
+    if total and size != total:
+        raise IncompleteDownloadError(f"Received {size} of {total} bytes")
+    with part.open("rb") as f:
+        if f.read(5) != b"%PDF-":
+            part.unlink()
+            raise NotPDFError("Not starts with %PDF-")
+    os.replace(part, file)
+
+
+async def fromStore(doi: str, file: Path) -> bool:
+    """Link the stored pdf of doi to file before any request, False if not stored"""
+    if (store := getPDFStore()) is None:
+        return False
+    if (blob := await asyncio.to_thread(store.lookup, doi)) is None:
+        return False
+    try:
+        method = await asyncio.to_thread(store.materialize, blob, file)
+    except OSError:
+        log.exception(f"Failed to link {blob} to {file}")
+        return False
+    log.debug(f"Stored pdf of {doi} linked to {file} by {method}")
+    metrics.count("store_hits")
+    return True
+
+
+async def toStore(doi: str, file: Path) -> None:
+    """Keep a downloaded pdf in the store, a failure does not fail the download"""
+    if (store := getPDFStore()) is None:
+        return
+    try:
+        await asyncio.to_thread(store.add, doi, file)
+    except OSError:
+        log.exception(f"Failed to store {file}")
+
+
+def detailsFromDOIs(dois: Iterable[str]) -> list[PaperDetail]:
+    """
+    Create details for downloading papers by doi.
+    Papers in local store are titled by their title, others by their doi.
+    Args:
+        dois: dois of papers, lines not starting with "10." are ignored
+    Returns:
+        details: PaperDetail list for multiDownload
+    """
+    dois = [doi.strip() for doi in dois if doi.strip().startswith("10.")]
+    stored = getStore().getByDOIs(dois)
+    return [stored.get(doi.lower()) or PaperDetail(doi, "", "", "", "", doi, "") for doi in dois]
+
+
 class Downloader(Protocol):
-    async def download(self, doi: str, monitor: Queue, file: Path, index: int) -> None: ...
+    async def download(self, doi: str, monitor: Queue, file: Path) -> str: ...
 
     async def multiDownload(
         self, details: list[PaperDetail], monitor: Queue, target_dir: Path
-    ) -> None: ...
+    ) -> int: ...
 
 
 class SciHubDownloader:
     url: str
+    pool: MirrorPool
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, mirrors: Iterable[str] = SCI_HUB_MIRRORS):
+        """
+        Args:
+            url: the preferred Sci-Hub url
+            mirrors: other Sci-Hub urls, used when they are faster or url fails
+        """
+        self.url = ""
+        self.mirrors = list(mirrors)
         self.set_url(url)
 
     def set_url(self, url: str) -> None:
-        if not url.startswith("https"):
-            url = "https://" + url
-        self.url = url.strip("/")
+        # Keep the latency and success rate measured if url is unchanged
+        if (url := normalizeURL(url)) != self.url:
+            self.url = url
+            self.pool = MirrorPool([url, *self.mirrors])
 
-    async def download(self, doi: str, monitor: Queue, file: Path, index: int = 0) -> None:
+    async def download(self, doi: str, monitor: Queue, file: Path) -> str:
         """
         Download single paper from sci-hub by doi and save to filename.
+        Requests are paced by the rate limiter of getClient(). The page is requested from
+        the best mirror of the pool, the pdf is downloaded again from another mirror if failed.
+        A pdf downloaded before is linked from getPDFStore() without any request.
 
         Args:
             doi(str): the doi of paper, from search result.
             file(Path): full path of downloaded pdf file.
-            index(int): index of doi, download will be delayed by index * SCI_DELAY second.
+        Returns:
+            status: the tip put on monitor, "下载完成" if succeeded
         """
+        from bs4 import BeautifulSoup
+        from curl_cffi.requests.exceptions import HTTPError, Timeout
+
+        from getpaper.client import RETRY_EXCEPTIONS
+
         folder, filename = file.parent, file.stem
         if not doi:
             (folder / f"NotFound_{filename}.txt").write_text(f"{file.stem}\nNot found doi")
-            return
+            monitor.put((file, "未找到doi"))
+            return "未找到doi"
+
+        if await fromStore(doi, folder / f"{filename}.pdf"):
+            monitor.put((file, "下载完成"))
+            return "下载完成"
 
         log.debug(f"Downloading doi: {doi}")
-        await asyncio.sleep(index * SCI_DELAY)  # add delay
 
-        client = getClient()
         url = f"{self.url}/{doi}"
+        tried: list[str] = []
         try:
-            response = await client.get(url)
-            bs = BeautifulSoup(response.text, "lxml")
-            if pdf := bs.find(id="pdf"):
-                result = await client.get(pdf["src"].split("#")[0])  # type: ignore
-                filename += ".pdf"
-                content = result.content
+            while True:
+                mirror, response = await self.pool.get(doi, exclude=tried)
+                url = f"{mirror.url}/{doi}"
+                if failed(response):
+                    raise HTTPError(f"HTTP status {response.status_code}")
+                with metrics.span("parse", mirror.host):
+                    pdf = BeautifulSoup(response.text, "lxml").find(id="pdf")
+                if not pdf:
+                    # A "not included", captcha or DDoS guard page, ask again next time
+                    await getClient().forget(url)
+                    break
+                pdf_url = urljoin(url, pdf["src"].split("#")[0])  # type: ignore
+                try:
+                    await fetchPDF(pdf_url, folder / f"{filename}.pdf")
+                except (IncompleteDownloadError, CircuitOpenError, *RETRY_EXCEPTIONS) as e:
+                    mirror.observe(None)
+                    tried.append(mirror.url)
+                    if len(tried) == len(self.pool):
+                        raise
+                    log.info(f"Download {pdf_url} failed, try another mirror: {e!r}")
+                    # Pdf of another mirror may differ from the part received, start over
+                    folder.joinpath(f"{filename}.pdf.part").unlink(missing_ok=True)
+                    continue
+                await toStore(doi, folder / f"{filename}.pdf")
                 monitor.put((file, "下载完成"))
-            else:
-                filename = f"NotIncluded_{filename}.txt"
-                content = f"Sci-Hub has not yet included this paper: {doi}".encode("utf-8")
-                monitor.put((file, "未找到PDF链接"))
+                metrics.count("downloads")
+                log.debug(f"Download finish: {file}")
+                return "下载完成"
+            filename = f"NotIncluded_{filename}.txt"
+            content = f"Sci-Hub has not yet included this paper: {doi}".encode("utf-8")
+            status = "未找到PDF链接"
+        except NotPDFError as e:
+            content = f"Invalid pdf: {e}\n{file}\nURL: {url}".encode("utf-8")
+            log.info(f"Invalid pdf of {url}: {e}")
+            filename = f"Invalid_{filename}.txt"
+            status = "PDF无效"
+        except IncompleteDownloadError as e:
+            content = f"Incomplete download: {e}\n{file}\nURL: {url}".encode("utf-8")
+            log.info(f"Incomplete download of {url}: {e}")
+            filename = f"Incomplete_{filename}.txt"
+            status = "下载不完整"
+        except CircuitOpenError as e:
+            content = f"Server unavailable: {e.host}\n{file}\nURL: {url}".encode("utf-8")
+            filename = f"Unavailable_{filename}.txt"
+            status = "服务器不可用"
+        except HTTPError as e:
+            content = f"Server error: {e}\n{file}\nURL: {url}".encode("utf-8")
+            log.info(f"Server error of {url}: {e}")
+            filename = f"ServerError_{filename}.txt"
+            status = "服务器错误"
         except Timeout:
             content = f"Connect timeout\n{file}\nURL: {url}".encode("utf-8")
             log.exception(f"Connect timeout: {url}")
             filename = f"Timeout_{filename}.txt"
-            monitor.put((file, "连接超时"))
+            status = "连接超时"
 
         except Exception:
             content = f"Unknown error\n{file}\nURL: {url}".encode("utf-8")
             log.exception(f"Unknown error: {url} ")
             filename = f"ERROR_{filename}.txt"
-            monitor.put((file, "未知错误"))
+            status = "未知错误"
 
         (folder / filename).write_bytes(content)
+        monitor.put((file, status))
+        metrics.count("download_failures")
         log.debug(f"Download finish: {file}")
+        return status
 
     async def multiDownload(
         self, details: list[PaperDetail], monitor: Queue, target_dir: Path
-    ) -> None:
+    ) -> int:
         """
         Download multiple paper from sci-hub by doi, filename defaults to title.
+        The papers are recorded as a job in getJournal(), so it can be resumed by downloadJob.
 
         Args:
             details (list[PaperDetail]): A sequences include all search result, title is details[0], doi is details[-2]
             monitor (Queue): A Queue for monitoring the download progress by monitor.qsize() / monitor.max_size
             target_dir (Path): Directory to save all PDFs.
+        Returns:
+            job: id of the job
+        """
+        job = await asyncio.to_thread(getJournal().create, details, target_dir)
+        await self.downloadJob(job, monitor)
+        return job
+
+    async def downloadJob(self, job: int, monitor: Queue, retry_failed: bool = False) -> None:
         """
-        target_dir.mkdir(parents=True, exist_ok=True)
-        await asyncio.gather(
-            *[
-                self.download(detail.doi, monitor, target_dir / checkFilename(detail.title), index)
-                for index, detail in enumerate(details)
-            ]
-        )
+        Download the unfinished papers of a job, including those left running by a pause or crash.
+        Papers whose pdf exists with the checksum recorded are skipped.
+
+        Args:
+            job: id of the job in getJournal()
+            monitor: A Queue receiving (file, status) of each paper
+            retry_failed: download the failed papers again too
+        """
+        journal = getJournal()
+        # Journal writes wait for the SQLite lock and disk, they run off the loop thread
+        if (info := await asyncio.to_thread(journal.get, job)) is None:
+            raise TipException("下载任务不存在")
+        if retry_failed:
+            await asyncio.to_thread(journal.reset, job, [FAILED])
+        info.target_dir.mkdir(parents=True, exist_ok=True)
+
+        async def run(item: JobItem) -> None:
+            file = info.target_dir / checkFilename(item.detail.title)
+            digest = await asyncio.to_thread(pdfDigest, file)
+            if digest and item.sha256 in (None, digest):
+                monitor.put((file, "已存在"))
+                await asyncio.to_thread(journal.update, job, item.seq, DONE, "已存在", digest)
+                return
+            await asyncio.to_thread(journal.update, job, item.seq, RUNNING)
+            status = await self.download(item.detail.doi, monitor, file)
+            if status == "下载完成":
+                digest = await asyncio.to_thread(pdfDigest, file)
+                await asyncio.to_thread(journal.update, job, item.seq, DONE, status, digest)
+            elif status in NOT_INCLUDED_STATUS:
+                await asyncio.to_thread(journal.update, job, item.seq, NOT_INCLUDED, status)
+            else:
+                await asyncio.to_thread(journal.update, job, item.seq, FAILED, status)
+
+        with metrics.job("download"):
+            try:
+                await runWorkers(await asyncio.to_thread(journal.items, job), run)
+            finally:
+                # Papers interrupted by a pause are downloaded again on resume, reset on the
+                # loop thread as awaiting it could be cancelled again
+                journal.reset(job, [RUNNING])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import re
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, Sequence
+
+from getpaper.spiders._spider import PLACEHOLDERS, PaperDetail
+
+
+def present(value: str) -> str:
+    """value, or "" if it is a placeholder of a missing field, left out of citation formats"""
+    return "" if value.strip() in PLACEHOLDERS else value.strip()
+
+
+def year(date: str) -> str:
+    return match.group() if (match := re.search(r"\d{4}", date)) else ""
+
+
+def authors(detail: PaperDetail) -> list[str]:
+    """Authors are joined by "; " by PubMed and ", " by ACS"""
+    names = present(detail.authors)
+    return [name.strip() for name in re.split(r"[;,]\s*", names) if name.strip()]
+
+
+class _Exporter(ABC):
+    def __init__(self, file: Path | None, extra: Sequence[str] = (), append: bool = False) -> None:
+        """
+        Write details one by one as they arrive, so exporting does not hold them in memory
+
+        Args:
+            file: file to save, stdout if None
+            extra: names of columns written after the fields of details, like translations
+            append: add to the end of file instead of replacing it
+        """
+        self.file = file
+        self.extra = list(extra)
+        self.append = append
+        self.fields = [*PaperDetail._fields, *self.extra]
+        self.f: IO[str]
+
+    def __enter__(self) -> "_Exporter":
+        if self.open():
+            self.writeHeader()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def open(self) -> bool:
+        """Open file, returns False if appending to an existing file"""
+        if self.file is None:
+            self.f = sys.stdout
+            return True
+        new = not (self.append and self.file.exists() and self.file.stat().st_size)
+        self.f = self.file.open("a" if self.append else "w", newline="", encoding="utf-8")
+        return new
+
+    def writeHeader(self) -> None:
+        """Written at the start of a new file"""
+
+    @abstractmethod
+    def write(self, detail: PaperDetail, *values: str) -> None:
+        """Write a detail and values of the extra columns"""
+
+    def row(self, detail: PaperDetail, values: Sequence[str]) -> dict[str, str]:
+        return dict(zip(self.fields, [*detail, *values]))
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.f.close()
+        else:
+            self.f.flush()
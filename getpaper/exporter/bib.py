@@ -0,0 +1,58 @@
+import re
+
+from getpaper.exporter._exporter import _Exporter, authors, present, year
+from getpaper.spiders._spider import PaperDetail
+
+# Characters escaped by a backslash in field values
+SPECIAL = re.compile(r"([&%$#_{}])")
+VERBATIM = {"doi", "url"}  # Fields read as is by biblatex
+ENTRY = re.compile(r"@\w+\s*\{\s*([^,\s]+)\s*,")  # Start of an entry and its key
+
+
+def escape(value: str) -> str:
+    value = value.replace("\\", r"\textbackslash ")
+    return SPECIAL.sub(r"\\\1", " ".join(value.split()))
+
+
+class Exporter(_Exporter):
+    """BibTeX entries keyed by first author, year and first word of title"""
+
+    def open(self) -> bool:
+        self.keys: set[str] = set()
+        new = super().open()
+        if not new and self.file is not None:
+            # Keys of the entries already in the file are not issued again
+            with self.file.open(encoding="utf-8") as f:
+                self.keys.update(match.group(1) for line in f if (match := ENTRY.match(line)))
+        return new
+
+    def citeKey(self, detail: PaperDetail, names: list[str]) -> str:
+        last = names[0].split()[-1] if names else "Anonymous"
+        word = next(iter(re.findall(r"[A-Za-z]{3,}", present(detail.title))), "")
+        key = re.sub(r"[^A-Za-z0-9]", "", f"{last}{year(detail.date)}{word.lower()}") or "paper"
+        # Papers of the same key are told apart by a suffix
+        unique, count = key, 1
+        while unique in self.keys:
+            count += 1
+            unique = f"{key}{count}"
+        self.keys.add(unique)
+        return unique
+
+    def write(self, detail: PaperDetail, *values: str) -> None:
+        names = authors(detail)
+        fields = {
+            "title": present(detail.title),
+            "author": " and ".join(names),
+            "journal": present(detail.publication),
+            "year": year(detail.date),
+            "doi": present(detail.doi),
+            "url": present(detail.web),
+            "abstract": present(detail.abstract),
+            **dict(zip(self.extra, values)),
+        }
+        entry = ",\n".join(
+            f"  {name} = {{{value if name in VERBATIM else escape(value)}}}"
+            for name, value in fields.items()
+            if value
+        )
+        self.f.write(f"@article{{{self.citeKey(detail, names)},\n{entry}\n}}\n\n")
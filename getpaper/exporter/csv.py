@@ -0,0 +1,18 @@
+import csv
+
+from getpaper.config import RESULT_LIST_EN
+from getpaper.exporter._exporter import _Exporter
+from getpaper.spiders._spider import PaperDetail
+
+
+class Exporter(_Exporter):
+    def open(self) -> bool:
+        new = super().open()
+        self.writer = csv.writer(self.f)
+        return new
+
+    def writeHeader(self) -> None:
+        self.writer.writerow([*(s.strip(":\n\t") for s in RESULT_LIST_EN), *self.extra])
+
+    def write(self, detail: PaperDetail, *values: str) -> None:
+        self.writer.writerow([*detail, *values])
@@ -0,0 +1,9 @@
+import json
+
+from getpaper.exporter._exporter import _Exporter
+from getpaper.spiders._spider import PaperDetail
+
+
+class Exporter(_Exporter):
+    def write(self, detail: PaperDetail, *values: str) -> None:
+        self.f.write(json.dumps(self.row(detail, values), ensure_ascii=False) + "\n")
@@ -0,0 +1,62 @@
+"""Parquet needs pyarrow, an optional dependency not bundled into the exe: `pip install pyarrow`"""
+
+import os
+from typing import Any
+
+from getpaper.exporter._exporter import _Exporter
+from getpaper.spiders._spider import PaperDetail
+from getpaper.utils import TipException
+
+ROW_GROUP_SIZE = 10000  # Rows buffered before written as a row group
+COMPRESSION = "zstd"
+
+
+class Exporter(_Exporter):
+    """
+    Columnar file of string columns, written by row groups so memory is bounded by
+    ROW_GROUP_SIZE. Parquet files can not be appended in place, appending copies the row
+    groups of the existing file into a new one which replaces it when closed.
+    """
+
+    def open(self) -> bool:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise TipException("保存Parquet需要安装pyarrow") from e
+        if self.file is None:
+            raise TipException("Parquet只能保存到文件")
+
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.string()) for name in self.fields])
+        self.rows: list[list[str]] = []
+        existing = self.append and self.file.exists() and self.file.stat().st_size
+        self.target = self.file.with_name(self.file.name + ".part") if existing else self.file
+        self.writer = pq.ParquetWriter(self.target, self.schema, compression=COMPRESSION)
+        if existing:
+            old = pq.ParquetFile(self.file)
+            if old.schema_arrow.names != self.schema.names:
+                self.writer.close()
+                self.target.unlink()
+                raise TipException("追加的列与已有文件不同")
+            for batch in old.iter_batches(ROW_GROUP_SIZE):
+                self.writer.write_batch(batch.cast(self.schema))
+        return not existing
+
+    def write(self, detail: PaperDetail, *values: str) -> None:
+        self.rows.append([*detail, *values])
+        if len(self.rows) >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        columns: list[Any] = [self.pa.array(column, self.pa.string()) for column in zip(*self.rows)]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+        if self.target != self.file:
+            os.replace(self.target, self.file)  # type: ignore
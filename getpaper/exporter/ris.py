@@ -0,0 +1,25 @@
+from getpaper.exporter._exporter import _Exporter, authors, present, year
+from getpaper.spiders._spider import PaperDetail
+
+
+class Exporter(_Exporter):
+    """RIS for reference managers like EndNote and Zotero, extra columns are written as notes"""
+
+    def write(self, detail: PaperDetail, *values: str) -> None:
+        tags = [("TY", "JOUR"), ("TI", present(detail.title))]
+        tags += [("AU", name) for name in authors(detail)]
+        tags += [
+            ("PY", year(detail.date)),
+            ("DA", present(detail.date)),
+            ("JO", present(detail.publication)),
+            ("AB", " ".join(present(detail.abstract).splitlines())),
+            ("DO", present(detail.doi)),
+            ("UR", present(detail.web)),
+        ]
+        tags += [
+            ("N1", f"{name}: {' '.join(value.splitlines())}")
+            for name, value in zip(self.extra, values)
+            if value
+        ]
+        lines = [f"{tag}  - {value}" for tag, value in tags if value]
+        self.f.write("\n".join(lines) + "\nER  - \n\n")
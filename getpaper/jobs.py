@@ -0,0 +1,146 @@
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Iterable, NamedTuple
+
+from getpaper._db import transaction
+from getpaper.spiders._spider import PaperDetail
+
+COLUMNS = ", ".join(PaperDetail._fields)
+
+# States of a paper in a download job
+PENDING = "pending"
+RUNNING = "running"  # Left running by a crash or pause, downloaded again on resume
+DONE = "done"
+FAILED = "failed"
+NOT_INCLUDED = "not_included"  # No doi or no pdf on Sci-Hub, not retried
+UNFINISHED = (PENDING, RUNNING)
+
+
+class Job(NamedTuple):
+    id: int
+    target_dir: Path
+    created: float
+    states: Counter[str]
+
+
+class JobItem(NamedTuple):
+    seq: int
+    detail: PaperDetail
+    sha256: str | None  # Of the pdf downloaded
+
+
+class DownloadJournal:
+    def __init__(self, path: Path) -> None:
+        """
+        Download jobs and the state of each paper in them, so a batch can be paused, resumed
+        after a crash and retried for the failed papers only.
+
+        Args:
+            path: database file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.executescript(
+            f"""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                target_dir TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                job INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT '',
+                sha256 TEXT,
+                updated REAL NOT NULL,
+                {", ".join(f"{field} TEXT NOT NULL" for field in PaperDetail._fields)},
+                PRIMARY KEY (job, seq)
+            );
+            CREATE INDEX IF NOT EXISTS items_state ON items (job, state);
+            """
+        )
+
+    def create(self, details: Iterable[PaperDetail], target_dir: Path) -> int:
+        """Add a job downloading details to target_dir, returns its id"""
+        now = time()
+        with self.lock, transaction(self.db):
+            job = self.db.execute(
+                "INSERT INTO jobs (target_dir, created) VALUES (?, ?)",
+                (str(target_dir.absolute()), now),
+            ).lastrowid
+            self.db.executemany(
+                f"INSERT INTO items (job, seq, state, updated, {COLUMNS}) "
+                f"VALUES ({', '.join('?' * (4 + len(PaperDetail._fields)))})",
+                ((job, seq, PENDING, now, *detail) for seq, detail in enumerate(details)),
+            )
+        return job  # type: ignore
+
+    def get(self, job: int) -> Job | None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT target_dir, created FROM jobs WHERE id = ?", (job,)
+            ).fetchone()
+            states = self.db.execute(
+                "SELECT state, COUNT(*) FROM items WHERE job = ? GROUP BY state", (job,)
+            ).fetchall()
+        return Job(job, Path(row[0]), row[1], Counter(dict(states))) if row else None
+
+    def jobs(self, limit: int = 20) -> list[Job]:
+        """The latest jobs, newest first"""
+        with self.lock:
+            ids = [
+                row[0]
+                for row in self.db.execute("SELECT id FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+            ]
+        return [job for job_id in ids if (job := self.get(job_id))]
+
+    def latest(self, states: Iterable[str] = UNFINISHED) -> Job | None:
+        """The newest job having papers in states"""
+        states = tuple(states)
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT MAX(job) FROM items WHERE state IN ({', '.join('?' * len(states))})",
+                states,
+            ).fetchone()
+        return self.get(row[0]) if row[0] is not None else None
+
+    def items(self, job: int, states: Iterable[str] = UNFINISHED) -> list[JobItem]:
+        states = tuple(states)
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT seq, sha256, {COLUMNS} FROM items "
+                f"WHERE job = ? AND state IN ({', '.join('?' * len(states))}) ORDER BY seq",
+                (job, *states),
+            ).fetchall()
+        return [JobItem(row[0], PaperDetail(*row[2:]), row[1]) for row in rows]
+
+    def update(
+        self, job: int, seq: int, state: str, status: str = "", sha256: str | None = None
+    ) -> None:
+        """Set the state of a paper, sha256 is kept if None"""
+        with self.lock:
+            self.db.execute(
+                "UPDATE items SET state = ?, status = ?, sha256 = COALESCE(?, sha256), "
+                "updated = ? WHERE job = ? AND seq = ?",
+                (state, status, sha256, time(), job, seq),
+            )
+
+    def reset(self, job: int, states: Iterable[str]) -> int:
+        """Set papers in states to pending, returns the number of them"""
+        states = tuple(states)
+        with self.lock:
+            return self.db.execute(
+                f"UPDATE items SET state = ?, updated = ? "
+                f"WHERE job = ? AND state IN ({', '.join('?' * len(states))})",
+                (PENDING, time(), job, *states),
+            ).rowcount
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from time import monotonic
+
+log = logging.getLogger("GetPaper")
+
+
+class TokenBucket:
+    rate: float
+    burst: int
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """
+        Token bucket which lets `burst` requests go at once and then `rate` requests per second.
+        Each acquire reserves its own slot once, so waiters are served in order without a lock,
+        a pause puts off the slots waiting by its length, keeping their order.
+
+        Args:
+            rate: tokens refilled per second
+            burst: capacity of the bucket
+        """
+        self.configure(rate, burst)
+        self.tat = 0.0  # theoretical arrival time of the next request
+        self.blocked_until = 0.0
+        self.shifted = 0.0  # Seconds slots were put off by all pauses
+
+    def configure(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+
+    async def acquire(self) -> None:
+        """Wait until a token is available"""
+        now = monotonic()
+        interval = 1 / self.rate
+        tat = max(self.tat, now, self.blocked_until)
+        send_at = max(now, self.blocked_until, tat - (self.burst - 1) * interval)
+        self.tat = tat + interval
+        shifted = self.shifted
+        while True:
+            if self.shifted != shifted:
+                # Paused while waiting, the slot reserved is put off by the pause
+                send_at = max(send_at + self.shifted - shifted, self.blocked_until)
+                shifted = self.shifted
+            if (delay := send_at - monotonic()) <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for seconds, used when the server asks to slow down"""
+        now = monotonic()
+        start = max(now, self.blocked_until)
+        if (shift := now + seconds - start) <= 0:
+            return
+        # Slots reserved past the start of the pause move after it
+        if self.tat > start:
+            self.tat += shift
+        self.shifted += shift
+        self.blocked_until = now + seconds
+
+
+class RateLimiter:
+    def __init__(self, limits: dict[str, tuple[float, int]], default: tuple[float, int]) -> None:
+        """
+        A token bucket for each host
+
+        Args:
+            limits: {host: (rate, burst)}, rate is requests per second
+            default: (rate, burst) of hosts not in limits
+        """
+        self.limits = dict(limits)
+        self.default = default
+        self.buckets: dict[str, TokenBucket] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        if (bucket := self.buckets.get(host)) is None:
+            bucket = self.buckets[host] = TokenBucket(*self.limits.get(host, self.default))
+        return bucket
+
+    def configure(self, host: str, rate: float, burst: int = 1) -> None:
+        """Change the rate and burst of host"""
+        self.limits[host] = (rate, burst)
+        self.bucket(host).configure(rate, burst)
+
+    async def acquire(self, host: str) -> None:
+        await self.bucket(host).acquire()
+
+    def pause(self, host: str, seconds: float) -> None:
+        log.info(f"Rate limited by {host}, pause {seconds:.1f}s")
+        self.bucket(host).pause(seconds)
@@ -0,0 +1,133 @@
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from time import perf_counter, time
+from typing import Any, Iterator
+
+# Name of the job the running task belongs to, inherited by the tasks it creates
+current_job: ContextVar[str] = ContextVar("current_job", default="")
+
+Key = tuple[str, str, str]  # (name, host, job)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """
+        Counters and timing spans aggregated by name, host and job.
+        Counters: requests, retries, cache_hits, revalidated, bytes, connections, failures, ...
+        Spans: wait, dns, connect, ttfb, download, parse, ...
+        """
+        self.lock = Lock()
+        self.counters: dict[Key, float] = defaultdict(float)
+        self.spans: dict[Key, list[float]] = {}  # [count, total seconds, max seconds]
+
+    def count(self, name: str, host: str = "", value: float = 1) -> None:
+        with self.lock:
+            self.counters[(name, host, current_job.get())] += value
+
+    def observe(self, name: str, seconds: float, host: str = "") -> None:
+        key = (name, host, current_job.get())
+        with self.lock:
+            if (span := self.spans.get(key)) is None:
+                self.spans[key] = [1, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                span[2] = max(span[2], seconds)
+
+    @contextmanager
+    def span(self, name: str, host: str = "") -> Iterator[None]:
+        """Observe the time spent in the context"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, host)
+
+    @contextmanager
+    def job(self, name: str) -> Iterator[None]:
+        """Metrics recorded in the context and tasks created in it belong to job"""
+        token = current_job.set(name)
+        try:
+            yield
+        finally:
+            current_job.reset(token)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """All counters and spans as dicts"""
+        with self.lock:
+            counters = list(self.counters.items())
+            spans = [(key, list(span)) for key, span in self.spans.items()]
+        records: list[dict[str, Any]] = [
+            {"type": "counter", "name": name, "host": host, "job": job, "value": value}
+            for (name, host, job), value in counters
+        ]
+        records.extend(
+            {
+                "type": "span",
+                "name": name,
+                "host": host,
+                "job": job,
+                "count": count,
+                "total": total,
+                "mean": total / count,
+                "max": longest,
+            }
+            for (name, host, job), (count, total, longest) in spans
+        )
+        return records
+
+    def exportJSONLines(self, file: Path) -> None:
+        """Append a snapshot to file, one line for each counter or span"""
+        now = time()
+        with file.open("a", encoding="utf-8") as f:
+            for record in self.snapshot():
+                f.write(json.dumps({"time": now, **record}, ensure_ascii=False) + "\n")
+
+    def exportPrometheus(self) -> str:
+        """A snapshot in Prometheus text exposition format"""
+
+        def labels(**kwargs: str) -> str:
+            return ",".join(f'{k}="{v}"' for k, v in kwargs.items() if v)
+
+        counters: dict[str, list[str]] = defaultdict(list)
+        spans: list[str] = []
+        longest: list[str] = []
+        for record in self.snapshot():
+            if record["type"] == "counter":
+                label = labels(host=record["host"], job=record["job"])
+                counters[record["name"]].append(f"{{{label}}} {record['value']:g}")
+            else:
+                label = labels(span=record["name"], host=record["host"], job=record["job"])
+                spans.append(f"getpaper_span_seconds_count{{{label}}} {record['count']:g}")
+                spans.append(f"getpaper_span_seconds_sum{{{label}}} {record['total']:.6f}")
+                longest.append(f"getpaper_span_seconds_max{{{label}}} {record['max']:.6f}")
+
+        lines = []
+        for name, samples in counters.items():
+            lines.append(f"# TYPE getpaper_{name}_total counter")
+            lines.extend(f"getpaper_{name}_total{sample}" for sample in samples)
+        if spans:
+            lines.append("# TYPE getpaper_span_seconds summary")
+            lines.extend(spans)
+            lines.append("# TYPE getpaper_span_seconds_max gauge")
+            lines.extend(longest)
+        return "\n".join(lines) + "\n"
+
+    def export(self, file: Path) -> None:
+        """Export as json lines if file ends with .jsonl, otherwise as Prometheus text"""
+        if file.suffix == ".jsonl":
+            self.exportJSONLines(file)
+        else:
+            file.write_text(self.exportPrometheus(), encoding="utf-8")
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.spans.clear()
+
+
+metrics = Metrics()
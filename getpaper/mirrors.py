@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from typing import Any, Iterable
+from urllib.parse import urlsplit
+
+from getpaper.config import HEDGE_DELAY, MIRROR_MIN_SUCCESS, MIRROR_SMOOTHING
+from getpaper.metrics import metrics
+from getpaper.utils import getClient
+
+log = logging.getLogger("GetPaper")
+
+HEDGES = 2  # Mirrors requested at the same time for a page
+
+
+def normalizeURL(url: str) -> str:
+    """Add https:// if url has no scheme, strip the trailing slash"""
+    url = url.strip()
+    if not url.startswith(("https://", "http://")):
+        url = "https://" + url
+    return url.strip("/")
+
+
+def failed(response: Any) -> bool:
+    """Whether the mirror failed to serve the response"""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class Mirror:
+    def __init__(self, url: str) -> None:
+        """Rolling latency and success rate of a Sci-Hub mirror"""
+        self.url = url
+        self.host = urlsplit(url).hostname or ""
+        self.latency: float | None = None  # Smoothed seconds of successful requests
+        self.deviation = 0.0  # Smoothed deviation of latency
+        self.success = 1.0  # Smoothed success rate, a new mirror is trusted until it fails
+
+    def observe(self, seconds: float | None) -> None:
+        """Record a request finished in seconds, None if it failed"""
+        self.success += MIRROR_SMOOTHING * ((seconds is not None) - self.success)
+        if seconds is None:
+            return
+        if self.latency is None:
+            self.latency, self.deviation = seconds, seconds / 2
+        else:
+            self.deviation += MIRROR_SMOOTHING * (abs(seconds - self.latency) - self.deviation)
+            self.latency += MIRROR_SMOOTHING * (seconds - self.latency)
+
+    def score(self) -> float:
+        """Expected seconds to get a page, lower is better"""
+        latency = HEDGE_DELAY[1] if self.latency is None else self.latency
+        return latency / max(self.success, 0.01)
+
+    def hedgeDelay(self) -> float:
+        """Seconds to wait for a response before requesting another mirror too"""
+        low, high = HEDGE_DELAY
+        if self.latency is None:
+            return high
+        return min(high, max(low, self.latency + 4 * self.deviation))
+
+    def __repr__(self) -> str:
+        return f"Mirror({self.url!r}, latency={self.latency}, success={self.success:.2f})"
+
+
+class MirrorPool:
+    def __init__(self, urls: Iterable[str]) -> None:
+        """
+        Sci-Hub mirrors ranked by rolling latency and success rate, ties keep the order of urls.
+        All mirrors are probed on first use, a page is requested from the best mirror and
+        also from the next one if the first is slower than usual (hedging), failed mirrors
+        are passed over to the next one until a mirror responds.
+
+        Args:
+            urls: urls of mirrors, the preferred one first
+        """
+        mirrors = {normalizeURL(url): None for url in urls if url.strip()}
+        self.mirrors = [Mirror(url) for url in mirrors]
+        self.probing: asyncio.Task | None = None
+        self.probes: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self.mirrors)
+
+    def ranked(self) -> list[Mirror]:
+        """Healthy mirrors by score, then the failing ones, mirrors with open circuits last"""
+        breaker = getClient().breaker
+
+        def key(mirror: Mirror) -> tuple[bool, bool, float]:
+            opened = breaker is not None and breaker.isOpen(mirror.host)
+            return opened, mirror.success < MIRROR_MIN_SUCCESS, mirror.score()
+
+        return sorted(self.mirrors, key=key)
+
+    async def send(self, mirror: Mirror, path: str = "", method: str = "GET") -> Any:
+        """
+        Request path from mirror and record its latency, cached responses are not recorded.
+        The latency is the transfer time measured by curl, waits for the rate limit and a free
+        connection of the client are not counted against the mirror.
+        """
+        try:
+            response = await getClient().request(method, f"{mirror.url}/{path}")
+        except Exception:
+            mirror.observe(None)
+            raise
+        if not getattr(response, "from_cache", False):
+            mirror.observe(None if failed(response) else response.elapsed.total_seconds())
+        return response
+
+    async def measure(self, mirror: Mirror) -> bool:
+        """Send a HEAD request to mirror, returns whether it responded"""
+        try:
+            return not failed(await self.send(mirror, method="HEAD"))
+        except Exception as e:
+            log.info(f"Probe {mirror.url} failed: {e!r}")
+            return False
+
+    async def probe(self) -> None:
+        """
+        Probe all mirrors once, returns when any of them responds.
+        The other probes keep running in background to rank the slower mirrors.
+        """
+        if self.probing is None:
+            self.probing = asyncio.create_task(self._probe())
+        await asyncio.shield(self.probing)
+
+    async def _probe(self) -> None:
+        self.probes = {asyncio.create_task(self.measure(mirror)) for mirror in self.mirrors}
+        pending = set(self.probes)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if any(task.result() for task in done):
+                break
+        log.info(f"Sci-Hub mirrors: {self.ranked()}")
+
+    async def get(self, path: str, exclude: Iterable[str] = ()) -> tuple[Mirror, Any]:
+        """
+        Get path from the best mirror, hedged by the next mirror when it is slow.
+
+        Args:
+            path: path after the url of mirror, like a doi
+            exclude: urls of mirrors not to request
+        Returns:
+            (mirror, response): the first mirror responded, or the last one responded an error
+            status if all mirrors failed
+        Raises:
+            the exception of the last mirror if none of them responded
+        """
+        await self.probe()
+        exclude = set(exclude)
+        candidates = [mirror for mirror in self.ranked() if mirror.url not in exclude]
+        if not candidates:
+            raise ValueError(f"No mirror left to get {path}")
+
+        pending: dict[asyncio.Task, Mirror] = {}
+        error: Exception | None = None
+        fallback: tuple[Mirror, Any] | None = None
+        start = True
+        try:
+            while True:
+                if start and candidates and len(pending) < HEDGES:
+                    mirror = candidates.pop(0)
+                    pending[asyncio.create_task(self.send(mirror, path))] = mirror
+                if not pending:
+                    break
+                hedging = bool(candidates) and len(pending) < HEDGES
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=mirror.hedgeDelay() if hedging else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                # Request the next mirror if the last one is slow or any of them failed
+                start = not done
+                if start:
+                    log.debug(f"Hedge {path}: {mirror.url} is slow")
+                    metrics.count("hedges", mirror.host)
+                for task in done:
+                    done_mirror = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except Exception as e:
+                        log.info(f"Mirror {done_mirror.url} failed to get {path}: {e!r}")
+                        error, start = e, True
+                        metrics.count("failovers", done_mirror.host)
+                        continue
+                    if not failed(response):
+                        return done_mirror, response
+                    fallback, start = (done_mirror, response), True
+                    metrics.count("failovers", done_mirror.host)
+        finally:
+            for task in pending:
+                task.cancel()
+        if fallback is not None:
+            return fallback
+        raise error  # type: ignore
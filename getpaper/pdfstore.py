@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import stat
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Callable, Sequence
+
+from getpaper.store import normalizeDOI
+
+log = logging.getLogger("GetPaper")
+
+FICLONE = 0x40049409  # Linux ioctl cloning a file, supported by btrfs, xfs, bcachefs...
+
+
+def reflink(src: Path, dst: Path) -> None:
+    """Copy-on-write clone of src, raises OSError where not supported"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink is not supported on this platform")
+    with src.open("rb") as s, dst.open("wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+LINKS: dict[str, Callable[[Path, Path], object]] = {
+    "reflink": reflink,
+    "hardlink": os.link,
+    "copy": shutil.copyfile,
+}
+
+
+def materialize(src: Path, dst: Path, methods: Sequence[str]) -> str:
+    """
+    Create dst with the content of src by the first method that works, replacing dst if exists
+
+    Args:
+        src: existing file
+        dst: file to create
+        methods: names in LINKS to try in order
+    Returns:
+        the method used
+    """
+    tmp = dst.with_name(dst.name + ".link")
+    for method in methods:
+        tmp.unlink(missing_ok=True)
+        try:
+            LINKS[method](src, tmp)
+        except OSError as e:
+            log.debug(f"{method} {src} failed: {e}")
+            continue
+        if method == "hardlink":
+            # Editing either name would change the stored pdf and every folder linked to it
+            os.chmod(tmp, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp, dst)
+        return method
+    tmp.unlink(missing_ok=True)
+    raise OSError(f"Failed to materialize {src} as {dst} by {methods}")
+
+
+class PDFStore:
+    def __init__(self, root: Path, links: Sequence[str]) -> None:
+        """
+        Downloaded pdfs kept once under root by sha256 and indexed by doi, so a paper downloaded
+        for another folder is linked instead of downloaded again. Where links lead to copying
+        only, a pdf is not copied into root but indexed in the folder it was downloaded to.
+
+        Args:
+            root: directory of the pdfs and index
+            links: ways of putting a stored pdf into a folder, tried in order, see LINKS
+        """
+        root.mkdir(parents=True, exist_ok=True)
+        self.root = root
+        self.links = links
+        self.lock = Lock()
+        self.db = sqlite3.connect(
+            root / "index.sqlite3", check_same_thread=False, isolation_level=None
+        )
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS pdfs (
+                doi_key TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                added REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pdfs_sha256 ON pdfs (sha256);
+            CREATE TABLE IF NOT EXISTS files (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL
+            );
+            """
+        )
+
+    def blob(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / f"{sha256}.pdf"
+
+    def source(self, sha256: str) -> Path:
+        """The stored pdf of sha256, or the downloaded pdf indexed in place of it"""
+        if (blob := self.blob(sha256)).exists():
+            return blob
+        with self.lock:
+            row = self.db.execute("SELECT path FROM files WHERE sha256 = ?", (sha256,)).fetchone()
+        return Path(row[0]) if row else blob
+
+    def lookup(self, doi: str) -> Path | None:
+        """Stored pdf of doi, None if not stored"""
+        if not (key := normalizeDOI(doi)):
+            return None
+        with self.lock:
+            row = self.db.execute(
+                "SELECT sha256, size FROM pdfs WHERE doi_key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        source = self.source(row[0])
+        try:
+            if source.stat().st_size == row[1]:
+                return source
+        except FileNotFoundError:
+            pass
+        # Deleted, or modified through a hard link or in its folder
+        log.info(f"Stored pdf of {doi} is missing or changed: {source}")
+        with self.lock:
+            self.db.execute("DELETE FROM pdfs WHERE doi_key = ?", (key,))
+            self.db.execute("DELETE FROM files WHERE sha256 = ?", (row[0],))
+        return None
+
+    def materialize(self, blob: Path, file: Path) -> str:
+        """Put a stored pdf to file, returns the method used"""
+        return materialize(blob, file, self.links)
+
+    def add(self, doi: str, file: Path) -> str:
+        """
+        Store a downloaded pdf indexed by doi, file is replaced by a link to the stored one
+        if the same pdf was stored before. A pdf that can only be copied into the store is
+        indexed where it is instead, it is copied when another folder needs it.
+
+        Returns:
+            sha256 of file
+        """
+        with file.open("rb") as f:
+            sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+        size = file.stat().st_size
+        source = self.source(sha256)
+        if source.exists() and source.stat().st_size == size:
+            if not source.samefile(file):
+                self.materialize(source, file)
+        else:
+            self.blob(sha256).parent.mkdir(exist_ok=True)
+            try:
+                materialize(file, self.blob(sha256), [m for m in self.links if m != "copy"])
+            except OSError:
+                # A copy would keep the pdf twice on disk
+                with self.lock:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO files (sha256, path) VALUES (?, ?)",
+                        (sha256, str(file.resolve())),
+                    )
+        if key := normalizeDOI(doi):
+            with self.lock:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO pdfs (doi_key, sha256, size, added) VALUES (?, ?, ?, ?)",
+                    (key, sha256, size, time()),
+                )
+        return sha256
+
+    def close(self) -> None:
+        self.db.close()
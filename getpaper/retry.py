@@ -0,0 +1,99 @@
+import logging
+import random
+from time import monotonic
+
+log = logging.getLogger("GetPaper")
+
+
+class RetryPolicy:
+    def __init__(
+        self, attempts: int, base: float, cap: float, budget_ratio: float, budget: float
+    ) -> None:
+        """
+        Exponential backoff with full jitter, limited by a retry budget of each host.
+        Every request deposits budget_ratio tokens and every retry takes one, so retries stay
+        a small share of the traffic when a host keeps failing.
+
+        Args:
+            attempts: max retries of a request
+            base: seconds to wait before the first retry, doubled for each retry
+            cap: max seconds to wait
+            budget_ratio: tokens deposited by each request
+            budget: max tokens saved by a host, also the initial tokens
+        """
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.budget_ratio = budget_ratio
+        self.budget = budget
+        self.tokens: dict[str, float] = {}
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry attempt, starting from 0"""
+        return random.uniform(0, min(self.cap, self.base * 2**attempt))
+
+    def deposit(self, host: str) -> None:
+        tokens = self.tokens.get(host, self.budget)
+        self.tokens[host] = min(self.budget, tokens + self.budget_ratio)
+
+    def withdraw(self, host: str, attempt: int) -> bool:
+        """Take a token for retry attempt, False if attempts or the budget of host run out"""
+        tokens = self.tokens.get(host, self.budget)
+        if attempt >= self.attempts or tokens < 1:
+            return False
+        self.tokens[host] = tokens - 1
+        return True
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str) -> None:
+        """Requests to host are rejected without sending, the host failed too many times"""
+        super().__init__(f"Circuit of {host} is open")
+        self.host = host
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        """
+        A circuit of each host, opened after threshold consecutive failures.
+        An open circuit rejects requests for reset_timeout seconds, then lets one trial request
+        through (half open), which closes the circuit on success or opens it again on failure.
+
+        Args:
+            threshold: consecutive failures to open the circuit
+            reset_timeout: seconds before trying an open host again
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures: dict[str, int] = {}
+        self.opened: dict[str, float] = {}  # host: time opened
+        self.trying: set[str] = set()  # half open hosts waiting for the result of a trial
+
+    def allow(self, host: str) -> bool:
+        if (opened := self.opened.get(host)) is None:
+            return True
+        if monotonic() - opened < self.reset_timeout:
+            return False
+        # Half open, let one trial through, another one after reset_timeout if it never returns
+        self.opened[host] = monotonic()
+        self.trying.add(host)
+        return True
+
+    def isOpen(self, host: str) -> bool:
+        """Whether requests to host are rejected now, unlike allow() never starts a trial"""
+        opened = self.opened.get(host)
+        return opened is not None and monotonic() - opened < self.reset_timeout
+
+    def success(self, host: str) -> None:
+        if self.opened.pop(host, None) is not None:
+            log.info(f"Circuit of {host} closed")
+        self.trying.discard(host)
+        self.failures.pop(host, None)
+
+    def failure(self, host: str) -> None:
+        self.failures[host] = failures = self.failures.get(host, 0) + 1
+        if failures >= self.threshold or host in self.trying:
+            if host not in self.opened:
+                log.warning(f"Circuit of {host} opened after {failures} failures")
+            self.opened[host] = monotonic()
+            self.trying.discard(host)
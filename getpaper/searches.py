@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, NamedTuple
+
+from getpaper._db import transaction
+from getpaper.spiders._spider import PaperDetail, ResultStream
+from getpaper.utils import TipException, getSearchStore, getSpider
+
+if TYPE_CHECKING:
+    from getpaper.spiders.PubMed import Spider as PubMedSpider
+
+log = logging.getLogger("GetPaper")
+
+# Days searched again before the last run, papers entered late that day are not missed
+OVERLAP_DAYS = 1
+# Newest papers fetched by the first run of a search, older papers are left out
+FIRST_RUN_PAPERS = 9999
+
+
+class SavedSearch(NamedTuple):
+    name: str
+    engine: str
+    params: dict[str, str]  # Arguments of the spider
+    last_date: str  # ISO date of the last complete run, "" if never run
+    last_run: float
+    seen: int  # Number of PMIDs fetched by all runs
+
+
+class SearchStore:
+    def __init__(self, path: Path) -> None:
+        """
+        Saved searches and the PMIDs fetched by their runs, so a run only fetches new papers
+
+        Args:
+            path: database file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS searches (
+                name TEXT PRIMARY KEY,
+                engine TEXT NOT NULL,
+                params TEXT NOT NULL,
+                last_date TEXT NOT NULL DEFAULT '',
+                last_run REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS seen (
+                name TEXT NOT NULL,
+                pmid TEXT NOT NULL,
+                PRIMARY KEY (name, pmid)
+            );
+            """
+        )
+
+    def save(self, name: str, engine: str, params: dict[str, str]) -> None:
+        """Add a search, or replace the search of name and forget its runs"""
+        with self.lock, transaction(self.db):
+            self.db.execute("DELETE FROM seen WHERE name = ?", (name,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO searches (name, engine, params) VALUES (?, ?, ?)",
+                (name, engine, json.dumps(params, ensure_ascii=False)),
+            )
+
+    def get(self, name: str) -> SavedSearch | None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT name, engine, params, last_date, last_run, "
+                "(SELECT COUNT(*) FROM seen WHERE seen.name = searches.name) "
+                "FROM searches WHERE name = ?",
+                (name,),
+            ).fetchone()
+        return SavedSearch(row[0], row[1], json.loads(row[2]), *row[3:]) if row else None
+
+    def searches(self) -> list[SavedSearch]:
+        with self.lock:
+            names = [row[0] for row in self.db.execute("SELECT name FROM searches ORDER BY name")]
+        return [search for name in names if (search := self.get(name))]
+
+    def remove(self, name: str) -> bool:
+        with self.lock, transaction(self.db):
+            self.db.execute("DELETE FROM seen WHERE name = ?", (name,))
+            removed = self.db.execute("DELETE FROM searches WHERE name = ?", (name,)).rowcount
+        return bool(removed)
+
+    def seen(self, name: str) -> set[str]:
+        """PMIDs fetched by the runs of search"""
+        with self.lock:
+            return {
+                row[0] for row in self.db.execute("SELECT pmid FROM seen WHERE name = ?", (name,))
+            }
+
+    def record(self, name: str, pmids: Iterable[str], last_date: str | None) -> None:
+        """Add PMIDs fetched by a run, and set the date of the last complete run if not None"""
+        with self.lock, transaction(self.db):
+            self.db.executemany(
+                "INSERT OR IGNORE INTO seen (name, pmid) VALUES (?, ?)",
+                ((name, pmid) for pmid in pmids),
+            )
+            self.db.execute(
+                "UPDATE searches SET last_date = COALESCE(?, last_date), last_run = ? "
+                "WHERE name = ?",
+                (last_date, time(), name),
+            )
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def saveSearch(name: str, engine: str, params: dict[str, str]) -> None:
+    """Save a search for SearchRun, only spiders searching by entrez date are supported"""
+    if not hasattr(getSpider(engine, **params), "enteredSince"):
+        raise TipException(f"{engine}不支持检索新文献")
+    getSearchStore().save(name, engine, params)
+
+
+class SearchRun:
+    def __init__(self, name: str) -> None:
+        """
+        A run of a saved search. The search is limited to papers entered since the last
+        complete run, and only PMIDs not fetched by previous runs are fetched.
+
+            run = SearchRun(name)
+            num = await run.search()
+            async for index, detail in run:
+                ...
+
+        Args:
+            name: name of the saved search
+        """
+        if (search := getSearchStore().get(name)) is None:
+            raise TipException(f"未找到保存的搜索：{name}")
+        self.saved = search
+        # Spiders searching by entrez date, checked by saveSearch. Sorted by date, so a search
+        # past the retrieval limit of the engine is split by date instead of cut
+        params = {**search.params, "sorting": "日期"}
+        self.spider: "PubMedSpider" = getSpider(search.engine, **params)  # type: ignore
+        self.today = date.today().isoformat()
+        self.total = 0
+        self.pmids: list[str] = []  # All PMIDs found by the search
+        self.found_all = False  # Whether self.pmids holds every PMID the run should fetch
+
+    async def search(self) -> int:
+        """Search papers entered since the last run, returns the number of new papers"""
+        spider = self.spider
+        if last_date := self.saved.last_date:
+            since = date.fromisoformat(last_date) - timedelta(days=OVERLAP_DAYS)
+            spider.enteredSince(since.strftime("%Y/%m/%d"))
+        self.total = total = await spider.getTotalPaperNum()
+        # The first run searches all time, it only fetches the newest papers
+        num = total if last_date else min(total, FIRST_RUN_PAPERS)
+        self.pmids = list(await spider.getPMIDs(num)) if num else []
+        self.found_all = len(self.pmids) == num and not spider.truncated
+        seen = await asyncio.to_thread(getSearchStore().seen, self.saved.name)
+        spider.pmids = new = [pmid for pmid in self.pmids if pmid not in seen]
+        log.info(
+            f"Saved search {self.saved.name}: {total} since {last_date or 'ever'}, {len(new)} new"
+        )
+        return len(new)
+
+    async def __aiter__(self) -> AsyncIterator[tuple[int, PaperDetail]]:
+        """Fetch the new papers in order, PMIDs fetched are recorded even if interrupted"""
+        pmids = self.spider.pmids or []
+        self.spider.failed = set()
+        delivered = []
+        complete = False
+        try:
+            async for index, detail in ResultStream(self.spider, len(pmids)):
+                delivered.append(pmids[index])
+                yield index, detail
+            complete = self.found_all and not self.spider.failed
+        finally:
+            # The search window moves on only if every new paper was fetched
+            fetched = [pmid for pmid in delivered if pmid not in self.spider.failed]
+            record = asyncio.to_thread(
+                getSearchStore().record,
+                self.saved.name,
+                fetched if not complete else self.pmids,
+                self.today if complete else None,
+            )
+            # Shielded, the run is recorded even if the fetch was cancelled
+            await asyncio.shield(record)
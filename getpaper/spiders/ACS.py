@@ -1,15 +1,16 @@
 import asyncio
 import logging
-import re
 from queue import PriorityQueue
 from typing import Any, Dict
+from urllib.parse import urlsplit
 
 from bs4 import BeautifulSoup
 
+from getpaper.metrics import metrics
+from getpaper.spiders._parser import emptyDetail, errorDetail, parseACSPage
 from getpaper.spiders._spider import _Spider
-from getpaper.utils import TipException, getClient
+from getpaper.utils import TipException, getClient, getStore, runParser, runWorkers
 
-GET_FREQUENCY = 0.05  # frequency to fetch paper
 log = logging.getLogger("GetPaper")
 
 
@@ -47,12 +48,9 @@ class Spider(_Spider):
         self.data["startPage"] = 0
         self.data["pageSize"] = 20
         try:
-            async with (
-                getClient() as session,
-                session.get(self.base_url, params=self.data) as response,
-            ):
-                log.info(f"Get URL: {response.url}\nURL Status: {response.status}")
-                html = await response.text()
+            response = await getClient().get(self.base_url, params=self.data)
+            log.info(f"Get URL: {response.url}\nURL Status: {response.status_code}")
+            html = response.text
         except asyncio.exceptions.TimeoutError as e:
             log.info("ACS Spider Get Total Num Time Out")
             raise TipException("连接超时") from e
@@ -71,83 +69,32 @@ class Spider(_Spider):
             num: The number of papers to be fetched on a html
         """
         page = data["startPage"]
-        # Decrease access frequency
-        await asyncio.sleep(page * GET_FREQUENCY)
+        start, stop = page * 100, min((page + 1) * 100, num)
 
         try:
-            async with self.session.get(self.base_url, params=data) as response:
-                log.info(f"Get URL: {response.url}\nURL Status: {response.status}")
-                html = await response.text()
+            response = await getClient().get(self.base_url, params=data)
+            log.info(f"Get URL: {response.url}\nURL Status: {response.status_code}")
+            with metrics.span("parse", urlsplit(self.base_url).hostname or ""):
+                details = await runParser(parseACSPage, response.content, stop - start)
         except Exception:
             log.exception("ACS Spider Error")
-            for index in range(page * 100, min((page + 1) * 100, num)):
-                self.result_queue.put((index, ["Error"] * 6))
+            metrics.count("paper_failures", value=stop - start)
+            for index in range(start, stop):
+                self.result_queue.put((index, errorDetail(self.base_url)))
         else:
-            bs = BeautifulSoup(html, "lxml")
-            contents = iter(bs.find_all(class_="issue-item_metadata"))
-            for index in range(page * 100, min((page + 1) * 100, num)):
-                try:
-                    content = next(contents)
-                except StopIteration:
-                    self.result_queue.put((index, [""] * 6))
-                    continue
-                # Find titles、doi、web_url
-                title_tag = content.find("h2", class_="issue-item_title")
-                title = title_tag.text if title_tag else "No title"
-                doi = title_tag.a["href"].removesuffix("/doi/") if title_tag else "No DOI"
-                web = "https://pubs.acs.org" + title_tag.a["href"] if title_tag else "No URL"
-                # Find authors list
-                authors = tag.text if (tag := content.ul) else "No Authors"
-                # Find publish date
-                date = (
-                    tag.text
-                    if (tag := content.find(class_="pub-date-value"))
-                    else "No Publication Date"
-                )
-                # Find abstracts
-                abstract = (
-                    tag.text
-                    if (tag := content.find("span", class_="hlFld-Abstract"))
-                    else "No Abstract"
-                )
-
-                # find publications
-                # Chapter and article have different format
-                if content.parent.find(class_="infoType").string == "Chapter":
-                    publication = re.sub(
-                        r"\s+", " ", content.find(class_="issue-item_chapter").text
-                    )
-                else:
-                    publication = (
-                        tag.text
-                        if (tag := content.find(class_="issue-item_jour-name"))
-                        else "No Publication"
-                    )
-                # Save data to result queue
-                self.result_queue.put(
-                    (index, (title, authors, date, publication, abstract, doi, web))
-                )
+            # Save data to result queue, fill the rest of page when items run out
+            for i, index in enumerate(range(start, stop)):
+                detail = details[i] if i < len(details) else emptyDetail(self.base_url)
+                self.result_queue.put((index, detail))
+            await asyncio.to_thread(getStore().upsert, [(None, detail) for detail in details])
 
     async def getAllPapers(self, queue: PriorityQueue, num: int) -> None:
         self.result_queue = queue
         num = max(1, num)
         self.data["pageSize"] = 100
 
-        if getattr(self, "session", None) is None:
-            self.session = getClient()
-
-        tasks = []
-        for page in range((num - 1) // 100 + 1):
-            self.data["startPage"] = page
-            tasks.append(self.getPagesInfo(self.data.copy(), num))
-
-        await asyncio.gather(*tasks)
-
-        if hasattr(self, "session"):
-            try:
-                await self.session.close()
-            finally:
-                del self.session
+        pages = ({**self.data, "startPage": page} for page in range((num - 1) // 100 + 1))
+        await runWorkers(pages, lambda data: self.getPagesInfo(data, num))
 
 
 if __name__ == "__main__":
@@ -159,8 +106,12 @@ if __name__ == "__main__":
         journal="nature",
         sorting="日期逆序",
     )
-    print(acs.getTotalPaperNum())
-    q = PriorityQueue(4)
-    asyncio.run(acs.getAllPapers(q, 4))
-    for _ in range(4):
-        print(q.get())
+
+    async def _main():
+        print(await acs.getTotalPaperNum())
+        q = PriorityQueue(4)
+        await acs.getAllPapers(q, 4)
+        for _ in range(4):
+            print(q.get())
+
+    asyncio.run(_main())
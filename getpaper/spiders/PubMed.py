@@ -1,22 +1,41 @@
 import asyncio
 import logging
-import re
+from contextlib import aclosing
+from datetime import date, timedelta
 from queue import PriorityQueue
-from typing import Any, Dict, Sequence
+from typing import Any, AsyncIterator, Dict, NamedTuple, Sequence
+from urllib.parse import urlsplit
 
-from bs4 import BeautifulSoup
 from curl_cffi.requests.exceptions import Timeout
 
-from getpaper.spiders._spider import _Spider
-from getpaper.utils import TipException, getClient
+from getpaper.metrics import metrics
+from getpaper.spiders._parser import emptyDetail, errorDetail, parsePubMedPage
+from getpaper.spiders._spider import PaperDetail, _Spider
+from getpaper.utils import TipException, getClient, getStore, runParser, runWorkers
 
-GET_FREQUENCY = 0.1  # frequency to fetch paper
+PMID_PAGE_SIZE = 1000  # PMIDs fetched by each esearch request
+MAX_RESULTS = 9999  # esearch rejects retstart above 9998, later PMIDs of a query are out of reach
+FIRST_DATE = date(1700, 1, 1)  # Before the oldest publication date in PubMed
+BATCH_SIZE = 200  # PMIDs fetched by each efetch request
 log = logging.getLogger("GetPaper")
 
 
+class PMIDPage(NamedTuple):
+    index: int  # Index of the first PMID in result
+    retstart: int
+    size: int
+    query: dict[str, str]  # esearch params of the query holding the page
+
+
 class Spider(_Spider):
     base_url = "https://pubmed.ncbi.nlm.nih.gov/"
-    single_page_pmid: str
+    eutils_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+    ascending: bool
+    webenv: str
+    query_key: str
+    pmids: Sequence[str] | None = None  # Fetched by getAllPapers instead of searching if set
+    truncated = False  # Whether the last PMIDs fetched were cut at MAX_RESULTS
+    failed: set[str]  # PMIDs whose details failed to fetch by the last getAllPapers
 
     def parseData(
         self,
@@ -27,8 +46,8 @@ class Spider(_Spider):
         journal: str = "",
         sorting: str = "",
     ) -> Dict[str, Any]:
-        """parse input parameters as url data"""
-        data = {}
+        """parse input parameters as esearch data"""
+        data: Dict[str, Any] = {"db": "pubmed", "tool": "GetPaper"}
         # Parsing term field
         # Add keyword to term
         term = [f"{keyword}"]
@@ -44,131 +63,257 @@ class Spider(_Spider):
         data["term"] = " AND ".join(term)
 
         # Parsing result sort order
-        if sorting.startswith("日期"):
-            data["sort"] = "date"
-        if sorting.endswith("逆序"):
-            data["sort_order"] = "asc"
+        # esearch only sorts date descending, ascending order is fetched from the tail of result
+        data["sort"] = "pub_date" if sorting.startswith("日期") else "relevance"
+        self.ascending = sorting.endswith("逆序")
         self.data = data
         return data
 
+    def enteredSince(self, date: str) -> None:
+        """
+        Limit the search to papers entered PubMed since date, search again to apply it
+
+        Args:
+            date: entrez date as YYYY/MM/DD, inclusive
+        """
+        self.data.update({"datetype": "edat", "mindate": date, "maxdate": "3000"})
+
+    async def esearch(self, **params: Any) -> dict[str, Any]:
+        """Search by esearch and keep the query on the history server, returns esearchresult"""
+        params = {**self.data, "usehistory": "y", "retmode": "json", **params}
+        resp = await getClient().get(self.eutils_url + "esearch.fcgi", params=params)
+        log.info(f"Get URL: {resp.url}\nURL Status: {resp.status_code}")
+        return resp.json()["esearchresult"]
+
     async def getTotalPaperNum(self) -> int:
-        self.data["format"] = "summary"
-        client = getClient()
         try:
-            resp = await client.get(self.base_url, params=self.data)
-            log.info(f"Get URL: {resp.url}\nURL Status: {resp.status_code}")
-            bs = BeautifulSoup(resp.text, "lxml")
-            if bs.find("span", class_="single-result-redirect-message"):
-                self.total_num = 1
-                if pmid := bs.find("strong", class_="current-id"):
-                    self.single_page_pmid = pmid.text
-                else:
-                    self.single_page_pmid = ""
-            elif tag := bs.find("div", class_="results-amount"):
-                self.total_num = int(tag.span.text.replace(",", ""))  # type: ignore
-            else:
-                self.total_num = 0
+            result = await self.esearch(retmax=0)
         except Timeout as e:
             log.exception("PubMed Spider Get Total Num Time Out")
             raise TipException("连接超时") from e
 
+        self.total_num = int(result.get("count", 0))
+        self.webenv = result.get("webenv", "")
+        self.query_key = result.get("querykey", "")
         return self.total_num
 
-    async def getPMIDs(self, num: int) -> Sequence[str]:
+    async def countWindow(self, first: date, last: date) -> tuple[date, date, int, dict[str, str]]:
+        """Search papers published from first to last, returns the window and its query"""
+        term = f"{self.data['term']} AND {first:%Y/%m/%d}:{last:%Y/%m/%d}[dp]"
+        result = await self.esearch(term=term, retmax=0)
+        query = {"term": term}
+        if webenv := result.get("webenv"):
+            query.update({"WebEnv": webenv, "query_key": result.get("querykey", "")})
+        return first, last, int(result.get("count", 0)), query
+
+    async def searchWindows(self, num: int) -> list[tuple[int, dict[str, str]]]:
         """
-        Get the paper's PMIDs
+        Split the search into queries esearch can page through, each within MAX_RESULTS.
+        Results sorted by date are split by publication date, a search sorted by relevance
+        is cut at MAX_RESULTS.
+
         Args:
             num: Number of PMIDs to fetch
+        Returns:
+            [(number of papers, esearch params of the query)] in result order
         """
-        pmid_list = []
-        self.data.update({"size": "200", "page": 1, "format": "pmid"})
-        client = getClient()
-        # Get page by order and fetch PMIDs
-        try:
-            while self.data["page"] <= (num - 1) // 200 + 1:
-                resp = await client.get(self.base_url, params=self.data.copy())
-                log.info(f"Get URL: {resp.url}\nURL Status: {resp.status_code}")
-                bs = BeautifulSoup(resp.text, "lxml")
-                # If no pmid was find, modify result.max_size to 1 for stop monitoring.
-                if not (tag := bs.find("pre", class_="search-results-chunk")):
-                    self.result_queue.maxsize = 1
-                    self.result_queue.put((0, ["Not found any papers"] * 7))
-                    raise TipException("未找到相关文献")  # noqa: TRY301
-
-                result = tag.text.split()
-                pmid_list.extend(result)
-                # Stop if find only one pmid
-                if len(result) == 1:
-                    break
-
-                self.data["page"] += 1
-        except asyncio.exceptions.TimeoutError as e:
-            log.info("PubMed Fetch PMIDs Time Out")
-            raise TipException("连接超时") from e
-        except Exception:
-            log.exception(f"PubMed Error in fetching PMIDs[{self.data['page']} / {num // 200 + 1}]")
-        return pmid_list[:num]
+        self.truncated = False
+        query = {"WebEnv": self.webenv, "query_key": self.query_key} if self.webenv else {}
+        # The oldest papers are at the tail of the date descending result
+        reach = self.total_num if self.ascending else num
+        if reach <= MAX_RESULTS or self.data["sort"] != "pub_date":
+            if num > MAX_RESULTS:
+                log.warning(f"PubMed search cut at {MAX_RESULTS} of {self.total_num} papers")
+                self.truncated = True
+            return [(min(self.total_num, MAX_RESULTS), query)]
 
-    async def getPagesInfo(self, index: int, pmid: str):
-        title = "No Title"
-        authors = "No Author"
-        doi = "No DOI"
-        publication = "No Publication"
-        abstract = "No Abstract"
-        date = "No Date"
-        web = self.base_url + pmid
+        windows: list[tuple[int, dict[str, str]]] = []
+        found = 0
+        last = date(date.today().year + 1, 12, 31)  # Papers in print next year
+        # Windows popped first are the first in result order
+        stack = [(FIRST_DATE, last, self.total_num, query)]
+        while stack and found < num:
+            first, last, count, query = stack.pop()
+            if count > MAX_RESULTS and first < last:
+                middle = first + (last - first) // 2
+                older, newer = await asyncio.gather(
+                    self.countWindow(first, middle), self.countWindow(middle + timedelta(1), last)
+                )
+                halves = [newer, older] if self.ascending else [older, newer]
+                stack.extend(half for half in halves if half[2])
+                continue
+            if count > MAX_RESULTS:
+                log.warning(f"PubMed papers published on {first} cut at {MAX_RESULTS} of {count}")
+                self.truncated = True
+            windows.append((min(count, MAX_RESULTS), query))
+            found += windows[-1][0]
+        return windows
 
-        client = getClient()
-        # Decrease access frequency
-        await asyncio.sleep(index * GET_FREQUENCY)
-        log.debug(f"Fetching PMID[{pmid}]")
-
-        try:
-            res = await client.get(web)
-            bs = BeautifulSoup(res.text, "lxml")
-        except Exception:
-            log.exception(f"PMID[{pmid}] Spider Error")
-            title, authors, date, publication, abstract, doi = ["Error"] * 6
-        else:
-            content = bs.find("main", class_="article-details")
-            if not content:
-                return
+    async def pmidPages(self, num: int) -> list[PMIDPage]:
+        """The esearch pages holding the first num PMIDs of the result, in result order"""
+        pages = []
+        index = 0
+        for count, query in await self.searchWindows(num):
+            size = min(count, num - index)
+            for offset in range(0, size, PMID_PAGE_SIZE):
+                retmax = min(PMID_PAGE_SIZE, size - offset)
+                # Ascending order is read from the tail of the window
+                retstart = count - offset - retmax if self.ascending else offset
+                pages.append(PMIDPage(index + offset, retstart, retmax, query))
+            index += size
+            if index >= num:
+                break
+        return pages
 
-            if tag := content.find("h1", class_="heading-title"):
-                title = re.sub(r"\s{2,}", "", tag.text)
+    async def getPMIDPage(self, page: PMIDPage) -> list[str]:
+        """Get a page of PMIDs by esearch in result order"""
+        result = await self.esearch(**page.query, retstart=page.retstart, retmax=page.size)
+        pmids = result.get("idlist", [])
+        return pmids[::-1] if self.ascending else pmids
 
-            if tag := content.find("span", class_="cit"):
-                date = tag.text
+    async def iterPMIDs(self, num: int) -> AsyncIterator[tuple[int, int, list[str] | None]]:
+        """
+        Request all pages of PMIDs at once, the client limits them by the rate limit of host.
+        Pages are yielded in result order, each as soon as it and the pages before it arrive.
+        A failed page is logged and yielded as None.
 
-            if tag := content.find("button", id="full-view-journal-trigger"):
-                publication = re.sub(r"\s+", "", tag.text)
+        Args:
+            num: Number of PMIDs to fetch
+        Yields:
+            (index of the first PMID in result, size of the page, PMIDs of the page in result
+            order or None if the page failed), a page may hold fewer PMIDs than its size
+            if the result changed since searching
+        """
+        try:
+            pages = await self.pmidPages(num)
+        except (asyncio.exceptions.TimeoutError, Timeout) as e:
+            log.info("PubMed Search Windows Time Out")
+            raise TipException("连接超时") from e
+        tasks = [asyncio.ensure_future(self.getPMIDPage(page)) for page in pages]
+        try:
+            for page, task in zip(pages, tasks):
+                try:
+                    pmids = await task
+                except (asyncio.exceptions.TimeoutError, Timeout) as e:
+                    log.info("PubMed Fetch PMIDs Time Out")
+                    raise TipException("连接超时") from e
+                except Exception:
+                    log.exception(f"PubMed Error in fetching PMIDs[{page.index}:+{page.size}]")
+                    metrics.count("paper_failures", value=page.size)
+                    yield page.index, page.size, None
+                    continue
+                yield page.index, page.size, pmids[: page.size]
+        finally:
+            for task in tasks:
+                if not task.cancel() and not task.cancelled():
+                    task.exception()  # Retrieved, do not warn about a page left unawaited
 
-            if authors := content.find_all("span", class_="authors-list-item", limit=5):
-                authors = "; ".join([a.text for author in authors if (a := author.find("a"))])
+    async def getPMIDs(self, num: int) -> Sequence[str]:
+        """
+        Get the paper's PMIDs by esearch, pages are fetched concurrently. The PMIDs after a
+        failed page are dropped, so the result is always a prefix of the search result.
 
-            if tag := content.find(class_="abstract-content selected"):
-                abstract = re.sub(r"\s{2,}", "", tag.text)
+        Args:
+            num: Number of PMIDs to fetch
+        """
+        pmid_list: list[str] = []
+        async with aclosing(self.iterPMIDs(num)) as pages:
+            async for index, size, pmids in pages:
+                if pmids is None or index != len(pmid_list):
+                    break
+                pmid_list.extend(pmids)
+                if len(pmids) < size:
+                    break
+        return pmid_list[:num]
 
-            if tag := content.find("a", attrs={"data-ga-action": "DOI"}):
-                doi = re.sub(r"\s+", "", tag.text)
+    async def getPagesInfo(self, start: int, pmids: Sequence[str]) -> None:
+        """
+        Fetch details of a batch of PMIDs by efetch, papers in local store are not fetched again
+        Args:
+            start: index of the first PMID in result
+            pmids: PMIDs to fetch
+        """
+        store = getStore()
+        # SQLite waits for its lock and disk, off the loop thread like parsing
+        details = await asyncio.to_thread(store.getByPMIDs, pmids)
+        missing = [pmid for pmid in pmids if pmid not in details]
+        client = getClient()
+        log.debug(f"Fetching PMID[{pmids[0]}...{pmids[-1]}], {len(details)} found in store")
 
-            if link := content.find(class_="full-text-links-list"):
-                web = link.a["href"]  # type: ignore
+        try:
+            if missing:
+                res = await client.get(
+                    self.eutils_url + "efetch.fcgi",
+                    params={
+                        "db": "pubmed",
+                        "tool": "GetPaper",
+                        "id": ",".join(missing),
+                        "retmode": "xml",
+                    },
+                )
+                log.info(f"Get URL: {res.url}\nURL Status: {res.status_code}")
+                with metrics.span("parse", urlsplit(self.eutils_url).hostname or ""):
+                    fetched = dict(await runParser(parsePubMedPage, res.content, self.base_url))
+                await asyncio.to_thread(store.upsert, list(fetched.items()))
+                details.update(fetched)
+        except Exception:
+            log.exception(f"PMID[{pmids[0]}...{pmids[-1]}] Spider Error")
+            metrics.count("paper_failures", value=len(missing))
+            self.failed.update(missing)
+            details.update((pmid, errorDetail(self.base_url + pmid)) for pmid in missing)
         finally:
-            self.result_queue.put((index, (title, authors, date, publication, abstract, doi, web)))
+            for index, pmid in enumerate(pmids, start):
+                detail = details.get(pmid) or emptyDetail(self.base_url + pmid)
+                self.result_queue.put((index, detail))
 
     async def getAllPapers(self, queue: PriorityQueue, num: int) -> None:
         self.result_queue = queue
+        self.failed = set()
         num = max(num, 1)
 
-        tasks = []
-        if self.total_num == 1 and hasattr(self, "single_page_pmid"):
-            tasks = [self.getPagesInfo(0, self.single_page_pmid)]
-        else:
-            PMIDs = await self.getPMIDs(num)
-            tasks = [self.getPagesInfo(index, pmid) for index, pmid in enumerate(PMIDs)]
+        if self.pmids is not None:
+            PMIDs = self.pmids[:num]
+            if not PMIDs:
+                return
+            batches = (
+                (start, PMIDs[start : start + BATCH_SIZE])
+                for start in range(0, len(PMIDs), BATCH_SIZE)
+            )
+            await runWorkers(batches, lambda batch: self.getPagesInfo(*batch))
+            return
+
+        if not hasattr(self, "webenv"):
+            await self.getTotalPaperNum()
+        found = failed = 0
+
+        async def pipeline() -> AsyncIterator[tuple[int, list[str]]]:
+            """Details of the first page are fetched while the other pages of PMIDs arrive"""
+            nonlocal found, failed
+            async with aclosing(self.iterPMIDs(num)) as pages:
+                async for index, size, pmids in pages:
+                    if pmids is None:
+                        # Fill the indexes of a failed page, results after it are not held back
+                        failed += size
+                        for i in range(index, index + size):
+                            self.result_queue.put((i, errorDetail(self.base_url)))
+                        continue
+                    found += len(pmids)
+                    # A page short of its size if the result changed since searching
+                    for i in range(index + len(pmids), index + size):
+                        self.result_queue.put((i, emptyDetail(self.base_url)))
+                    for start in range(0, len(pmids), BATCH_SIZE):
+                        yield index + start, pmids[start : start + BATCH_SIZE]
 
-        await asyncio.gather(*tasks)
+        await runWorkers(pipeline(), lambda batch: self.getPagesInfo(*batch))
+        if not found and failed:
+            raise TipException("获取文献列表出错")
+        # If no pmid was find, modify result.max_size to 1 for stop monitoring.
+        if not found:
+            self.result_queue.maxsize = 1
+            self.result_queue.put((0, PaperDetail(*["Not found any papers"] * 7)))
+            raise TipException("未找到相关文献")
+        if self.truncated:
+            raise TipException(f"PubMed每次检索最多获取{MAX_RESULTS}篇，请按日期排序或缩小检索范围")
 
 
 if __name__ == "__main__":
@@ -181,8 +326,11 @@ if __name__ == "__main__":
         sorting="相关性",
     )
 
-    print(pubMed.getTotalPaperNum())
-    q = PriorityQueue(1)
-    asyncio.run(pubMed.getAllPapers(q, 1))
-    for _ in range(1):
-        print(q.get())
+    async def _main():
+        print(await pubMed.getTotalPaperNum())
+        q = PriorityQueue(1)
+        await pubMed.getAllPapers(q, 1)
+        for _ in range(1):
+            print(q.get())
+
+    asyncio.run(_main())
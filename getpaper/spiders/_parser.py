@@ -0,0 +1,184 @@
+"""
+Incremental parsers turning large responses into PaperDetail records.
+Elements are cleared as soon as they are converted, so peak memory only depends on one record.
+The *Page functions parse a whole response at once, they are run by utils.runParser in a pool.
+"""
+
+import re
+from io import BytesIO
+from itertools import islice
+from typing import IO, Iterator
+
+from lxml import etree
+
+from getpaper.spiders._spider import PaperDetail
+
+
+def _text(element: etree._Element | None) -> str:
+    """Join all text of an element, including the text of inline tags like <i>"""
+    return "".join(element.itertext()).strip() if element is not None else ""
+
+
+def _hasClass(element: etree._Element, class_: str) -> bool:
+    return class_ in (element.get("class") or "").split()
+
+
+def _findClass(element: etree._Element, class_: str, tag: str = "*") -> etree._Element | None:
+    """Find the first descendant whose class attribute contains class_, like bs4 find(class_=...)"""
+    result = element.xpath(
+        f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')]"
+    )
+    return result[0] if result else None
+
+
+def _release(element: etree._Element) -> None:
+    """Clear a parsed element and drop its finished siblings from the tree"""
+    element.clear(keep_tail=True)
+    while element.getprevious() is not None:
+        del element.getparent()[0]
+
+
+def _source(content: bytes | IO[bytes]) -> IO[bytes]:
+    return BytesIO(content) if isinstance(content, bytes) else content
+
+
+def emptyDetail(web: str) -> PaperDetail:
+    """Placeholder for a paper not included in the response"""
+    return PaperDetail(
+        "No Title", "No Author", "No Date", "No Publication", "No Abstract", "No DOI", web
+    )
+
+
+def errorDetail(web: str) -> PaperDetail:
+    """Placeholder for a paper whose request or response failed"""
+    return PaperDetail(*["Error"] * 6, web)
+
+
+def parsePubMedArticle(article: etree._Element, base_url: str) -> tuple[str, PaperDetail]:
+    """
+    Convert a <PubmedArticle> element of efetch result to PaperDetail
+    Args:
+        article: <PubmedArticle> element
+        base_url: base url of paper's web page
+    Returns:
+        (pmid, detail)
+    """
+    pmid = _text(article.find("MedlineCitation/PMID"))
+    content = article.find("MedlineCitation/Article")
+    if content is None:
+        return pmid, emptyDetail(base_url + pmid)
+
+    title = _text(content.find("ArticleTitle")) or "No Title"
+
+    authors = []
+    for author in content.iterfind("AuthorList/Author"):
+        if name := _text(author.find("CollectiveName")):
+            authors.append(name)
+        elif name := " ".join(
+            filter(None, (_text(author.find("ForeName")), _text(author.find("LastName"))))
+        ):
+            authors.append(name)
+        if len(authors) == 5:
+            break
+
+    date = ""
+    if (pub_date := content.find("Journal/JournalIssue/PubDate")) is not None:
+        date = _text(pub_date.find("MedlineDate")) or " ".join(
+            filter(None, (_text(pub_date.find(tag)) for tag in ("Year", "Month", "Day")))
+        )
+
+    publication = _text(content.find("Journal/ISOAbbreviation")) or _text(
+        content.find("Journal/Title")
+    )
+
+    abstract = []
+    for section in content.iterfind("Abstract/AbstractText"):
+        text = _text(section)
+        if label := section.get("Label"):
+            text = f"{label}: {text}"
+        abstract.append(text)
+
+    doi = _text(article.find("PubmedData/ArticleIdList/ArticleId[@IdType='doi']")) or _text(
+        content.find("ELocationID[@EIdType='doi']")
+    )
+
+    return pmid, PaperDetail(
+        title,
+        "; ".join(authors) or "No Author",
+        date or "No Date",
+        publication or "No Publication",
+        "\n".join(abstract) or "No Abstract",
+        doi or "No DOI",
+        base_url + pmid,
+    )
+
+
+def iterPubMedArticles(
+    content: bytes | IO[bytes], base_url: str
+) -> Iterator[tuple[str, PaperDetail]]:
+    """
+    Parse an efetch xml response record by record
+    Args:
+        content: response body or a file-like object of it
+        base_url: base url of paper's web page
+    Yields:
+        (pmid, detail)
+    """
+    for _, article in etree.iterparse(_source(content), events=("end",), tag="PubmedArticle"):
+        yield parsePubMedArticle(article, base_url)
+        _release(article)
+
+
+def parsePubMedPage(content: bytes, base_url: str) -> list[tuple[str, PaperDetail]]:
+    """All (pmid, detail) of an efetch response"""
+    return list(iterPubMedArticles(content, base_url))
+
+
+def parseACSItem(content: etree._Element) -> PaperDetail:
+    """Convert an "issue-item_metadata" element of ACS search page to PaperDetail"""
+    # Find titles、doi、web_url
+    title_tag = _findClass(content, "issue-item_title", "h2")
+    link = title_tag.find(".//a") if title_tag is not None else None
+    title = _text(title_tag) or "No title"
+    doi = link.get("href", "").removeprefix("/doi/") if link is not None else "No DOI"
+    web = "https://pubs.acs.org" + link.get("href", "") if link is not None else "No URL"
+    # Find authors list
+    authors = _text(content.find(".//ul")) or "No Authors"
+    # Find publish date
+    date = _text(_findClass(content, "pub-date-value")) or "No Publication Date"
+    # Find abstracts
+    abstract = _text(_findClass(content, "hlFld-Abstract", "span")) or "No Abstract"
+
+    # find publications
+    # Chapter and article have different format
+    parent = content.getparent()
+    info_type = _findClass(parent, "infoType") if parent is not None else None
+    if _text(info_type) == "Chapter":
+        publication = re.sub(r"\s+", " ", _text(_findClass(content, "issue-item_chapter")))
+    else:
+        publication = _text(_findClass(content, "issue-item_jour-name")) or "No Publication"
+
+    return PaperDetail(title, authors, date, publication, abstract, doi, web)
+
+
+def iterACSItems(content: bytes | IO[bytes]) -> Iterator[PaperDetail]:
+    """
+    Parse an ACS search page item by item
+    Args:
+        content: response body or a file-like object of it
+    Yields:
+        detail
+    """
+    for _, element in etree.iterparse(_source(content), events=("end",), html=True):
+        if not _hasClass(element, "issue-item_metadata"):
+            continue
+        yield parseACSItem(element)
+        # The item holding this metadata is finished as well
+        if (item := element.getparent()) is not None:
+            _release(item)
+        _release(element)
+
+
+def parseACSPage(content: bytes, limit: int) -> list[PaperDetail]:
+    """The first limit details of an ACS search page"""
+    return list(islice(iterACSItems(content), limit))
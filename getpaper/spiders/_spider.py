@@ -1,11 +1,34 @@
+import asyncio
 from abc import ABC, abstractmethod
 from collections import namedtuple
 from queue import PriorityQueue
-from typing import Any
+from typing import Any, AsyncIterator
+
+from getpaper.metrics import metrics
 
 PaperDetail = namedtuple(
     "PaperDetail", ["title", "authors", "date", "publication", "abstract", "doi", "web"]
 )
+# Values put by spiders for missing fields, and for all fields of a failed paper
+PLACEHOLDERS = {
+    "",
+    "Error",
+    "No Title",
+    "No title",
+    "No Author",
+    "No Authors",
+    "No Date",
+    "No Publication",
+    "No Publication Date",
+    "No Abstract",
+    "No DOI",
+    "No URL",
+}
+
+
+def isPlaceholder(detail: PaperDetail) -> bool:
+    """Whether detail stands for a failed or missing paper instead of a fetched one"""
+    return detail[0].strip() in PLACEHOLDERS
 
 
 class _Spider(ABC):
@@ -60,3 +83,62 @@ class _Spider(ABC):
             num: number of papers to get
         """
         pass
+
+
+class ResultStream(PriorityQueue):
+    delivered: int  # index of the next result to deliver
+
+    def __init__(self, spider: _Spider, num: int) -> None:
+        """
+        Result queue of spider.getAllPapers which can be iterated by `async for`.
+        Each (index, detail) is delivered in index order as soon as it is put,
+        results arriving early wait in the queue as a reorder buffer.
+
+        Args:
+            spider: spider to run, its total number should have been searched
+            num: number of papers to get
+        """
+        super().__init__()
+        self.spider = spider
+        self.num = num
+        self.delivered = 0
+        self.updated = asyncio.Event()
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def _put(self, item: tuple[int, PaperDetail]) -> None:
+        super()._put(item)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.updated.set)
+
+    def _next(self, flush: bool = False) -> tuple[int, PaperDetail] | None:
+        """Pop the next result in order, or any result when flush"""
+        with self.mutex:
+            if not self.queue or (not flush and self.queue[0][0] > self.delivered):
+                return None
+        index, detail = self.get_nowait()
+        self.delivered = max(self.delivered, index + 1)
+        return index, detail
+
+    async def __aiter__(self) -> AsyncIterator[tuple[int, PaperDetail]]:
+        self.loop = asyncio.get_running_loop()
+        job = f"fetch:{self.spider.__module__.rsplit('.', 1)[-1]}"
+        with metrics.job(job):
+            task = asyncio.create_task(self.spider.getAllPapers(self, self.num))
+        task.add_done_callback(lambda _: self.updated.set())
+        count = 0
+        try:
+            while not task.done():
+                self.updated.clear()
+                while item := self._next():
+                    count += 1
+                    yield item
+                await self.updated.wait()
+            # Deliver the rest even if some indexes are missing
+            while item := self._next(flush=True):
+                count += 1
+                yield item
+            task.result()
+        finally:
+            task.cancel()
+            with metrics.job(job):
+                metrics.count("papers", value=count)
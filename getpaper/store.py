@@ -0,0 +1,117 @@
+import re
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Iterable, Sequence
+
+from getpaper._db import chunks, transaction
+from getpaper.spiders._spider import PaperDetail, isPlaceholder
+
+COLUMNS = ", ".join(PaperDetail._fields)
+
+
+def normalizeDOI(doi: str | None) -> str | None:
+    """DOIs are case insensitive, return None for a missing doi"""
+    doi = (doi or "").strip().lower()
+    return doi if doi.startswith("10.") else None
+
+
+class PaperStore:
+    def __init__(self, path: Path) -> None:
+        """
+        Papers fetched by any search, indexed by pmid, doi, title and year
+
+        Args:
+            path: database file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.executescript(
+            f"""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS papers (
+                key TEXT PRIMARY KEY,
+                pmid TEXT,
+                doi_key TEXT,
+                year INTEGER,
+                updated REAL NOT NULL,
+                {", ".join(f"{field} TEXT NOT NULL" for field in PaperDetail._fields)}
+            );
+            CREATE INDEX IF NOT EXISTS papers_pmid ON papers (pmid);
+            CREATE INDEX IF NOT EXISTS papers_doi ON papers (doi_key);
+            CREATE INDEX IF NOT EXISTS papers_title ON papers (title);
+            CREATE INDEX IF NOT EXISTS papers_year ON papers (year);
+            """
+        )
+
+    def upsert(self, records: Iterable[tuple[str | None, PaperDetail]]) -> int:
+        """
+        Insert or update papers in one transaction
+
+        Args:
+            records: (pmid, detail), pmid is None for papers not from PubMed
+        Returns:
+            number of stored papers
+        """
+        rows = []
+        now = time()
+        for pmid, detail in records:
+            # Placeholders of failed or missing papers are not worth storing
+            if isPlaceholder(detail):
+                continue
+            doi = normalizeDOI(detail.doi)
+            if pmid:
+                key = f"pmid:{pmid}"
+            elif doi:
+                key = f"doi:{doi}"
+            else:
+                continue
+            year = int(match.group()) if (match := re.search(r"\d{4}", detail.date)) else None
+            rows.append((key, pmid, doi, year, now, *detail))
+
+        with self.lock, transaction(self.db):
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO papers (key, pmid, doi_key, year, updated, {COLUMNS}) "
+                f"VALUES ({', '.join('?' * (5 + len(PaperDetail._fields)))})",
+                rows,
+            )
+        return len(rows)
+
+    def _select(self, column: str, values: Sequence[str]) -> list[tuple[str, PaperDetail]]:
+        rows = []
+        with self.lock:
+            for chunk in chunks(values):
+                rows.extend(
+                    self.db.execute(
+                        f"SELECT {column}, {COLUMNS} FROM papers "
+                        f"WHERE {column} IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+        return [(row[0], PaperDetail(*row[1:])) for row in rows]
+
+    def getByPMIDs(self, pmids: Sequence[str]) -> dict[str, PaperDetail]:
+        """Returns {pmid: detail} of stored papers"""
+        return dict(self._select("pmid", pmids))
+
+    def getByDOIs(self, dois: Sequence[str]) -> dict[str, PaperDetail]:
+        """Returns {normalized doi: detail} of stored papers"""
+        return dict(self._select("doi_key", [doi for d in dois if (doi := normalizeDOI(d))]))
+
+    def getByDOI(self, doi: str) -> PaperDetail | None:
+        return next(iter(self.getByDOIs([doi]).values()), None)
+
+    def searchTitle(self, title: str, limit: int = 20) -> list[PaperDetail]:
+        """Papers whose title starts with title"""
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {COLUMNS} FROM papers WHERE title >= ? AND title < ? LIMIT ?",
+                (title, title + "\uffff", limit),
+            ).fetchall()
+        return [PaperDetail(*row) for row in rows]
+
+    def close(self) -> None:
+        self.db.close()
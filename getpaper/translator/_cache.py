@@ -0,0 +1,62 @@
+import sqlite3
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Iterable, Sequence
+
+from getpaper._db import chunks, transaction
+
+
+def translationKey(provider: str, target: str, text: str) -> str:
+    return sha256(f"{provider}\n{target}\n{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    def __init__(self, path: Path) -> None:
+        """
+        Translations keyed by hash of (provider, target language, source text), never expire
+
+        Args:
+            path: database file
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            """
+        )
+
+    def get(self, keys: Sequence[str]) -> dict[str, str]:
+        """Returns {key: translation} of cached keys"""
+        result = {}
+        with self.lock:
+            for chunk in chunks(keys):
+                result.update(
+                    self.db.execute(
+                        "SELECT key, text FROM translations "
+                        f"WHERE key IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+        return result
+
+    def put(self, items: Iterable[tuple[str, str]]) -> None:
+        """Save (key, translation) in one transaction"""
+        now = time()
+        with self.lock, transaction(self.db):
+            self.db.executemany(
+                "INSERT OR REPLACE INTO translations (key, text, created) VALUES (?, ?, ?)",
+                ((key, text, now) for key, text in items),
+            )
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,29 @@
+"""
+Offline stand-in of a translation api for tests and benchmarks, not listed in the GUI.
+Each line is "translated" to "[target] line" after latency seconds, and requests are limited
+by RATE_LIMITS of HOST like a real api.
+
+    getpaper translate result.csv -o translated.csv --translator _offline
+"""
+
+import asyncio
+
+from getpaper.translator._translator import _Translator
+from getpaper.utils import getLimiter
+
+HOST = "translator.offline"
+
+
+class Translator(_Translator):
+    def __init__(self, latency: float = 0.05) -> None:
+        self.latency = latency
+        self.requests = 0
+
+    async def translate(self, detail: str) -> str:
+        return (await self.translateMany([detail]))[0]
+
+    async def translateBatch(self, lines: list[str]) -> list[str]:
+        await getLimiter().acquire(HOST)
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return [f"[{self.target}] {line}" for line in lines]
@@ -1,6 +1,166 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
+from queue import Queue
+from typing import Iterator, Sequence
+
+from getpaper.config import TRANSLATE_CHUNK
+from getpaper.metrics import metrics
+from getpaper.spiders._spider import PaperDetail
+from getpaper.translator._cache import translationKey
+from getpaper.utils import getTranslationCache, runWorkers
+
+log = logging.getLogger("GetPaper")
+
+# Lines being translated, concurrent requests of the same line wait for the same result
+_pending: dict[str, asyncio.Future[str]] = {}
+
+
+def _release(key: str, future: asyncio.Future[str]) -> None:
+    """Remove future from _pending, unless the line is being translated by a later call"""
+    if _pending.get(key) is future:
+        del _pending[key]
 
 
 class _Translator(ABC):
+    """
+    Plugins implement translate, and translateBatch if the api accepts several lines at once.
+    Use translateMany to translate with the cache, batching and deduplication.
+    """
+
+    target = "zh"  # Target language, part of the cache key
+    max_bytes = 6000  # Max utf-8 bytes of lines sent in one batch
+
+    @property
+    def provider(self) -> str:
+        """Name of the plugin, part of the cache key"""
+        return type(self).__module__.rsplit(".", 1)[-1]
+
     @abstractmethod
     async def translate(self, detail: str) -> str: ...
+
+    async def translateBatch(self, lines: list[str]) -> list[str]:
+        """Translate lines without newline in one request, one request for each by default"""
+        return [await self.translate(line) for line in lines]
+
+    def batches(self, lines: list[str]) -> Iterator[list[str]]:
+        """Split lines into batches of at most max_bytes, a longer line is sent alone"""
+        batch: list[str] = []
+        size = 0
+        for line in lines:
+            length = len(line.encode("utf-8")) + 1
+            if batch and size + length > self.max_bytes:
+                yield batch
+                batch, size = [], 0
+            batch.append(line)
+            size += length
+        if batch:
+            yield batch
+
+    async def sendBatch(self, batch: list[str], futures: dict[str, asyncio.Future[str]]) -> None:
+        """
+        Translate a batch, cache the results and wake up the requests waiting for them
+
+        Args:
+            batch: lines to translate
+            futures: {key: future} of the lines in batch, in the same order
+        """
+        try:
+            results = await self.translateBatch(batch)
+        except Exception as e:
+            for key, future in futures.items():
+                _release(key, future)
+                if not future.done():
+                    future.set_exception(e)
+                    # Retrieved by the waiters if any, do not warn about it
+                    future.exception()
+            raise
+        metrics.count("translated_lines", self.provider, len(batch))
+        for (key, future), text in zip(futures.items(), results):
+            _release(key, future)
+            if not future.done():
+                future.set_result(text)
+        if cache := getTranslationCache():
+            # SQLite waits for its lock and disk, off the loop thread like the stores
+            rows = [(key, text) for key, text in zip(futures, results) if text]
+            await asyncio.to_thread(cache.put, rows)
+
+    async def translateMany(self, texts: Sequence[str]) -> list[str]:
+        """
+        Translate texts line by line. Cached lines are not sent, lines being translated by
+        another call are waited for, the rest are sent in batches of max_bytes.
+
+        Args:
+            texts: texts to translate, may have several lines
+        Returns:
+            translations of texts, keeping the lines
+        """
+        lines = {line.strip() for text in texts for line in text.split("\n") if line.strip()}
+        keys = {line: translationKey(self.provider, self.target, line) for line in lines}
+        cache = getTranslationCache()
+        cached = await asyncio.to_thread(cache.get, list(keys.values())) if cache else {}
+
+        missing = [line for line in lines if keys[line] not in cached]
+        new = [line for line in missing if keys[line] not in _pending]
+        loop = asyncio.get_running_loop()
+        created = {line: loop.create_future() for line in new}
+        _pending.update((keys[line], future) for line, future in created.items())
+        waiting = {line: _pending[keys[line]] for line in missing}
+        log.debug(f"Translate {len(lines)} lines, {len(cached)} cached, {len(new)} to send")
+        metrics.count("translation_cache_hits", self.provider, len(cached))
+
+        try:
+            # A failed batch cancels the others before their futures are released below
+            await runWorkers(
+                self.batches(new),
+                lambda batch: self.sendBatch(batch, {keys[line]: created[line] for line in batch}),
+            )
+            translated = {line: await future for line, future in waiting.items()}
+        finally:
+            # Cancelled before the results arrived, let later calls send these lines again
+            for line, future in created.items():
+                _release(keys[line], future)
+                future.cancel()
+        translated.update((line, cached[keys[line]]) for line in lines if keys[line] in cached)
+
+        return [
+            "\n".join(translated.get(line.strip()) or line for line in text.split("\n"))
+            for text in texts
+        ]
+
+
+async def translateDetails(
+    translator: _Translator,
+    details: Sequence[PaperDetail],
+    monitor: Queue | None = None,
+    chunk: int = TRANSLATE_CHUNK,
+) -> list[tuple[str, str]]:
+    """
+    Translate titles and abstracts of details. Every chunk of papers is translated by one call
+    of translateMany so a batch carries many papers, chunks run concurrently and requests are
+    limited by the rate limit of the api. Translated lines are cached, so running again after
+    a failure only sends the lines left.
+
+    Args:
+        translator: translator plugin
+        details: papers to translate
+        monitor: doi of each translated paper is put for monitoring progress
+        chunk: number of papers translated together
+    Returns:
+        (title, abstract) translated of each paper, in the order of details
+    """
+    results: list[tuple[str, str]] = [("", "")] * len(details)
+
+    async def run(start: int) -> None:
+        papers = details[start : start + chunk]
+        texts = await translator.translateMany(
+            [text for detail in papers for text in (detail.title, detail.abstract)]
+        )
+        for i, detail in enumerate(papers):
+            results[start + i] = (texts[2 * i], texts[2 * i + 1])
+            if monitor is not None:
+                monitor.put(detail.doi)
+
+    with metrics.job("translate"):
+        await runWorkers(range(0, len(details), chunk), run)
+    return results
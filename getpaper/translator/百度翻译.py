@@ -1,11 +1,12 @@
-import asyncio
 import importlib.resources
 import json
 import logging
 from hashlib import md5
 from random import randint
 from typing import Any
+from urllib.parse import urlsplit
 
+from getpaper.config import TOO_MANY_REQUESTS_RETRY
 from getpaper.translator._translator import _Translator
 from getpaper.utils import TipException, getClient
 
@@ -20,7 +21,6 @@ class Translator(_Translator):
     url = "https://fanyi-api.baidu.com/api/trans/vip/translate"
     key: str = ""
     appid: str = ""
-    data: dict
 
     def __init__(self) -> None:
         try:
@@ -34,14 +34,6 @@ class Translator(_Translator):
             self.key = info["百度翻译"]["key"]
             self.appid = info["百度翻译"]["appid"]
         self.salt = str(randint(32768, 65536))
-        self.data = {
-            "appid": self.appid,
-            "q": "",
-            "from": "auto",
-            "to": "zh",
-            "salt": self.salt,
-            "sign": "",
-        }
 
     def sign_query(self, query: str) -> dict[str, Any]:
         """
@@ -53,29 +45,53 @@ class Translator(_Translator):
             data: A dict storing translation string and processed sign.
         """
         sign = self.appid + query + self.salt + self.key
-        self.data["sign"] = make_md5(sign)
-        self.data["q"] = query
-        return self.data
+        return {
+            "appid": self.appid,
+            "q": query,
+            "from": "auto",
+            "to": self.target,
+            "salt": self.salt,
+            "sign": make_md5(sign),
+        }
 
     async def translate(self, detail: str) -> str:
-        async with getClient() as session:
-            while True:
-                params = self.sign_query(detail)
-                try:
-                    response = await session.post(self.url, params=params)
-                    result = await response.json()
-                except Exception as e:
-                    log.exception("翻译失败")
-                    raise TipException("翻译失败") from e
-                if result.get("error_code") == "54003":
-                    await asyncio.sleep(1)
-                elif result.get("error_code") == "52003":
-                    return "Api密钥无效"
-                else:
-                    break
-        return "\n".join([item["dst"] for item in result["trans_result"]])
+        return (await self.translateMany([detail]))[0]
+
+    async def translateBatch(self, lines: list[str]) -> list[str]:
+        """The api translates each line of q, and returns them in trans_result"""
+        client = getClient()
+        for _ in range(TOO_MANY_REQUESTS_RETRY + 1):
+            # Form data, a batch is too long for the url
+            data = self.sign_query("\n".join(lines))
+            try:
+                response = await client.post(self.url, data=data)
+                result = response.json()
+            except Exception as e:
+                log.exception("翻译失败")
+                raise TipException("翻译失败") from e
+            if result.get("error_code") == "54003":
+                # Exceeding the QPS limit, slow down all requests to the api
+                client.limiter.pause(urlsplit(self.url).hostname or "", 1)
+            elif result.get("error_code") == "52003":
+                raise TipException("Api密钥无效")
+            elif "trans_result" not in result:
+                log.error(f"翻译失败: {result}")
+                raise TipException("翻译失败")
+            else:
+                break
+        else:
+            log.error(f"翻译失败: {result}")
+            raise TipException("翻译请求过于频繁")
+        items = result["trans_result"]
+        if len(items) == len(lines):
+            return [item["dst"] for item in items]
+        # Lines merged or dropped by the api, match them by source
+        translated = {item["src"]: item["dst"] for item in items}
+        return [translated.get(line, "") for line in lines]
 
 
 if __name__ == "__main__":
+    import asyncio
+
     trans = Translator()
-    print(trans.translate("Test\nstring second \nstring"))
+    print(asyncio.run(trans.translate("Test\nstring second \nstring")))
@@ -1,23 +1,57 @@
+import asyncio
 import logging
 from asyncio import iscoroutine, run_coroutine_threadsafe
-from concurrent.futures import Future
-from datetime import datetime
+from collections.abc import AsyncIterable, Awaitable, Iterable
+from concurrent.futures import Executor, Future
 from functools import cache, wraps
 from importlib import import_module
-from queue import PriorityQueue
-from threading import Thread
-from typing import Any, Callable, ParamSpec
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, ParamSpec
 
-from curl_cffi.requests import AsyncSession
+from getpaper import config
+from getpaper.config import (
+    CACHE_SIZE,
+    CACHE_TTL,
+    CIRCUIT_BREAKER,
+    CLIENT_TIMEOUT,
+    CONCURRENCY,
+    DATA_DIR,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_HOST_CONNECTIONS,
+    DEFAULT_RATE_LIMIT,
+    DNS_CACHE_TIMEOUT,
+    HOST_CONNECTIONS,
+    MAX_CONNECTIONS,
+    PARSE_POOL,
+    PARSE_WORKERS,
+    PDF_LINKS,
+    PDF_STORE,
+    RATE_LIMITS,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    RETRY_BUDGET,
+    TRANSLATION_CACHE,
+)
 
-from getpaper.config import CLIENT_TIMEOUT, LOOP
-from getpaper.spiders._spider import _Spider
-from getpaper.translator._translator import _Translator
+# Heavy dependencies are imported on first use, keeping startup fast
+if TYPE_CHECKING:
+    from getpaper.cache import ResponseCache
+    from getpaper.client import Client
+    from getpaper.exporter._exporter import _Exporter
+    from getpaper.jobs import DownloadJournal
+    from getpaper.limiter import RateLimiter
+    from getpaper.pdfstore import PDFStore
+    from getpaper.retry import CircuitBreaker, RetryPolicy
+    from getpaper.searches import SearchStore
+    from getpaper.spiders._spider import _Spider
+    from getpaper.store import PaperStore
+    from getpaper.translator._cache import TranslationCache
+    from getpaper.translator._translator import _Translator
 
 log = logging.getLogger("GetPaper")
 
 
-def getSpider(name: str, *args, **kwargs) -> _Spider:
+def getSpider(name: str, *args, **kwargs) -> "_Spider":
     """Return a Spider by name
 
     Args:
@@ -30,7 +64,7 @@ def getSpider(name: str, *args, **kwargs) -> _Spider:
     return cls(*args, **kwargs)
 
 
-def getTranslator(name: str, *args, **kwargs) -> _Translator:
+def getTranslator(name: str, *args, **kwargs) -> "_Translator":
     """Create a Translator by name
 
     Args:
@@ -43,10 +77,222 @@ def getTranslator(name: str, *args, **kwargs) -> _Translator:
     return cls(*args, **kwargs)
 
 
+def getExporter(file: Path | None, *args, **kwargs) -> "_Exporter":
+    """Create an Exporter by suffix of file, jsonl for stdout if file is None
+
+    Args:
+        file: file to save, exporter's filename is its suffix, found in getpaper/exporter
+    Returns:
+        exporter: An instance writing file, use it by `with`
+    """
+
+    name = file.suffix.removeprefix(".").lower() if file is not None else "jsonl"
+    if name not in config.exporter_list:
+        raise TipException(f"不支持的文件格式：{name}")
+    cls = import_module(f"getpaper.exporter.{name}").Exporter
+    return cls(file, *args, **kwargs)
+
+
+# One client for each event loop, curl sessions can not be shared between loops
+_clients: dict[asyncio.AbstractEventLoop, "Client"] = {}
+
+
+@cache
+def getLimiter() -> "RateLimiter":
+    """Rate limiter shared by all clients"""
+    from getpaper.limiter import RateLimiter
+
+    return RateLimiter(RATE_LIMITS, DEFAULT_RATE_LIMIT)
+
+
+@cache
+def getRetryPolicy() -> "RetryPolicy":
+    """Retry policy shared by all clients, retry budgets are kept for each host"""
+    from getpaper.retry import RetryPolicy
+
+    return RetryPolicy(RETRY_ATTEMPTS, *RETRY_BACKOFF, *RETRY_BUDGET)
+
+
+@cache
+def getBreaker() -> "CircuitBreaker":
+    """Circuit breaker shared by all clients"""
+    from getpaper.retry import CircuitBreaker
+
+    return CircuitBreaker(*CIRCUIT_BREAKER)
+
+
 @cache
-def getClient() -> AsyncSession:
-    """Create a async Http session by curl_cffi AsyncSession"""
-    return AsyncSession(impersonate="chrome", timeout=CLIENT_TIMEOUT)
+def getCache() -> "ResponseCache | None":
+    """Response cache in DATA_DIR shared by all clients, None if disabled"""
+    from getpaper.cache import ResponseCache
+
+    if not CACHE_SIZE:
+        return None
+    return ResponseCache(DATA_DIR / "cache.sqlite3", CACHE_TTL, DEFAULT_CACHE_TTL, CACHE_SIZE)
+
+
+def getClient() -> "Client":
+    """
+    Return the http client of the running loop, created by curl_cffi AsyncSession on first use.
+    Connections are kept alive and multiplexed by HTTP/2 where supported,
+    requests are limited by host and GET pages are cached in DATA_DIR.
+    The client lives until closeClients() is called at exit, never close it in a task.
+    """
+    loop = asyncio.get_running_loop()
+    if client := _clients.get(loop):
+        return client
+
+    from curl_cffi import CurlHttpVersion, CurlOpt
+    from curl_cffi.requests import AsyncSession
+
+    from getpaper.client import CURL_INFOS, Client
+
+    session = AsyncSession(
+        impersonate="chrome",
+        timeout=CLIENT_TIMEOUT,
+        max_clients=MAX_CONNECTIONS,
+        http_version=CurlHttpVersion.V2TLS,
+        curl_infos=CURL_INFOS,
+        curl_options={
+            CurlOpt.DNS_CACHE_TIMEOUT: DNS_CACHE_TIMEOUT,
+            CurlOpt.TCP_KEEPALIVE: 1,
+            # Wait for a connection being set up to multiplex on instead of opening another one
+            CurlOpt.PIPEWAIT: 1,
+        },
+    )
+    client = Client(
+        session,
+        getLimiter(),
+        getCache(),
+        HOST_CONNECTIONS,
+        DEFAULT_HOST_CONNECTIONS,
+        getRetryPolicy(),
+        getBreaker(),
+    )
+    _clients[loop] = client
+    return client
+
+
+async def closeClients() -> None:
+    """Close the client of the running loop, call it after all tasks using the client are done"""
+    if client := _clients.pop(asyncio.get_running_loop(), None):
+        await client.close()
+
+
+async def runWorkers[T](
+    items: Iterable[T] | AsyncIterable[T],
+    worker: Callable[[T], Awaitable[Any]],
+    concurrency: int = CONCURRENCY,
+) -> None:
+    """
+    Process items by a fixed number of workers pulling from a bounded queue.
+    Items are consumed lazily and the producer waits while all workers are busy,
+    so the number of live coroutines and connections does not grow with the items.
+    Cancelling the caller or an exception raised by a worker cancels all workers,
+    the first exception raised by the producer or workers is raised as is.
+
+    Args:
+        items: items to process, can be produced asynchronously
+        worker: coroutine function processing one item
+        concurrency: number of workers
+    """
+    queue: asyncio.Queue = asyncio.Queue(concurrency)
+    done = object()
+
+    async def produce() -> None:
+        if isinstance(items, AsyncIterable):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(done)
+
+    async def consume() -> None:
+        while (item := await queue.get()) is not done:
+            await worker(item)
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(produce())
+            for _ in range(concurrency):
+                group.create_task(consume())
+    except* Exception as eg:
+        # Callers catch TipException, not the ExceptionGroup of TaskGroup
+        raise eg.exceptions[0]
+
+
+@cache
+def getParsePool() -> Executor | None:
+    """Pool parsing responses by PARSE_POOL, None to parse on the loop thread"""
+    if PARSE_POOL == "process":
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Forking the threads of GUI and loop is unsafe
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(PARSE_WORKERS or None, mp_context=context)
+    if PARSE_POOL == "thread":
+        from concurrent.futures import ThreadPoolExecutor
+
+        return ThreadPoolExecutor(PARSE_WORKERS or None, thread_name_prefix="Parser")
+    return None
+
+
+async def runParser[T](func: Callable[..., T], *args: Any) -> T:
+    """
+    Parse a whole response in getParsePool(), so the loop keeps sending requests meanwhile.
+    Each call sends one response and returns all its records, func must be a module level
+    function taking and returning picklable values for the process pool.
+    """
+    if (pool := getParsePool()) is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+
+@cache
+def getStore() -> "PaperStore":
+    """Open the local store of fetched papers in DATA_DIR"""
+    from getpaper.store import PaperStore
+
+    return PaperStore(DATA_DIR / "papers.sqlite3")
+
+
+@cache
+def getPDFStore() -> "PDFStore | None":
+    """Open the store of downloaded pdfs in DATA_DIR, None if PDF_STORE is disabled"""
+    from getpaper.pdfstore import PDFStore
+
+    if not PDF_STORE:
+        return None
+    return PDFStore(DATA_DIR / "pdfs", PDF_LINKS)
+
+
+@cache
+def getJournal() -> "DownloadJournal":
+    """Open the journal of download jobs in DATA_DIR"""
+    from getpaper.jobs import DownloadJournal
+
+    return DownloadJournal(DATA_DIR / "downloads.sqlite3")
+
+
+@cache
+def getSearchStore() -> "SearchStore":
+    """Open the saved searches in DATA_DIR"""
+    from getpaper.searches import SearchStore
+
+    return SearchStore(DATA_DIR / "searches.sqlite3")
+
+
+@cache
+def getTranslationCache() -> "TranslationCache | None":
+    """Open the cache of translations in DATA_DIR, None if TRANSLATION_CACHE is disabled"""
+    from getpaper.translator._cache import TranslationCache
+
+    if not TRANSLATION_CACHE:
+        return None
+    return TranslationCache(DATA_DIR / "translations.sqlite3")
 
 
 P = ParamSpec("P")
@@ -67,44 +313,15 @@ def startTask[T](
                 return result
 
             async def create_task() -> T:
-                return await LOOP.create_task(task(), name=task_name)
+                return await config.LOOP.create_task(task(), name=task_name)
 
-            return run_coroutine_threadsafe(create_task(), LOOP)
+            return run_coroutine_threadsafe(create_task(), config.LOOP)
 
         return wrapped
 
     return middle
 
 
-class MyThread(Thread):
-    _target: Callable
-    _args: tuple
-    _kwargs: dict
-
-    def __init__(self, tip_set: Callable[..., Any], **kwargs) -> None:
-        """An thread that can catch the exception in the target and display on GUI, save returns of target.
-
-        Args:
-            tip_set: A function to display tip on GUI
-        """
-        super().__init__(**kwargs)
-        self.tip_set = tip_set
-        self.result = None
-
-    def run(self) -> None:
-        """Overwrite self.run() for catching the TipException and show on TipBar"""
-
-        try:
-            self.result = self._target(*self._args, **self._kwargs) if self._target else None
-        except TipException as t:
-            self.tip_set(t.tip)
-        except Exception:
-            log.exception("Thread unknown error")
-            self.tip_set("未知错误")
-        finally:
-            del self._target, self._args, self._kwargs
-
-
 class TipException(Exception):
     def __init__(self, tip, *args: object) -> None:
         super().__init__(*args)
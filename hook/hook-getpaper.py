@@ -1,4 +1,5 @@
-from getpaper.config import spider_list, translator_list
+from getpaper.config import exporter_list, spider_list, translator_list
 
 hiddenimports = [f"getpaper.spiders.{module}" for module in spider_list] + \
-                [f"getpaper.translator.{module}" for module in translator_list]
+                [f"getpaper.translator.{module}" for module in translator_list] + \
+                [f"getpaper.exporter.{module}" for module in exporter_list]
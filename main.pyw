@@ -1,4 +1,5 @@
 import asyncio
+import multiprocessing
 import sys
 
 # run below code to avoid RunTimeError raised on windows
@@ -32,5 +33,7 @@ logger.addHandler(handler)
 from getpaper.GUI import Application
 
 if __name__ == "__main__":
+    # Needed by the parse processes of a frozen exe when PARSE_POOL is "process"
+    multiprocessing.freeze_support()
     app = Application("flatly")
     app.run()
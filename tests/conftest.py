@@ -0,0 +1,73 @@
+import asyncio
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator
+
+import pytest
+
+from bench.server import MockOptions, startServer
+from getpaper import utils
+
+HOST = "127.0.0.1"
+TOTAL = 2500  # Papers found by any search of the server, 3 pages of PMIDs
+
+# Getters of the databases in DATA_DIR and of the state shared by clients
+GETTERS = (
+    utils.getStore,
+    utils.getCache,
+    utils.getJournal,
+    utils.getSearchStore,
+    utils.getPDFStore,
+    utils.getTranslationCache,
+    utils.getLimiter,
+    utils.getRetryPolicy,
+    utils.getBreaker,
+)
+
+
+def countRequests(paths: list[str]) -> None:
+    """Append the path of every request sent by the client of the running loop to paths"""
+    client = utils.getClient()
+    request = client.session.request
+
+    async def counted(method: str, url: str, *args: Any, **kwargs: Any) -> Any:
+        paths.append(url.rsplit("/", 1)[-1])
+        return await request(method, url, *args, **kwargs)
+
+    client.session.request = counted  # type: ignore
+
+
+@pytest.fixture(scope="session")
+def server() -> Iterator[str]:
+    """Url of the mock server of bench.server, responding without latency or errors"""
+    process, url = startServer(MockOptions(total=TOTAL, latency=0, jitter=0))
+    yield url
+    process.kill()
+    process.join()
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Each test gets empty databases in a temporary DATA_DIR and fresh limits of hosts"""
+    monkeypatch.setattr(utils, "DATA_DIR", tmp_path)
+    for getter in GETTERS:
+        getter.cache_clear()
+    utils.getLimiter().configure(HOST, 1000, 1000)
+    yield tmp_path
+    for getter in GETTERS:
+        getter.cache_clear()
+
+
+@pytest.fixture
+def run() -> Callable[[Awaitable[Any]], Any]:
+    """Run a coroutine in a new loop and close the client of the loop after it"""
+
+    def runner(coro: Awaitable[Any], timeout: float = 30) -> Any:
+        async def main() -> Any:
+            try:
+                return await asyncio.wait_for(coro, timeout)
+            finally:
+                await utils.closeClients()
+
+        return asyncio.run(main())
+
+    return runner
@@ -0,0 +1,56 @@
+import time
+
+from getpaper.utils import getCache, getClient
+from tests.conftest import countRequests
+
+
+def test_ttl_by_host_and_path():
+    cache = getCache()
+    cache.ttl = {"eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi": 0, "pubs.acs.org": 60}
+    cache.default_ttl = 3600
+    assert cache.getTTL("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi") == 0
+    assert cache.getTTL("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi") == 3600
+    assert cache.getTTL("https://pubs.acs.org/action/doSearch") == 60
+    assert cache.getTTL("https://pubs.acs.org.example.com/") == 3600
+
+
+def test_fresh_pages_served_from_cache(server, run):
+    getCache().ttl = {"127.0.0.1/entrez/eutils/esearch.fcgi": 0}
+    efetch = f"{server}/entrez/eutils/efetch.fcgi"
+    esearch = f"{server}/entrez/eutils/esearch.fcgi"
+
+    async def main() -> list[str]:
+        paths: list[str] = []
+        countRequests(paths)
+        client = getClient()
+        first = await client.get(efetch, params={"id": "1,2"})
+        second = await client.get(efetch, params={"id": "1,2"})
+        assert second.content == first.content
+        assert getattr(second, "from_cache", False)
+        # Other params are another page
+        await client.get(efetch, params={"id": "3"})
+        for _ in range(2):
+            await client.get(esearch, params={"term": "dna"})
+        return paths
+
+    assert run(main()) == ["efetch.fcgi"] * 2 + ["esearch.fcgi"] * 2
+
+
+def test_stale_and_forgotten_pages_requested_again(server, run):
+    cache = getCache()
+    cache.default_ttl = 0.2
+    efetch = f"{server}/entrez/eutils/efetch.fcgi"
+
+    async def main() -> list[str]:
+        paths: list[str] = []
+        countRequests(paths)
+        client = getClient()
+        await client.get(efetch, params={"id": "1"})
+        await client.get(efetch, params={"id": "1"})
+        time.sleep(0.3)
+        await client.get(efetch, params={"id": "1"})
+        await client.forget(efetch, {"id": "1"})
+        await client.get(efetch, params={"id": "1"})
+        return paths
+
+    assert len(run(main())) == 3
@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import Any
+
+from bench.fixtures import pdfBody
+from bench.server import MockOptions
+from getpaper.download import fetchPDF
+from getpaper.utils import getClient
+
+PDF = pdfBody(MockOptions.pdf_size)
+
+
+def recordRanges(ranges: list[str | None]) -> None:
+    """Append the Range header of every request sent by the client of the running loop"""
+    session = getClient().session
+    request = session.request
+
+    async def recorded(method: str, url: str, *args: Any, **kwargs: Any) -> Any:
+        ranges.append((kwargs.get("headers") or {}).get("Range"))
+        return await request(method, url, *args, **kwargs)
+
+    session.request = recorded  # type: ignore
+
+
+def fetch(url: str, file: Path) -> Any:
+    async def main() -> list[str | None]:
+        ranges: list[str | None] = []
+        recordRanges(ranges)
+        await fetchPDF(url, file)
+        return ranges
+
+    return main()
+
+
+def test_resume_truncated_body(server, run, tmp_path):
+    file = tmp_path / "paper.pdf"
+    ranges = run(fetch(f"{server}/pdf/10.1038/1.pdf?truncate=1", file))
+    assert file.read_bytes() == PDF
+    assert not file.with_name("paper.pdf.part").exists()
+    # The second request continues after the half received
+    assert ranges == [None, f"bytes={len(PDF) // 2}-"]
+
+
+def test_resume_part_file(server, run, tmp_path):
+    file = tmp_path / "paper.pdf"
+    file.with_name("paper.pdf.part").write_bytes(PDF[:1000])
+    assert run(fetch(f"{server}/pdf/10.1038/1.pdf", file)) == ["bytes=1000-"]
+    assert file.read_bytes() == PDF
+
+
+def test_complete_part_file(server, run, tmp_path):
+    file = tmp_path / "paper.pdf"
+    file.with_name("paper.pdf.part").write_bytes(PDF)
+    assert run(fetch(f"{server}/pdf/10.1038/1.pdf", file)) == [f"bytes={len(PDF)}-"]
+    assert file.read_bytes() == PDF
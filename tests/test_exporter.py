@@ -0,0 +1,140 @@
+import csv
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+from getpaper.cli import iterResults
+from getpaper.exporter._exporter import present
+from getpaper.spiders import ACS
+from getpaper.spiders._spider import PaperDetail, ResultStream, isPlaceholder
+from getpaper.utils import getExporter, getSpider
+from tests.conftest import TOTAL
+
+DETAILS = [
+    PaperDetail(
+        "A study of DNA repair",
+        "John Smith; Jane Doe",
+        "2020 Jan",
+        "Nature",
+        "Abstract with 50% & {braces}.",
+        "10.1038/1",
+        "https://pubmed.ncbi.nlm.nih.gov/1",
+    ),
+    PaperDetail("A study of RNA", "John Smith", "2020", "Cell", "No Abstract", "10.1016/2", ""),
+    PaperDetail("Error", "Error", "Error", "Error", "Error", "Error", "https://pubmed/3"),
+]
+
+
+def export(file: Path, details: list[PaperDetail], append: bool = False) -> None:
+    with getExporter(file, append=append) as exporter:
+        for detail in details:
+            exporter.write(detail)
+
+
+def exportTwice(file: Path) -> None:
+    """Write the first detail, then append the others"""
+    export(file, DETAILS[:1])
+    export(file, DETAILS[1:], append=True)
+
+
+def test_present():
+    assert present(" Nature ") == "Nature"
+    assert present("No Abstract") == ""
+    assert present("Error") == ""
+
+
+@pytest.mark.parametrize("suffix", ["csv", "jsonl"])
+def test_append_reads_back(tmp_path, suffix):
+    file = tmp_path / f"result.{suffix}"
+    exportTwice(file)
+    assert list(iterResults(file)) == DETAILS
+
+
+def test_csv_header_once(tmp_path):
+    file = tmp_path / "result.csv"
+    exportTwice(file)
+    rows = list(csv.reader(file.read_text(encoding="utf-8").splitlines()))
+    assert rows[0] == ["Title", "Authors", "Date", "Publication", "Abstract", "doi", "Url"]
+    assert len(rows) == 1 + len(DETAILS)
+
+
+def test_replace_without_append(tmp_path):
+    file = tmp_path / "result.jsonl"
+    exportTwice(file)
+    export(file, DETAILS[:1])
+    assert [json.loads(line)["title"] for line in file.read_text().splitlines()] == [
+        DETAILS[0].title
+    ]
+
+
+def test_bib_keys_unique_when_appending(tmp_path):
+    file = tmp_path / "result.bib"
+    export(file, DETAILS[:2])
+    export(file, DETAILS, append=True)
+    keys = re.findall(r"^@article\{(.+),$", file.read_text(encoding="utf-8"), re.M)
+    assert keys == [
+        "Smith2020study",
+        "Smith2020study2",
+        "Smith2020study3",
+        "Smith2020study4",
+        "Anonymous",
+    ]
+
+
+def test_bib_escape(tmp_path):
+    file = tmp_path / "result.bib"
+    export(file, DETAILS[:1])
+    text = file.read_text(encoding="utf-8")
+    assert r"abstract = {Abstract with 50\% \& \{braces\}.}" in text
+    assert "author = {John Smith and Jane Doe}" in text
+
+
+def test_ris_append(tmp_path):
+    file = tmp_path / "result.ris"
+    exportTwice(file)
+    text = file.read_text(encoding="utf-8")
+    assert text.count("TY  - JOUR") == text.count("ER  - ") == len(DETAILS)
+    # Placeholders are left out
+    assert "Error" not in text
+    assert "AB  - " in text.split("ER  - ")[0]
+    assert "AB  - " not in text.split("ER  - ")[1]
+
+
+def test_parquet_append(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    file = tmp_path / "result.parquet"
+    exportTwice(file)
+    table = parquet.read_table(file)
+    assert table.column_names == list(PaperDetail._fields)
+    assert [PaperDetail(*row.values()) for row in table.to_pylist()] == DETAILS
+
+
+def test_export_acs_placeholders(server, run, tmp_path, monkeypatch):
+    parse = ACS.parseACSPage
+
+    def parsePage(content: bytes, limit: int) -> list[PaperDetail]:
+        if b'jacs.100"' in content:
+            raise ValueError("broken page")
+        return parse(content, limit)
+
+    monkeypatch.setattr(ACS, "parseACSPage", parsePage)
+    spider = getSpider("ACS", keyword="dna")
+    spider.base_url = f"{server}/action/doSearch"
+
+    async def main() -> list[PaperDetail]:
+        # The second page fails to parse and the last one runs out of items
+        return [detail async for _, detail in ResultStream(spider, TOTAL + 50)]
+
+    details = run(main())
+    assert all(type(detail) is PaperDetail for detail in details)
+    assert [i for i, detail in enumerate(details) if isPlaceholder(detail)] == [
+        *range(100, 200),
+        *range(TOTAL, TOTAL + 50),
+    ]
+    for suffix in ("bib", "ris", "csv", "jsonl"):
+        file = tmp_path / f"result.{suffix}"
+        export(file, details)
+        if suffix in ("csv", "jsonl"):
+            assert list(iterResults(file)) == details
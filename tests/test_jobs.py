@@ -0,0 +1,39 @@
+from queue import Queue
+
+from bench.fixtures import pdfBody
+from bench.server import MockOptions
+from getpaper.download import SciHubDownloader
+from getpaper.jobs import DONE, PENDING, RUNNING
+from getpaper.spiders._spider import PaperDetail
+from getpaper.utils import getJournal
+from tests.conftest import countRequests
+
+PDF = pdfBody(MockOptions.pdf_size)
+
+
+def test_resume_after_restart(server, run, data_dir):
+    details = [PaperDetail(f"Paper {i}", "", "", "", "", f"10.1038/{i}", "") for i in range(4)]
+    target_dir = data_dir / "papers"
+    journal = getJournal()
+    job = journal.create(details, target_dir)
+    # Paper 0 finished, paper 1 was interrupted halfway by a crash
+    target_dir.mkdir()
+    (target_dir / "Paper 0.pdf").write_bytes(PDF)
+    journal.update(job, 0, DONE, "下载完成")
+    (target_dir / "Paper 1.pdf.part").write_bytes(PDF[:1000])
+    journal.update(job, 1, RUNNING)
+    journal.close()
+    getJournal.cache_clear()
+
+    paths: list[str] = []
+
+    async def main() -> None:
+        countRequests(paths)
+        await SciHubDownloader(f"{server}/scihub", mirrors=()).downloadJob(job, Queue())
+
+    assert getJournal().get(job).states == {DONE: 1, RUNNING: 1, PENDING: 2}
+    run(main())
+    assert getJournal().get(job).states == {DONE: 4}
+    assert sorted(path for path in paths if path.endswith(".pdf")) == ["1.pdf", "2.pdf", "3.pdf"]
+    for i in range(4):
+        assert (target_dir / f"Paper {i}.pdf").read_bytes() == PDF
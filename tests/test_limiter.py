@@ -0,0 +1,31 @@
+import asyncio
+from time import monotonic
+
+from getpaper.limiter import TokenBucket
+
+
+def test_pause_keeps_reservations(run):
+    bucket = TokenBucket(10)
+    sent: list[tuple[int, float]] = []
+
+    async def send(i: int) -> None:
+        await bucket.acquire()
+        sent.append((i, monotonic()))
+
+    async def main() -> float:
+        start = monotonic()
+        tasks = [asyncio.create_task(send(i)) for i in range(4)]
+        await asyncio.sleep(0.05)
+        # A 429 answered while the others wait, as each in-flight request may report it
+        bucket.pause(0.2)
+        bucket.pause(0.2)
+        await asyncio.gather(*tasks)
+        return start
+
+    start = run(main())
+    assert [i for i, _ in sent] == [0, 1, 2, 3]
+    times = [at - start for _, at in sent]
+    assert times[1] >= 0.25
+    assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+    # Each waiter reserved a single slot, put off once by the pause
+    assert abs(bucket.tat - start - 0.6) < 0.02
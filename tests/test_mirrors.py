@@ -0,0 +1,19 @@
+import asyncio
+
+from getpaper import utils
+from getpaper.mirrors import MirrorPool
+from tests.conftest import HOST
+
+
+def test_latency_excludes_rate_limit(server, run):
+    pool = MirrorPool([f"{server}/scihub"])
+    mirror = pool.mirrors[0]
+    # The requests wait up to 0.4s for tokens, while the mock responds at once
+    utils.getLimiter().configure(HOST, 10)
+
+    async def main() -> None:
+        await asyncio.gather(*(pool.send(mirror, "10.1038/1") for _ in range(5)))
+
+    run(main())
+    assert mirror.success == 1
+    assert mirror.latency is not None and mirror.latency < 0.1
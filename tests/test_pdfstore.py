@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from getpaper.pdfstore import PDFStore
+
+PDF = b"%PDF-1.4\n" + b"0" * 1000
+
+
+def download(folder: Path, content: bytes = PDF) -> Path:
+    folder.mkdir(exist_ok=True)
+    file = folder / "paper.pdf"
+    file.write_bytes(content)
+    return file
+
+
+def test_copy_only_indexes_in_place(tmp_path):
+    store = PDFStore(tmp_path / "pdfs", ("copy",))
+    first = download(tmp_path / "a")
+    sha256 = store.add("10.1038/1", first)
+    # Not kept twice on disk
+    assert not store.blob(sha256).exists()
+    assert store.lookup("10.1038/1") == first.resolve()
+
+    second = tmp_path / "b" / "paper.pdf"
+    second.parent.mkdir()
+    assert store.materialize(first, second) == "copy"
+    assert second.read_bytes() == PDF
+
+    # Edited where it was indexed, it is downloaded again
+    first.write_bytes(PDF + b"annotation")
+    assert store.lookup("10.1038/1") is None
+
+
+def test_hardlink_read_only(tmp_path):
+    store = PDFStore(tmp_path / "pdfs", ("hardlink", "copy"))
+    file = download(tmp_path / "a")
+    sha256 = store.add("10.1038/1", file)
+    blob = store.lookup("10.1038/1")
+    assert blob == store.blob(sha256)
+    assert blob.samefile(file)
+    assert not blob.stat().st_mode & 0o222
@@ -0,0 +1,208 @@
+import asyncio
+from typing import Any, Iterator
+
+import pytest
+from curl_cffi.requests.exceptions import Timeout
+
+from bench.server import FIRST_PMID, MockOptions, startServer
+from getpaper.spiders import PubMed
+from getpaper.spiders._spider import PaperDetail, ResultStream, isPlaceholder
+from getpaper.utils import TipException, getSpider
+from tests.conftest import TOTAL, countRequests
+
+LARGE_TOTAL = 25000  # Papers found by any search of large_server, past the reach of esearch
+
+
+@pytest.fixture(scope="module")
+def large_server() -> Iterator[str]:
+    process, url = startServer(MockOptions(total=LARGE_TOTAL, latency=0, jitter=0))
+    yield url
+    process.kill()
+    process.join()
+
+
+async def search(url: str, sorting: str = "") -> PubMed.Spider:
+    spider: PubMed.Spider = getSpider("PubMed", keyword="dna", sorting=sorting)  # type: ignore
+    spider.eutils_url = f"{url}/entrez/eutils/"
+    await spider.getTotalPaperNum()
+    return spider
+
+
+async def fetch(spider: PubMed.Spider, num: int = TOTAL) -> list[tuple[int, PaperDetail]]:
+    return [item async for item in ResultStream(spider, num)]
+
+
+def failPages(spider: PubMed.Spider, pages: dict[int, Exception]) -> None:
+    """Pages of PMIDs starting at the indexes of result in pages raise their values"""
+    getPMIDPage = spider.getPMIDPage
+
+    async def page(page: PubMed.PMIDPage) -> list[str]:
+        if page.index in pages:
+            raise pages[page.index]
+        return await getPMIDPage(page)
+
+    spider.getPMIDPage = page  # type: ignore
+
+
+def test_fetch_in_batches(server, run):
+    async def main() -> tuple[list[tuple[int, PaperDetail]], list[str]]:
+        paths: list[str] = []
+        countRequests(paths)
+        return await fetch(await search(server)), paths
+
+    results, paths = run(main())
+    assert [index for index, _ in results] == list(range(TOTAL))
+    assert results[0][1].title == f"Recorded title of paper {FIRST_PMID}."
+    assert results[0][1].doi == f"10.1038/{FIRST_PMID}"
+    assert results[-1][1].web == f"{PubMed.Spider.base_url}{FIRST_PMID + TOTAL - 1}"
+    # 1 search, 3 pages of PMIDs and 13 batches of details for 2500 papers
+    assert paths.count("esearch.fcgi") == 4
+    assert paths.count("efetch.fcgi") == -(-TOTAL // PubMed.BATCH_SIZE)
+
+
+def test_ascending_from_tail(server, run):
+    async def main() -> list[tuple[int, PaperDetail]]:
+        return await fetch(await search(server, "日期逆序"), 1500)
+
+    results = run(main())
+    assert [index for index, _ in results] == list(range(1500))
+    pmids = [detail.web.rsplit("/", 1)[-1] for _, detail in results]
+    assert pmids == [str(FIRST_PMID + i) for i in range(TOTAL - 1, TOTAL - 1501, -1)]
+
+
+def test_details_from_store(server, run):
+    async def main() -> list[str]:
+        await fetch(await search(server), 500)
+        paths: list[str] = []
+        countRequests(paths)
+        results = await fetch(await search(server), 500)
+        assert not any(isPlaceholder(detail) for _, detail in results)
+        return paths
+
+    assert "efetch.fcgi" not in run(main())
+
+
+def test_get_pmids_prefix(server, run):
+    async def main() -> tuple[list[str], list[str]]:
+        spider = await search(server)
+        full = list(await spider.getPMIDs(TOTAL))
+        failPages(spider, {1000: ValueError("broken page")})
+        return full, list(await spider.getPMIDs(TOTAL))
+
+    full, prefix = run(main())
+    assert full == [str(FIRST_PMID + i) for i in range(TOTAL)]
+    assert prefix == full[:1000]
+
+
+def test_failed_page_does_not_hold_back_results(server, run):
+    async def main() -> list[tuple[int, PaperDetail]]:
+        spider = await search(server)
+        failPages(spider, {1000: ValueError("broken page")})
+        # The last batch waits until the results before it are delivered, which never
+        # happens if the failed page stalls the stream
+        delivered = asyncio.Event()
+        last = (TOTAL - 1) // PubMed.BATCH_SIZE * PubMed.BATCH_SIZE
+        getPagesInfo = spider.getPagesInfo
+
+        async def pagesInfo(start: int, pmids: list[str]) -> None:
+            if start == last:
+                await delivered.wait()
+            await getPagesInfo(start, pmids)
+
+        spider.getPagesInfo = pagesInfo  # type: ignore
+        results = []
+        async for index, detail in ResultStream(spider, TOTAL):
+            results.append((index, detail))
+            if index == last - 1:
+                delivered.set()
+        return results
+
+    results = run(main(), timeout=10)
+    assert [index for index, _ in results] == list(range(TOTAL))
+    failed = [index for index, detail in results if isPlaceholder(detail)]
+    assert failed == list(range(1000, 2000))
+
+
+def test_timeout_raises_tip(server, run):
+    async def main() -> None:
+        spider = await search(server)
+        failPages(spider, {1000: Timeout("timed out")})
+        await fetch(spider)
+
+    with pytest.raises(TipException) as e:
+        run(main())
+    assert e.value.tip == "连接超时"
+
+
+def test_all_pages_failed(server, run):
+    results: list[tuple[int, PaperDetail]] = []
+
+    async def main() -> None:
+        spider = await search(server)
+        failPages(spider, {start: ValueError("broken page") for start in (0, 1000, 2000)})
+        async for item in ResultStream(spider, TOTAL):
+            results.append(item)
+
+    with pytest.raises(TipException) as e:
+        run(main())
+    assert e.value.tip == "获取文献列表出错"
+    assert len(results) == TOTAL
+    assert all(isPlaceholder(detail) for _, detail in results)
+
+
+def test_failed_batch_of_details(server, run, monkeypatch):
+    parse = PubMed.parsePubMedPage
+    broken = f"<PMID Version='1'>{FIRST_PMID + PubMed.BATCH_SIZE}</PMID>".encode()
+
+    def parsePage(content: bytes, base_url: str) -> Any:
+        if broken in content:
+            raise ValueError("broken response")
+        return parse(content, base_url)
+
+    monkeypatch.setattr(PubMed, "parsePubMedPage", parsePage)
+
+    async def main() -> list[tuple[int, PaperDetail]]:
+        return await fetch(await search(server), 1000)
+
+    results = run(main())
+    assert [index for index, _ in results] == list(range(1000))
+    failed = [index for index, detail in results if isPlaceholder(detail)]
+    assert failed == list(range(PubMed.BATCH_SIZE, 2 * PubMed.BATCH_SIZE))
+    assert (
+        results[PubMed.BATCH_SIZE][1].web
+        == f"{PubMed.Spider.base_url}{FIRST_PMID + PubMed.BATCH_SIZE}"
+    )
+
+
+def test_date_order_split_by_date(large_server, run):
+    async def main() -> tuple[list[str], list[str]]:
+        descending = await search(large_server, "日期")
+        ascending = await search(large_server, "日期逆序")
+        return await descending.getPMIDs(LARGE_TOTAL), await ascending.getPMIDs(12000)
+
+    descending, ascending = run(main())
+    assert descending == [str(FIRST_PMID + i) for i in range(LARGE_TOTAL)]
+    assert ascending == [
+        str(FIRST_PMID + i) for i in range(LARGE_TOTAL - 1, LARGE_TOTAL - 12001, -1)
+    ]
+
+
+def test_relevance_cut_at_max_results(large_server, run):
+    results: list[tuple[int, PaperDetail]] = []
+
+    async def main() -> None:
+        spider = await search(large_server)
+
+        async def pagesInfo(start: int, pmids: list[str]) -> None:
+            for index, pmid in enumerate(pmids, start):
+                spider.result_queue.put((index, PaperDetail(pmid, *[""] * 6)))
+
+        spider.getPagesInfo = pagesInfo  # type: ignore
+        async for item in ResultStream(spider, 12000):
+            results.append(item)
+
+    with pytest.raises(TipException) as e:
+        run(main())
+    assert "9999" in e.value.tip
+    assert [index for index, _ in results] == list(range(PubMed.MAX_RESULTS))
+    assert results[-1][1].title == str(FIRST_PMID + PubMed.MAX_RESULTS - 1)
@@ -0,0 +1,83 @@
+from datetime import date
+from typing import Iterator
+
+import pytest
+
+from bench.server import FIRST_PMID
+from getpaper import searches
+from getpaper.searches import SearchRun, saveSearch
+from getpaper.spiders import PubMed
+from getpaper.spiders._parser import emptyDetail, errorDetail
+from getpaper.spiders._spider import PaperDetail
+from getpaper.utils import getSearchStore
+from tests.conftest import TOTAL
+
+
+def test_failed_transaction_rolled_back():
+    store = getSearchStore()
+    store.save("dna", "PubMed", {"keyword": "dna"})
+
+    def pmids() -> Iterator[str]:
+        yield "1"
+        raise ValueError("interrupted")
+
+    with pytest.raises(ValueError):
+        store.record("dna", pmids(), "2020-01-01")
+    assert not store.db.in_transaction
+    assert store.seen("dna") == set()
+    # The connection still starts transactions
+    store.record("dna", ["1", "2"], "2020-01-02")
+    assert store.seen("dna") == {"1", "2"}
+    assert store.get("dna").last_date == "2020-01-02"  # type: ignore
+
+
+@pytest.fixture
+def pubmed(server: str, monkeypatch: pytest.MonkeyPatch) -> set[str]:
+    """Saved search "dna" of the mock server, details of PMIDs in the returned set fail"""
+    failing: set[str] = set()
+    monkeypatch.setattr(PubMed.Spider, "eutils_url", f"{server}/entrez/eutils/")
+
+    async def getPagesInfo(self: PubMed.Spider, start: int, pmids: list[str]) -> None:
+        for index, pmid in enumerate(pmids, start):
+            if pmid in failing:
+                self.failed.add(pmid)
+                detail = errorDetail(self.base_url + pmid)
+            else:
+                # Papers without a title are fetched all the same
+                detail = emptyDetail(self.base_url + pmid)
+            self.result_queue.put((index, detail))
+
+    monkeypatch.setattr(PubMed.Spider, "getPagesInfo", getPagesInfo)
+    saveSearch("dna", "PubMed", {"keyword": "dna"})
+    return failing
+
+
+async def runSearch(name: str) -> tuple[int, list[tuple[int, PaperDetail]]]:
+    run = SearchRun(name)
+    num = await run.search()
+    return num, [item async for item in run]
+
+
+def test_first_run_bounded(pubmed, run, monkeypatch):
+    monkeypatch.setattr(searches, "FIRST_RUN_PAPERS", 1000)
+    num, results = run(runSearch("dna"))
+    assert num == len(results) == 1000
+    saved = getSearchStore().get("dna")
+    assert saved.last_date == date.today().isoformat()  # type: ignore
+    assert saved.seen == 1000  # type: ignore
+    # Later runs search since the last run, fetching only papers not seen
+    num, _ = run(runSearch("dna"))
+    assert num == TOTAL - 1000
+
+
+def test_failed_papers_fetched_again(pubmed, run):
+    pubmed.update(str(FIRST_PMID + i) for i in (10, 2000))
+    num, results = run(runSearch("dna"))
+    assert num == len(results) == TOTAL
+    saved = getSearchStore().get("dna")
+    assert saved.last_date == ""  # type: ignore
+    assert saved.seen == TOTAL - 2  # type: ignore
+    pubmed.clear()
+    num, _ = run(runSearch("dna"))
+    assert num == 2
+    assert getSearchStore().get("dna").last_date == date.today().isoformat()  # type: ignore
@@ -0,0 +1,21 @@
+from getpaper._db import transaction
+from getpaper.spiders._spider import PaperDetail
+from getpaper.utils import getStore
+
+DETAIL = PaperDetail("Title", "Author", "2020", "Nature", "Abstract", "10.1038/1", "")
+
+
+def test_upsert_skips_placeholders():
+    store = getStore()
+    error = PaperDetail(*["Error"] * 6, "")
+    assert store.upsert([("1", DETAIL), ("2", error), (None, DETAIL._replace(doi="No DOI"))]) == 1
+    assert store.getByPMIDs(["1", "2"]) == {"1": DETAIL}
+    assert store.getByDOI("10.1038/1") == DETAIL
+
+
+def test_transaction_commits():
+    db = getStore().db
+    with transaction(db):
+        db.execute("CREATE TABLE t (x)")
+        db.execute("INSERT INTO t VALUES (1)")
+    assert db.execute("SELECT x FROM t").fetchall() == [(1,)]
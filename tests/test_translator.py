@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from getpaper.spiders._spider import PaperDetail
+from getpaper.translator._translator import _pending, _Translator, translateDetails
+from getpaper.utils import getTranslator
+
+
+class Translator(_Translator):
+    """Sends each line alone, lines starting with "bad" fail after the others started"""
+
+    max_bytes = 1
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def translate(self, detail: str) -> str:
+        return (await self.translateMany([detail]))[0]
+
+    async def translateBatch(self, lines: list[str]) -> list[str]:
+        self.sent.extend(lines)
+        if any(line.startswith("bad") for line in lines):
+            await asyncio.sleep(0.01)
+            raise ValueError("translation failed")
+        await asyncio.sleep(0.05)
+        return [f"[zh] {line}" for line in lines]
+
+
+def test_failed_batch_cancels_the_others(run):
+    translator = Translator()
+
+    async def main() -> list[str]:
+        with pytest.raises(ValueError):
+            await translator.translateMany(["bad line", "first", "second\nthird"])
+        # Sent again while the batches of the failed call would still be running, they must
+        # have been cancelled instead of resolving the futures of this call
+        result = await translator.translateMany(["first", "second\nthird"])
+        await asyncio.sleep(0.1)
+        return result
+
+    assert run(main()) == ["[zh] first", "[zh] second\n[zh] third"]
+    assert not _pending
+
+
+def test_concurrent_lines_sent_once(run):
+    translator = Translator()
+
+    async def main() -> list[list[str]]:
+        return await asyncio.gather(
+            translator.translateMany(["same", "one"]), translator.translateMany(["same", "two"])
+        )
+
+    assert run(main()) == [["[zh] same", "[zh] one"], ["[zh] same", "[zh] two"]]
+    assert sorted(translator.sent) == ["one", "same", "two"]
+
+
+def test_cached_lines_not_sent(run):
+    translator = Translator()
+    run(translator.translateMany(["cached line", ""]))
+    translator.sent.clear()
+    assert run(translator.translateMany(["cached line\n", "new line"])) == [
+        "[zh] cached line\n",
+        "[zh] new line",
+    ]
+    assert translator.sent == ["new line"]
+
+
+def test_translate_details(run):
+    details = [
+        PaperDetail(f"Title {i}", "", "", "", f"Abstract {i}.\nMethods.", "", "") for i in range(45)
+    ]
+    translator = getTranslator("_offline", 0)
+    results = run(translateDetails(translator, details, chunk=20))
+    assert results[44] == ("[zh] Title 44", "[zh] Abstract 44.\n[zh] Methods.")
+    assert len(results) == len(details)